@@ -0,0 +1,14 @@
+from base.tests.bases import QueryBudgetTestCase
+
+
+class AuthenticationQueryBudgetTests(QueryBudgetTestCase):
+
+    def test_login(self):
+        self.client.force_authenticate(None)
+        # пользователь и last_login
+        self.assertQueryBudget(2, '/api/v1/auth/login/', method='post', data={
+            'username': self.users[0].username, 'password': 'x',
+        })
+
+    def test_endeet_key(self):
+        self.assertQueryBudget(0, '/api/v1/auth/endeet-key/')
@@ -0,0 +1,45 @@
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY_PREFIX = 'data_version'
+
+
+def _version_key(name):
+    return f'{VERSION_KEY_PREFIX}:{name}'
+
+
+def _new_version(current=None):
+    """
+    Версия - время изменения в наносекундах (не меньше предыдущей + 1).
+    После очистки кэша версия не совпадет со старой, оставшейся в памяти процессов,
+    а по версии можно получить время последнего изменения.
+    """
+    return max(time.time_ns(), (current or 0) + 1)
+
+
+def get_versions(*names):
+    """Текущие версии данных {имя: версия} за одно обращение к кэшу"""
+    keys = {_version_key(name): name for name in names}
+    found = cache.get_many(keys)
+    versions = {keys[key]: version for key, version in found.items()}
+    for name in names:
+        if name not in versions:
+            cache.add(_version_key(name), _new_version(), None)
+            versions[name] = cache.get(_version_key(name))
+    return versions
+
+
+def get_version(name):
+    return get_versions(name)[name]
+
+
+def bump_version(name):
+    """Инвалидирует все, что закэшировано под текущей версией, во всех процессах"""
+    key = _version_key(name)
+    cache.set(key, _new_version(cache.get(key)), None)
+
+
+def version_timestamp(version):
+    """Время изменения (unix timestamp) по номеру версии"""
+    return version / 1e9
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Error
+
+# Бэкенды, данные которых видны только текущему процессу
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def check_shared_cache(app_configs=None, **kwargs):
+    """
+    Версии данных (base.cache.bases) сбрасывают кэш справочников, счетчиков и ETag
+    во всех процессах, только если кэш общий. С кэшем в памяти процесса остальные
+    воркеры отдают устаревшие данные до истечения таймаута.
+    """
+    if settings.DEBUG:
+        return []
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in PROCESS_LOCAL_CACHE_BACKENDS:
+        return [Error(
+            f'Кэш {backend} не общий для процессов: версии данных не сбрасываются в других воркерах',
+            hint='Укажите CACHE_BACKEND: FileBasedCache (один сервер), Redis, Memcached или DatabaseCache',
+            id='base.E001',
+        )]
+    return []
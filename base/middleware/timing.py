@@ -0,0 +1,165 @@
+"""
+Замер времени обработки запроса: количество и время SQL-запросов,
+время во view, в сериализаторах и в рендерере.
+
+Замер включается:
+    - заголовком X-Request-Timing: 1 от пользователя с is_staff -
+      результат возвращается в заголовке Server-Timing и пишется в лог.
+      JWT-аутентификация выполняется во view, поэтому для запросов с
+      заголовком пользователь определяется заранее (is_staff_request);
+      от остальных пользователей заголовок игнорируется;
+    - случайной выборкой с долей REQUEST_TIMING_SAMPLE_RATE (0..1) -
+      результат только пишется в лог.
+Если замер не включен, middleware только вызывает следующий обработчик.
+
+Этапы замеряются без подмены методов DRF:
+    view      - middleware (process_view): от вызова view до ответа, без рендеринга;
+    serialize - base.serializers.bases.TimedSerializerMixin и RowMapper;
+    render    - рендереры base.renderers.bases (DEFAULT_RENDERER_CLASSES).
+Для потоковых ответов учитывается только время до начала отправки тела.
+"""
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+TIMING_REQUEST_HEADER = 'HTTP_X_REQUEST_TIMING'
+
+_current = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """Накопленные замеры одного запроса (миллисекунды)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = {}
+        self.queries = 0
+        self.view_started = None
+        self._depth = {}
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0) + seconds * 1000
+
+    @contextmanager
+    def span(self, name):
+        # Вложенные замеры с тем же именем (ListSerializer.data -> BaseSerializer.data) не суммируются
+        depth = self._depth.get(name, 0)
+        self._depth[name] = depth + 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth[name] = depth
+            if depth == 0:
+                self.add(name, time.perf_counter() - started)
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.add('db', time.perf_counter() - started)
+
+    def finish_view(self):
+        """Время view - от process_view до ответа за вычетом рендеринга"""
+        if self.view_started is None:
+            return
+        render = self.durations.get('render', 0) / 1000
+        self.durations['view'] = max(time.perf_counter() - self.view_started - render, 0) * 1000
+        self.view_started = None
+
+    def total(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self):
+        """Значение заголовка Server-Timing"""
+        metrics = [f'total;dur={self.total():.1f}']
+        for name, duration in self.durations.items():
+            description = f';desc="{self.queries} queries"' if name == 'db' else ''
+            metrics.append(f'{name};dur={duration:.1f}{description}')
+        if 'db' not in self.durations:
+            metrics.append('db;dur=0;desc="0 queries"')
+        return ', '.join(metrics)
+
+
+@contextmanager
+def span(name):
+    """Замер участка кода, если для текущего запроса включен замер"""
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    with timing.span(name):
+        yield
+
+
+def is_staff_request(request):
+    """Аутентификация DRF до вызова view: автор запроса - сотрудник с is_staff"""
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except APIException:
+        return False
+    return bool(user and user.is_authenticated and user.is_staff)
+
+
+def get_sample_rate():
+    return float(getattr(settings, 'REQUEST_TIMING_SAMPLE_RATE', 0) or 0)
+
+
+class RequestTimingMiddleware:
+    """См. описание модуля. Ставится первым в MIDDLEWARE, чтобы total покрывал всю обработку"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        requested = request.META.get(TIMING_REQUEST_HEADER) == '1' and is_staff_request(request)
+        sample_rate = get_sample_rate()
+        sampled = sample_rate > 0 and random.random() < sample_rate
+        if not requested and not sampled:
+            return self.get_response(request)
+
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timing.execute_wrapper))
+                response = self.get_response(request)
+            timing.finish_view()
+        finally:
+            _current.reset(token)
+
+        if requested:
+            response['Server-Timing'] = timing.server_timing()
+        self.log(request, response, timing)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = _current.get()
+        if timing is not None:
+            timing.view_started = time.perf_counter()
+
+    def log(self, request, response, timing):
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(timing.total(), 1),
+            'queries': timing.queries,
+            **{f'{name}_ms': round(duration, 1) for name, duration in timing.durations.items()},
+        }
+        logger.info(json.dumps(record, ensure_ascii=False), extra={'request_timing': record})
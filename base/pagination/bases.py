@@ -0,0 +1,265 @@
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.encoding import force_str
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная (keyset) пагинация.
+    Позиция в курсоре - пара (значение поля сортировки, id), поэтому
+    каждая страница выбирается условием WHERE по индексу, без OFFSET,
+    и стоит одинаково независимо от глубины. Поддерживается любое поле
+    из ordering_fields представления, включая поля связанных моделей.
+
+    Размер страницы задается ?page_size= или ?limit= (как в LimitOffsetPagination),
+    ?offset= не поддерживается - запрос с ним возвращает 400.
+
+    Количество записей (count) считается в режиме count_mode,
+    режим можно переопределить параметром ?count=:
+        exact    - честный COUNT(*) на каждой странице;
+        cached   - COUNT(*) кешируется на count_cache_timeout секунд;
+        estimate - оценка планировщика PostgreSQL (на других БД - как cached);
+        none     - не считать.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    page_size_query_aliases = ('limit',)
+    offset_query_param = 'offset'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    count_mode = 'cached'
+    count_modes = ('exact', 'cached', 'estimate', 'none')
+    count_cache_timeout = 60
+    ordering = 'pk'
+    invalid_cursor_message = 'Неверный курсор'
+    offset_not_supported_message = 'Параметр offset не поддерживается, для перехода по страницам используйте cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.offset_query_param in request.query_params:
+            raise ValidationError({self.offset_query_param: self.offset_not_supported_message})
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.field, self.ascending = self.get_ordering(request, queryset, view)
+        self.count = self.get_count(queryset, request)
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['r'])
+        ascending = self.ascending != reverse
+
+        queryset = queryset.annotate(keyset_value=F(self.field)).order_by(*self._order_by(ascending))
+        if cursor:
+            queryset = queryset.filter(self._after(cursor['v'], cursor['p'], ascending))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_position = self.previous_position = None
+        if results:
+            if has_more or reverse:
+                self.next_position = self._position(results[-1])
+            if (has_more and reverse) or (cursor and not reverse):
+                self.previous_position = self._position(results[0])
+
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        for param in (self.page_size_query_param, *self.page_size_query_aliases):
+            if param in request.query_params:
+                break
+        try:
+            page_size = int(request.query_params[param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Возвращает (поле, по_возрастанию).
+        Берется первое поле сортировки из OrderingFilter или view.ordering,
+        второй ключ сортировки всегда id.
+        """
+        ordering = None
+        for filter_cls in getattr(view, 'filter_backends', []):
+            if issubclass(filter_cls, OrderingFilter):
+                ordering = filter_cls().get_ordering(request, queryset, view)
+                break
+        if not ordering:
+            ordering = getattr(view, 'ordering', None) or self.ordering
+        if isinstance(ordering, str):
+            ordering = [ordering]
+
+        field = ordering[0]
+        if field.startswith('-'):
+            return field[1:], False
+        return field, True
+
+    # Количество записей
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param, self.count_mode)
+        if mode not in self.count_modes:
+            mode = self.count_mode
+
+        if mode == 'none':
+            return None
+        queryset = queryset.order_by()
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'estimate':
+            estimate = self.estimate_count(queryset)
+            if estimate is not None:
+                return estimate
+
+        sql, params = queryset.query.sql_with_params()
+        key = 'keyset-count:' + hashlib.md5(repr((sql, params)).encode()).hexdigest()
+        return cache.get_or_set(key, queryset.count, self.count_cache_timeout)
+
+    def estimate_count(self, queryset):
+        """Оценка количества строк по плану запроса (только PostgreSQL)"""
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    # Курсор
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            if cursor['o'] != self._ordering_key() or not {'v', 'p', 'r'} <= cursor.keys():
+                raise ValueError
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, position, reverse):
+        value, pk = position
+        cursor = {'o': self._ordering_key(), 'v': value, 'p': pk, 'r': int(reverse)}
+        # datetime и прочие значения сохраняем в isoformat без потери микросекунд
+        data = json.dumps(cursor, default=lambda obj: obj.isoformat() if hasattr(obj, 'isoformat') else force_str(obj))
+        encoded = base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Курсор страницы',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Количество записей на странице',
+                'schema': {'type': 'integer'},
+            },
+            *(
+                {
+                    'name': alias,
+                    'required': False,
+                    'in': 'query',
+                    'description': f'То же, что {self.page_size_query_param}',
+                    'schema': {'type': 'integer'},
+                }
+                for alias in self.page_size_query_aliases
+            ),
+            {
+                'name': self.count_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Режим подсчета: ' + ', '.join(self.count_modes),
+                'schema': {'type': 'string', 'enum': list(self.count_modes)},
+            },
+        ]
+
+    # Вспомогательные методы
+
+    def _ordering_key(self):
+        return ('' if self.ascending else '-') + self.field
+
+    def _order_by(self, ascending):
+        """NULL всегда идут первыми при сортировке по возрастанию - одинаково во всех БД"""
+        if ascending:
+            return F(self.field).asc(nulls_first=True), F('pk').asc()
+        return F(self.field).desc(nulls_last=True), F('pk').desc()
+
+    def _after(self, value, pk, ascending):
+        """Условие "строго после позиции (value, pk)" в заданном направлении"""
+        field = self.field
+        if ascending:
+            if value is None:
+                return Q(**{f'{field}__isnull': True, 'pk__gt': pk}) | Q(**{f'{field}__isnull': False})
+            return Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk})
+        if value is None:
+            return Q(**{f'{field}__isnull': True, 'pk__lt': pk})
+        return (
+            Q(**{f'{field}__lt': value})
+            | Q(**{field: value, 'pk__lt': pk})
+            | Q(**{f'{field}__isnull': True})
+        )
+
+    @staticmethod
+    def _position(item):
+        if isinstance(item, dict):
+            return item['keyset_value'], (item['pk'] if 'pk' in item else item['id'])
+        return item.keyset_value, item.pk
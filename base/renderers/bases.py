@@ -0,0 +1,22 @@
+"""
+Рендереры API с замером времени рендеринга: время render попадает
+в этап render замера запроса (base/middleware/timing.py).
+"""
+from rest_framework import renderers
+
+from base.middleware.timing import span
+
+
+class TimedRendererMixin:
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with span('render'):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class JSONRenderer(TimedRendererMixin, renderers.JSONRenderer):
+    pass
+
+
+class BrowsableAPIRenderer(TimedRendererMixin, renderers.BrowsableAPIRenderer):
+    pass
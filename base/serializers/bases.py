@@ -0,0 +1,177 @@
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import FileField
+from rest_framework import serializers
+
+from base.middleware.timing import span
+
+
+def parse_field_paths(value):
+    """
+    Разбирает список полей из параметра запроса в дерево:
+    'public_id,equipment.serial_number' -> {'public_id': {}, 'equipment': {'serial_number': {}}}
+    """
+    tree = {}
+    for path in value.split(','):
+        path = path.strip()
+        if not path:
+            continue
+        node = tree
+        for part in path.split('.'):
+            node = node.setdefault(part, {})
+    return tree
+
+
+class TimedSerializerMixin:
+    """
+    Время to_representation попадает в этап serialize замера запроса
+    (base/middleware/timing.py). Вложенные сериализаторы не учитываются повторно.
+    """
+
+    def to_representation(self, instance):
+        with span('serialize'):
+            return super().to_representation(instance)
+
+
+class SparseFieldsetSerializerMixin(TimedSerializerMixin):
+    """
+    Миксин для сериализаторов с выборочными полями (?fields=) и раскрытием связей (?expand=).
+
+    Описание полей берется из контекста ('sparse_fieldset', его кладет SparseFieldsetMixin
+    представления) и передается вложенным сериализаторам. Если параметры не заданы -
+    сериализатор работает как обычно. Если заданы:
+        - остаются только поля из fields (если fields не пуст);
+        - вложенные объекты раскрываются только если указаны в expand
+          или через точку в fields (equipment.serial_number),
+          иначе вместо объекта отдается его public_id (id - у моделей без public_id).
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        spec = self._get_sparse_spec()
+        if spec is None:
+            return fields
+
+        only, expand = spec
+        if only:
+            fields = {name: field for name, field in fields.items() if name in only}
+
+        for name, field in list(fields.items()):
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if not isinstance(nested, serializers.BaseSerializer):
+                continue
+            nested_only = (only or {}).get(name) or None
+            if name in expand or nested_only:
+                nested._sparse_spec = (nested_only, expand.get(name, {}))
+            else:
+                fields[name] = self._get_reference_field(field, nested)
+        return fields
+
+    @staticmethod
+    def _get_reference_field(field, nested):
+        """Поле вместо нераскрытого объекта: public_id или первичный ключ"""
+        many = isinstance(field, serializers.ListSerializer)
+        model = getattr(getattr(nested, 'Meta', None), 'model', None)
+        if model is not None and any(model_field.name == 'public_id' for model_field in model._meta.concrete_fields):
+            return serializers.SlugRelatedField(slug_field='public_id', read_only=True, source=field.source, many=many)
+        return serializers.PrimaryKeyRelatedField(read_only=True, source=field.source, many=many)
+
+    def _get_sparse_spec(self):
+        spec = getattr(self, '_sparse_spec', None)
+        if spec is not None:
+            return spec
+        # Параметры запроса читает только корневой сериализатор
+        parent = self.parent
+        if parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None):
+            return self.context.get('sparse_fieldset')
+        return None
+
+
+class RowMapper:
+    """
+    Быстрое чтение списков без создания моделей и обхода полей DRF на каждой строке.
+
+    По сериализатору (с учетом ?fields=/?expand=) один раз на запрос составляется
+    список колонок для values() и функции преобразования. Каждое значение
+    преобразуется to_representation того же поля DRF, поэтому результат совпадает
+    с ответом обычного сериализатора. Поддерживаются поля модели,
+    вложенные сериализаторы (ForeignKey), PrimaryKeyRelatedField и SlugRelatedField.
+    """
+
+    def __init__(self, serializer):
+        model = serializer.Meta.model
+        self.paths = [model._meta.pk.name]
+        self.steps = self._compile(serializer, model, '')
+
+    def values(self, queryset):
+        """queryset.values() с колонками, нужными сериализатору"""
+        return queryset.values(*self.paths)
+
+    def map(self, rows):
+        """Список словарей в том же виде, что и serializer.data"""
+        steps = self.steps
+        with span('serialize'):
+            return [self._build(steps, row) for row in rows]
+
+    @staticmethod
+    def _build(steps, row):
+        data = {}
+        for name, path, convert, nested in steps:
+            value = row[path]
+            if value is None:
+                data[name] = None
+            elif nested is not None:
+                data[name] = RowMapper._build(nested, row)
+            else:
+                data[name] = convert(value)
+        return data
+
+    def _add_path(self, path):
+        if path not in self.paths:
+            self.paths.append(path)
+        return path
+
+    def _compile(self, serializer, model, prefix):
+        steps = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*' or len(field.source_attrs) != 1:
+                raise ImproperlyConfigured(f'RowMapper: поле {name} не связано с колонкой модели')
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                raise ImproperlyConfigured(f'RowMapper: поле {name} не связано с колонкой модели')
+            path = prefix + field.source
+
+            if isinstance(field, serializers.BaseSerializer):
+                if isinstance(field, serializers.ListSerializer) or not model_field.many_to_one:
+                    raise ImproperlyConfigured(f'RowMapper: поле {name} - не ForeignKey')
+                related_model = model_field.related_model
+                # по первичному ключу связанной модели определяем, есть ли связь (LEFT JOIN)
+                marker = self._add_path(f'{path}__{related_model._meta.pk.name}')
+                nested = self._compile(field, related_model, path + '__')
+                steps.append((name, marker, None, nested))
+            elif isinstance(field, serializers.PrimaryKeyRelatedField):
+                steps.append((name, self._add_path(path), _identity, None))
+            elif isinstance(field, serializers.SlugRelatedField) and model_field.many_to_one:
+                steps.append((name, self._add_path(f'{path}__{field.slug_field}'), _identity, None))
+            elif isinstance(field, serializers.RelatedField) or not model_field.concrete:
+                raise ImproperlyConfigured(f'RowMapper: поле {name} не поддерживается')
+            elif isinstance(model_field, FileField):
+                steps.append((name, self._add_path(path), _file_converter(field, model_field), None))
+            else:
+                steps.append((name, self._add_path(path), field.to_representation, None))
+        return steps
+
+
+def _identity(value):
+    return value
+
+
+def _file_converter(field, model_field):
+    """FileField/ImageField ждут FieldFile, а values() возвращает имя файла"""
+
+    def convert(value):
+        return field.to_representation(model_field.attr_class(None, model_field, value))
+
+    return convert
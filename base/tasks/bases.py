@@ -0,0 +1,49 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Общий пул потоков для фоновых задач (выгрузки, обработка файлов и т.д.).
+    Создается лениво при первом обращении.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'BACKGROUND_WORKERS', 2),
+                    thread_name_prefix='background',
+                )
+    return _executor
+
+
+def run_in_background(func, *args, **kwargs):
+    """
+    Запускает функцию в пуле потоков.
+    После выполнения закрывает соединения с БД, открытые в потоке.
+    """
+
+    def task():
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            logger.exception("Ошибка фоновой задачи %s", func.__name__)
+        finally:
+            connections.close_all()
+
+    return get_executor().submit(task)
+
+
+def run_on_commit(func, *args, **kwargs):
+    """Ставит задачу в пул только после фиксации текущей транзакции"""
+    transaction.on_commit(lambda: run_in_background(func, *args, **kwargs))
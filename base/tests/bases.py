@@ -0,0 +1,109 @@
+"""
+Общие помощники тестов приложений: набор данных и базовый класс для
+проверки количества SQL-запросов, сравнение сериализатора с RowMapper.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from base.serializers.bases import parse_field_paths, RowMapper
+from equipment.fuzzy import serial_index
+from equipment.models import Equipment, EquipmentType, Manufacturer, LegalEntity
+from transfer_request.models import TransferRequest
+from user.models import Position
+
+User = get_user_model()
+
+
+def render_both(serializer_class, queryset, fields=None, path='/'):
+    """JSON от обычного сериализатора и от RowMapper для одного и того же queryset"""
+    request = Request(APIRequestFactory().get(path))
+    sparse_fieldset = None
+    if fields is not None:
+        sparse_fieldset = (parse_field_paths(fields[0]), parse_field_paths(fields[1]))
+    context = {'request': request, 'sparse_fieldset': sparse_fieldset}
+
+    expected = JSONRenderer().render(serializer_class(queryset, many=True, context=context).data)
+    mapper = RowMapper(serializer_class(context=context))
+    actual = JSONRenderer().render(mapper.map(mapper.values(queryset)))
+    return expected, actual
+
+
+def seed_dataset(equipment_count=40, user_count=6):
+    """
+    Набор данных для проверки количества запросов: все связи заполнены,
+    строк больше, чем помещается на страницу, есть заявки во всех статусах.
+    Возвращает (пользователи, оборудование).
+    """
+    positions = [Position.objects.create(name=f'Должность {index}') for index in range(2)]
+    organization = LegalEntity.objects.create(name='ООО Бюджет', short_name='Бюджет')
+    types = [EquipmentType.objects.create(name=f'Тип {index}') for index in range(3)]
+    manufacturers = [Manufacturer.objects.create(name=f'Производитель {index}') for index in range(3)]
+
+    users = [
+        User.objects.create_user(
+            username=f'budget_{index}', email=f'budget_{index}@example.com', password='x',
+            position=positions[index % 2], organization=organization, is_advanced_access=index == 0,
+        )
+        for index in range(user_count)
+    ]
+    equipment = [
+        Equipment.objects.create(
+            serial_number=f'BUDGET-{index:03d}', inverter_number=f'INV-{index:03d}', model=f'Модель {index % 4}',
+            type=types[index % 3], manufacturer=manufacturers[index % 3], legal_entity=organization,
+            current_owner=users[index % 2],
+        )
+        for index in range(equipment_count)
+    ]
+    # Заявки между первыми двумя пользователями по обе стороны, часть в ожидании
+    statuses = ['pending', 'accepted', 'rejected']
+    for index, item in enumerate(equipment[:30]):
+        sender, receiver = users[index % 2], users[(index + 1) % 2]
+        TransferRequest.objects.create(
+            equipment=equipment[0] if index % 5 == 0 else item,
+            sender=sender, receiver=receiver, status=statuses[index % 3],
+        )
+    return users, equipment
+
+
+class QueryBudgetTestCase(TestCase):
+    """
+    Базовый класс: запрос к API должен укладываться в фиксированное количество SQL-запросов
+    при любом размере страницы (иначе где-то запрос на каждую строку).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.equipment = seed_dataset()
+
+    def setUp(self):
+        cache.clear()
+        serial_index.load()
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def assertQueryBudget(self, budget, path, page_param=None, page_sizes=(2, 25), params=None, method='get',
+                          data=None, status_code=200):
+        """Проверяет запрос (для списков - с каждым размером страницы из page_sizes)"""
+        variants = [{**(params or {}), page_param: size} for size in page_sizes] if page_param else [params or {}]
+        for variant in variants:
+            with self.subTest(path=path, params=variant):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    if method == 'get':
+                        response = self.client.get(path, variant)
+                    else:
+                        response = getattr(self.client, method)(path, data, format='json')
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                self.assertEqual(response.status_code, status_code, getattr(response, 'data', None))
+                self.assertLessEqual(
+                    len(queries), budget,
+                    '\n'.join(query['sql'] for query in queries.captured_queries)
+                )
+        return response
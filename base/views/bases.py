@@ -1,11 +1,220 @@
-from rest_framework import generics, permissions
+import hashlib
+
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.db.models import Count, Max
+from rest_framework import generics, permissions, serializers
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
 
+from base.cache.bases import get_versions, version_timestamp
+from base.serializers.bases import parse_field_paths, RowMapper
 from transfer_request.models import TransferRequest
 from transfer_request.serializers import TransferRequestSerializer
 
 
-class BaseTransferRequestListView(generics.ListAPIView):
+def accepts_encoding(header, coding):
+    """
+    Разрешено ли кодирование coding заголовком Accept-Encoding с учетом q-значений:
+    'gzip;q=0' - запрещено, '*' - любое кодирование, не указанное явно.
+    """
+    qualities = {}
+    for item in (header or '').split(','):
+        name, *params = item.split(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name] = quality
+    return qualities.get(coding, qualities.get('*', 0)) > 0
+
+
+def get_serializer_query_plan(serializer, model, prefix=''):
+    """
+    Возвращает (select_related, only) для чтения данных, нужных сериализатору.
+    only равен None, если какое-то поле не удалось сопоставить с полем модели -
+    тогда загружаются все колонки.
+    """
+    select_related = []
+    only = []
+
+    for field in serializer.fields.values():
+        if field.source == '*' or isinstance(field, serializers.SerializerMethodField):
+            only = None
+            continue
+        path = prefix + '__'.join(field.source_attrs)
+
+        try:
+            model_field = model._meta.get_field(field.source_attrs[0]) if len(field.source_attrs) == 1 else None
+        except FieldDoesNotExist:
+            model_field = None
+        if model_field is None or not model_field.concrete:
+            only = None
+            continue
+
+        if only is not None:
+            only.append(path)
+        if isinstance(field, serializers.BaseSerializer) and not isinstance(field, serializers.ListSerializer):
+            select_related.append(path)
+            nested_select, nested_only = get_serializer_query_plan(field, model_field.related_model, path + '__')
+            select_related.extend(nested_select)
+            if only is not None and nested_only is not None:
+                only.extend(nested_only)
+            else:
+                only = None
+
+    return select_related, only
+
+
+class SparseFieldsetMixin:
+    """
+    Миксин для представлений с параметрами ?fields= и ?expand=
+    (см. SparseFieldsetSerializerMixin).
+    Под выбранные поля подстраивается и запрос: select_related только для
+    раскрытых связей, only() только для нужных колонок.
+    """
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def get_sparse_fieldset(self):
+        request = getattr(self, 'request', None)
+        if request is None:
+            return None
+        params = request.query_params
+        if self.fields_query_param not in params and self.expand_query_param not in params:
+            return None
+        return (
+            parse_field_paths(params.get(self.fields_query_param, '')),
+            parse_field_paths(params.get(self.expand_query_param, '')),
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['sparse_fieldset'] = self.get_sparse_fieldset()
+        return context
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        select_related, only = get_serializer_query_plan(self.get_serializer(), queryset.model)
+        queryset = queryset.select_related(None)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if only is not None:
+            queryset = queryset.only(*only)
+        return queryset
+
+
+class FastListMixin:
+    """
+    Миксин для списков только на чтение: данные читаются через values()
+    и собираются RowMapper без создания моделей и сериализаторов на каждую строку.
+    Формат ответа совпадает с обычным сериализатором.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        mapper = RowMapper(self.get_serializer())
+        rows = mapper.values(queryset)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(mapper.map(page))
+        return Response(mapper.map(rows))
+
+
+class ConditionalGetMixin:
+    """
+    Условные GET-запросы (If-None-Match / If-Modified-Since).
+    Перед построением ответа выполняется дешевый запрос-валидатор
+    (get_validator), и если данные не изменились - сразу отдается 304
+    без основного запроса и сериализации.
+
+    В ETag входят адрес запроса (фильтры, поля, страница), пользователь,
+    результат валидатора и версии связанных данных conditional_versions
+    (см. base.cache.bases) - переименование справочника или владельца
+    не меняет updated_at оборудования. Версии читаются из общего кэша
+    (проверка base.E001), иначе другие воркеры отвечали бы 304 со старыми названиями.
+    """
+    conditional_versions = ()
+
+    def get_validator(self):
+        """
+        Возвращает (значение для ETag, время изменения datetime или None)
+        или None, если условный ответ невозможен.
+        """
+        raise NotImplementedError
+
+    def get_conditional_headers(self):
+        validator = self.get_validator()
+        if validator is None:
+            return None, None
+        value, last_modified = validator
+        versions = get_versions(*self.conditional_versions) if self.conditional_versions else {}
+
+        source = repr((self.request.get_full_path(), self.request.user.pk, value, sorted(versions.items())))
+        etag = '"%s"' % hashlib.md5(source.encode()).hexdigest()
+
+        timestamps = [version_timestamp(version) for version in versions.values()]
+        if last_modified is not None:
+            timestamps.append(last_modified.timestamp())
+        return etag, int(max(timestamps)) if timestamps else None
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_conditional_headers()
+        if etag is None:
+            return super().get(request, *args, **kwargs)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            # Кэшировать можно только в браузере и только с перепроверкой
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+
+class ConditionalListMixin(ConditionalGetMixin):
+    """Валидатор списка: max(updated_at) и количество записей отфильтрованного queryset"""
+    updated_at_field = 'updated_at'
+
+    def get_validator(self):
+        state = self.filter_queryset(self.get_queryset()).order_by().aggregate(
+            last_modified=Max(self.updated_at_field), count=Count('pk')
+        )
+        return (state['last_modified'], state['count']), state['last_modified']
+
+
+class ConditionalRetrieveMixin(ConditionalGetMixin):
+    """
+    Валидатор объекта: updated_at одной записи.
+    Если объекта нет или нет доступа - обычная обработка (404/403).
+    """
+    updated_at_field = 'updated_at'
+
+    def get_validator(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        filter_kwargs = {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        found = self.filter_queryset(self.get_queryset()).filter(**filter_kwargs).values_list(
+            'pk', self.updated_at_field
+        ).first()
+        if found is None:
+            return None
+        return found, found[1]
+
+
+class BaseTransferRequestListView(FastListMixin, SparseFieldsetMixin, generics.ListAPIView):
     """
     Базовый класс для представлений списка заявок на перемещение оборудования.
     """
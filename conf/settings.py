@@ -72,8 +72,9 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': ('rest_framework_simplejwt.authentication.JWTAuthentication',),
 
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',  # JSON (основной)
-        'rest_framework.renderers.BrowsableAPIRenderer',  # Веб-интерфейс DRF (удобно для тестов)
+        # Рендереры DRF с замером времени рендеринга (base/middleware/timing.py)
+        'base.renderers.bases.JSONRenderer',  # JSON (основной)
+        'base.renderers.bases.BrowsableAPIRenderer',  # Веб-интерфейс DRF (удобно для тестов)
     ],
 
     'DEFAULT_THROTTLE_RATES': {
@@ -97,6 +98,7 @@ REST_FRAMEWORK = {
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', '').split(',')
 
 MIDDLEWARE = [
+    'base.middleware.timing.RequestTimingMiddleware',  # Server-Timing по заголовку X-Request-Timing
     'corsheaders.middleware.CorsMiddleware',  # CROS
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -147,6 +149,20 @@ DATABASES = {
     }
 }
 
+# Кэш. Версии справочников, счетчиков заявок и ETag (base.cache.bases) должны быть общими
+# для всех процессов. По умолчанию - файлы на диске (общие для воркеров одного сервера),
+# для нескольких серверов нужен Redis или Memcached. Кэш в памяти процесса (LocMemCache)
+# без DEBUG запрещен проверкой base.E001
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+    }
+}
+if CACHES['default']['BACKEND'].endswith('FileBasedCache'):
+    # Версии вытесняются вместе с данными - это только промах, не устаревшие данные
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000))}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -195,10 +211,39 @@ LOGIN_REDIRECT_URL = 'user-profile'
 LOGOUT_REDIRECT_URL = 'login'
 
 #Почта
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Для проверки без SMTP: django.core.mail.backends.console.EmailBackend или filebased.EmailBackend (+ EMAIL_FILE_PATH)
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', os.path.join(BASE_DIR, 'sent_emails'))
 EMAIL_HOST = os.getenv('EMAIL_HOST')
 EMAIL_PORT = os.getenv('EMAIL_PORT', 587)  # 587 - значение по умолчанию
 EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'  # Преобразуем строку в bool
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
+
+# Очередь писем (transfer_request/outbox.py, команда send_outbox_emails)
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 5))
+EMAIL_OUTBOX_RETRY_SECONDS = int(os.getenv('EMAIL_OUTBOX_RETRY_SECONDS', 60))
+
+# Фоновые задачи (выгрузки и т.д.): количество потоков в пуле
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', 2))
+
+# Замер времени запросов (base/middleware/timing.py): доля запросов, которые пишутся в лог
+REQUEST_TIMING_SAMPLE_RATE = float(os.getenv('REQUEST_TIMING_SAMPLE_RATE', 0))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'base.middleware.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Equipment, EquipmentType, Manufacturer,  LegalEntity
+from .models import Equipment, EquipmentType, Manufacturer,  LegalEntity, ExportJob, InventorySummary, OwnershipInterval
 
 from django.utils.html import format_html
 
@@ -29,3 +29,23 @@ class LegalEntityAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('public_id', 'format', 'status', 'is_stale', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'format')
+
+
+@admin.register(InventorySummary)
+class InventorySummaryAdmin(admin.ModelAdmin):
+    list_display = ('type', 'manufacturer', 'legal_entity', 'decommissioned', 'is_assigned', 'count')
+    list_filter = ('decommissioned', 'is_assigned', 'type')
+    readonly_fields = ('key', 'type', 'manufacturer', 'legal_entity', 'decommissioned', 'is_assigned', 'count')
+
+
+@admin.register(OwnershipInterval)
+class OwnershipIntervalAdmin(admin.ModelAdmin):
+    list_display = ('equipment', 'owner', 'valid_from', 'valid_to')
+    list_select_related = ('equipment', 'owner')
+    search_fields = ('equipment__serial_number', 'owner__username')
+    date_hierarchy = 'valid_from'
+    readonly_fields = ('equipment', 'owner', 'valid_from', 'valid_to')
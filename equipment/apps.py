@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class EquipmentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'equipment'
+
+    def ready(self):
+        # Импортируем сигналы при загрузке приложения
+        import equipment.signals
+
+        from django.core.checks import register, Tags
+        from base.checks.bases import check_shared_cache
+        register(check_shared_cache, Tags.caches)
@@ -0,0 +1,34 @@
+"""
+Производные данные, которые меняются вместе с оборудованием: сводка
+(InventorySummary), периоды владения (OwnershipInterval) и индекс
+нечеткого поиска номеров в текущем процессе.
+
+apply_equipment_changes вызывает сигнал post_save (signals.py) и массовые
+операции через bulk_update, которые сигналы не вызывают (пакетное
+принятие заявок), - так оба пути обновляют одно и то же.
+"""
+from django.db import transaction
+
+from equipment.fuzzy import serial_index
+from equipment.ownership import record_owner_changes
+from equipment.summary import apply_changes, equipment_state
+
+
+def apply_equipment_changes(changes, at=None):
+    """
+    changes - [(оборудование после сохранения, группа сводки до сохранения, владелец до сохранения)],
+    для нового оборудования группа и владелец - None. at - время смены владельца.
+    Вызывается в транзакции сохранения; индекс номеров обновляется после ее фиксации.
+    """
+    summary_changes, owner_changes = [], []
+    for equipment, previous_state, previous_owner_id in changes:
+        summary_changes.append((equipment_state(equipment), 1))
+        if previous_state is not None:
+            summary_changes.append((previous_state, -1))
+        if equipment.current_owner_id != previous_owner_id:
+            owner_changes.append((equipment.pk, equipment.current_owner_id))
+
+    apply_changes(summary_changes)
+    record_owner_changes(owner_changes, at)
+    saved = [equipment for equipment, _previous_state, _previous_owner_id in changes]
+    transaction.on_commit(lambda: serial_index.update_many(saved))
@@ -0,0 +1,337 @@
+"""
+Потоковая выгрузка оборудования.
+
+Строки читаются из БД порциями, а XLSX-файл собирается «на лету»:
+лист пишется прямо в zip-архив, который сразу отдаётся клиенту,
+поэтому расход памяти не зависит от количества строк.
+
+Кроме XLSX доступны CSV и NDJSON, колонки для всех форматов
+описаны один раз в EXPORT_COLUMNS.
+
+Для тяжелых выгрузок есть фоновые задания (ExportJob): файл собирается
+в пуле потоков и переиспользуется, пока данные не изменились.
+"""
+import csv
+import hashlib
+import json
+import logging
+import tempfile
+import zipfile
+from datetime import timedelta
+from xml.sax.saxutils import escape
+
+from django.core.files import File
+from django.db.models import Count, Max
+from django.utils import timezone
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.utils import get_column_letter
+
+from base.tasks.bases import run_on_commit
+from equipment.models import Equipment, ExportJob
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк читать из БД за один запрос
+EXPORT_CHUNK_SIZE = 2000
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CSV_CONTENT_TYPE = 'text/csv; charset=utf-8'
+NDJSON_CONTENT_TYPE = 'application/x-ndjson; charset=utf-8'
+
+# Через сколько незавершенное задание считается зависшим и не переиспользуется
+EXPORT_JOB_TIMEOUT = timedelta(minutes=30)
+
+
+class ExportColumn:
+    """
+    Описание колонки выгрузки, общее для всех форматов.
+    header - заголовок в XLSX/CSV, key - ключ в NDJSON,
+    sources - поля, которые нужно прочитать из БД,
+    getter - функция, получающая значение из словаря с этими полями.
+    """
+
+    def __init__(self, header, key, sources, getter=None):
+        self.header = header
+        self.key = key
+        self.sources = sources
+        self.getter = getter or (lambda row: row[sources[0]])
+
+    def display(self, row):
+        """Значение в том виде, в котором оно попадает в Excel"""
+        value = self.getter(row)
+        if isinstance(value, bool):
+            return 'Да' if value else 'Нет'
+        return value or '-'
+
+
+def _owner_full_name(row):
+    """Повторяет CustomUser.get_full_name без загрузки объекта пользователя; None, если ФИО нет"""
+    if row['current_owner_id'] is None:
+        return None
+    return ("%s %s" % (row['current_owner__last_name'], row['current_owner__middle_name'])).strip() or None
+
+
+EXPORT_COLUMNS = (
+    ExportColumn("Серийный номер", 'serial_number', ('serial_number',)),
+    ExportColumn("Инвентарный номер", 'inverter_number', ('inverter_number',)),
+    ExportColumn("Модель", 'model', ('model',)),
+    ExportColumn("Тип техники", 'type', ('type__name',)),
+    ExportColumn("Производитель", 'manufacturer', ('manufacturer__name',)),
+    ExportColumn("Поставщик", 'supplier', ('supplier',)),
+    ExportColumn("Списано", 'decommissioned_equipment', ('decommissioned_equipment',)),
+    ExportColumn("Номер счета", 'invoice_info', ('invoice_info',)),
+    ExportColumn(
+        "Текущий владелец",
+        'current_owner',
+        ('current_owner_id', 'current_owner__last_name', 'current_owner__middle_name'),
+        _owner_full_name,
+    ),
+    ExportColumn("Юридическое лицо", 'legal_entity', ('legal_entity__name',)),
+)
+
+
+def iter_export_rows(queryset=None, columns=EXPORT_COLUMNS, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Итератор по строкам выгрузки (словарям с полями из columns).
+    Данные читаются через values() порциями по chunk_size строк.
+    """
+    if queryset is None:
+        queryset = Equipment.objects.all()
+    sources = []
+    for column in columns:
+        sources.extend(source for source in column.sources if source not in sources)
+    return queryset.order_by('pk').values(*sources).iterator(chunk_size=chunk_size)
+
+
+class _StreamBuffer:
+    """
+    Буфер без возможности перемотки: zipfile пишет в него данные,
+    а генератор периодически забирает накопленное и отдаёт клиенту.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+_CONTENT_TYPES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_ROOT_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{title}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_WORKBOOK_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+_STYLES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+_SHEET_HEAD_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+
+_SHEET_TAIL_XML = '</sheetData></worksheet>'
+
+
+def _xlsx_row(index, letters, values):
+    """XML одной строки листа, все значения пишутся как inline-строки"""
+    cells = []
+    for letter, value in zip(letters, values):
+        text = escape(ILLEGAL_CHARACTERS_RE.sub('', str(value)))
+        cells.append(
+            f'<c r="{letter}{index}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+        )
+    return f'<row r="{index}">{"".join(cells)}</row>'
+
+
+def stream_xlsx(rows, columns=EXPORT_COLUMNS, title="Оборудование", flush_every=500):
+    """
+    Генератор байтов XLSX-файла.
+    Лист записывается напрямую в zip-архив, накопленные данные отдаются
+    каждые flush_every строк, поэтому в памяти не хранится весь файл.
+    """
+    buffer = _StreamBuffer()
+    letters = [get_column_letter(index) for index in range(1, len(columns) + 1)]
+
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES_XML)
+        archive.writestr('_rels/.rels', _ROOT_RELS_XML)
+        archive.writestr('xl/workbook.xml', _WORKBOOK_XML.format(title=escape(title, {'"': '&quot;'})))
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS_XML)
+        archive.writestr('xl/styles.xml', _STYLES_XML)
+        yield buffer.pop()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(_SHEET_HEAD_XML.encode())
+            sheet.write(_xlsx_row(1, letters, [column.header for column in columns]).encode())
+
+            for index, row in enumerate(rows, start=2):
+                values = [column.display(row) for column in columns]
+                sheet.write(_xlsx_row(index, letters, values).encode())
+                if index % flush_every == 0:
+                    data = buffer.pop()
+                    if data:
+                        yield data
+
+            sheet.write(_SHEET_TAIL_XML.encode())
+
+    yield buffer.pop()
+
+
+class _LineBuffer:
+    """Принимает строку от csv.writer и сразу ее возвращает"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows, columns=EXPORT_COLUMNS, flush_every=500):
+    """Генератор байтов CSV: те же заголовки и значения, что и в XLSX"""
+    writer = csv.writer(_LineBuffer())
+    lines = [writer.writerow([column.header for column in columns])]
+
+    for index, row in enumerate(rows, start=1):
+        lines.append(writer.writerow([column.display(row) for column in columns]))
+        if index % flush_every == 0:
+            yield ''.join(lines).encode()
+            lines = []
+
+    yield ''.join(lines).encode()
+
+
+def stream_ndjson(rows, columns=EXPORT_COLUMNS, flush_every=500):
+    """
+    Генератор байтов NDJSON: по одному JSON-объекту на строку.
+    Значения отдаются как есть (null, true/false), без замены на "-" и "Да"/"Нет".
+    """
+    lines = []
+
+    for index, row in enumerate(rows, start=1):
+        record = {column.key: column.getter(row) for column in columns}
+        lines.append(json.dumps(record, ensure_ascii=False))
+        lines.append('\n')
+        if index % flush_every == 0:
+            yield ''.join(lines).encode()
+            lines = []
+
+    yield ''.join(lines).encode()
+
+
+# Формат -> (content type, расширение файла, генератор байтов)
+EXPORT_FORMATS = {
+    'xlsx': (XLSX_CONTENT_TYPE, 'xlsx', stream_xlsx),
+    'csv': (CSV_CONTENT_TYPE, 'csv', stream_csv),
+    'ndjson': (NDJSON_CONTENT_TYPE, 'ndjson', stream_ndjson),
+}
+
+
+def export_fingerprint():
+    """
+    Отпечаток текущего состояния оборудования: количество строк
+    и время последнего изменения. Меняется при любом добавлении,
+    удалении или сохранении оборудования.
+    """
+    state = Equipment.objects.aggregate(count=Count('id'), updated_at=Max('updated_at'))
+    raw = f"{state['count']}:{state['updated_at'].isoformat() if state['updated_at'] else ''}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def start_export_job(user, export_format='xlsx'):
+    """
+    Возвращает (задание, создано_ли).
+    Если есть готовое или формирующееся задание для тех же данных,
+    возвращается оно, иначе создается новое и ставится в фоновый пул.
+    """
+    fingerprint = export_fingerprint()
+    job = ExportJob.objects.filter(
+        format=export_format,
+        fingerprint=fingerprint,
+        is_stale=False,
+        status__in=[ExportJob.STATUS_PENDING, ExportJob.STATUS_RUNNING, ExportJob.STATUS_READY],
+    ).order_by('-created_at').first()
+
+    if job and (job.status == ExportJob.STATUS_READY or job.created_at >= timezone.now() - EXPORT_JOB_TIMEOUT):
+        return job, False
+
+    job = ExportJob.objects.create(format=export_format, fingerprint=fingerprint, created_by=user)
+    run_on_commit(build_export_job, job.pk)
+    return job, True
+
+
+def build_export_job(job_id):
+    """Формирует файл для задания (выполняется в фоновом потоке)"""
+    job = ExportJob.objects.get(pk=job_id)
+    job.status = ExportJob.STATUS_RUNNING
+    job.save(update_fields=['status'])
+
+    _content_type, extension, writer = EXPORT_FORMATS[job.format]
+    try:
+        with tempfile.TemporaryFile() as tmp:
+            for chunk in writer(iter_export_rows()):
+                tmp.write(chunk)
+            tmp.seek(0)
+            job.file.save(f'equipment_list_{job.public_id}.{extension}', File(tmp), save=False)
+        job.status = ExportJob.STATUS_READY
+    except Exception as exc:
+        logger.exception("Не удалось сформировать выгрузку %s", job.public_id)
+        job.status = ExportJob.STATUS_FAILED
+        job.error = str(exc)
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'file', 'error', 'finished_at'])
@@ -0,0 +1,191 @@
+"""
+Генерация синтетического парка оборудования для нагрузочных тестов.
+
+Все объекты создаются bulk_create (сигналы не вызываются), поэтому
+поисковые документы считаются здесь же, а сводка пересобирается в конце.
+Сгенерированные записи помечаются префиксом (логины, серийные номера,
+названия юрлиц) и удаляются по нему же (clear_fleet).
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from equipment.models import Equipment, EquipmentType, Manufacturer, LegalEntity, search_document_from_values
+from equipment.ownership import backfill_ownership
+from equipment.summary import rebuild_inventory_summary
+from transfer_request.models import TransferRequest
+from user.models import Position
+
+User = get_user_model()
+
+FLEET_BATCH_SIZE = 1000
+
+EQUIPMENT_TYPES = {
+    'Ноутбук': ['ThinkPad T14', 'ThinkPad X1', 'Latitude 5440', 'EliteBook 840', 'MacBook Air'],
+    'Монитор': ['P2422H', 'U2723QE', 'E24 G5', '27UL500'],
+    'Телефон': ['iPhone 13', 'Galaxy A54', 'Redmi Note 12'],
+    'Планшет': ['iPad 10', 'Galaxy Tab S8', 'MatePad 11'],
+    'МФУ': ['LaserJet M428', 'WorkCentre 3345', 'i-SENSYS MF443'],
+}
+MANUFACTURERS = ['Lenovo', 'Dell', 'HP', 'Apple', 'Samsung', 'Xiaomi', 'Huawei', 'LG', 'Canon', 'Xerox']
+POSITIONS = ['Инженер', 'Прораб', 'Бухгалтер', 'Менеджер', 'Кладовщик', 'Юрист']
+FIRST_NAMES = ['Иван', 'Петр', 'Анна', 'Мария', 'Сергей', 'Ольга', 'Алексей', 'Елена']
+LAST_NAMES = ['Иванов', 'Петров', 'Сидоров', 'Кузнецов', 'Смирнов', 'Попов', 'Волков', 'Соколов']
+MIDDLE_NAMES = ['Иванович', 'Петрович', 'Сергеевич', 'Алексеевич', 'Андреевич']
+
+# Доли статусов исторических заявок: большинство принято
+TRANSFER_STATUS_WEIGHTS = {'accepted': 0.75, 'rejected': 0.15, 'pending': 0.10}
+
+
+def _get_or_create_named(model, names, **defaults):
+    existing = dict(model.objects.filter(name__in=names).values_list('name', 'pk'))
+    missing = [model(name=name, **{key: value(name) for key, value in defaults.items()})
+               for name in names if name not in existing]
+    model.objects.bulk_create(missing)
+    return list(model.objects.filter(name__in=names))
+
+
+def clear_fleet(prefix):
+    """Удаляет ранее сгенерированные данные с префиксом"""
+    with transaction.atomic():
+        TransferRequest.objects.filter(equipment__serial_number__startswith=f'{prefix.upper()}-').delete()
+        Equipment.objects.filter(serial_number__startswith=f'{prefix.upper()}-').delete()
+        User.objects.filter(username__startswith=f'{prefix}_').delete()
+        LegalEntity.objects.filter(name__startswith=f'{prefix} ').delete()
+    rebuild_inventory_summary()
+
+
+def generate_fleet(users=200, legal_entities=5, equipment=10000, transfers=5000, days=365,
+                   password='loadtest', prefix='fleet', seed=None, log=None):
+    """
+    Создает users пользователей в legal_entities юрлицах, equipment единиц
+    оборудования и transfers исторических заявок за последние days дней.
+    Заявки строятся по порядку времени: принятая заявка меняет владельца,
+    на одно оборудование не больше одной заявки в ожидании.
+    Возвращает словарь с количеством созданных объектов.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    now = timezone.now()
+    serial_prefix = prefix.upper()
+
+    types = _get_or_create_named(EquipmentType, list(EQUIPMENT_TYPES))
+    manufacturers = _get_or_create_named(Manufacturer, MANUFACTURERS)
+    positions = _get_or_create_named(Position, POSITIONS)
+    organizations = _get_or_create_named(
+        LegalEntity, [f'{prefix} ЮЛ {index}' for index in range(1, legal_entities + 1)],
+        short_name=lambda name: name[-50:],
+    )
+    log(f'Справочники: {len(types)} типов, {len(manufacturers)} производителей, {len(organizations)} юрлиц')
+
+    # Пароль хэшируется один раз - PBKDF2 на каждого пользователя занял бы минуты
+    password_hash = make_password(password)
+    start = User.objects.filter(username__startswith=f'{prefix}_').count()
+    new_users = []
+    for index in range(start, start + users):
+        new_users.append(User(
+            username=f'{prefix}_{index}',
+            email=f'{prefix}_{index}@example.com',
+            password=password_hash,
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            middle_name=rng.choice(MIDDLE_NAMES),
+            position=rng.choice(positions),
+            organization=rng.choice(organizations),
+            is_advanced_access=rng.random() < 0.05,
+        ))
+    new_users = User.objects.bulk_create(new_users, batch_size=FLEET_BATCH_SIZE)
+    log(f'Пользователей: {len(new_users)}')
+
+    # Начальные владельцы, затем история заявок в памяти - итоговый владелец попадает в оборудование
+    start = Equipment.objects.filter(serial_number__startswith=f'{serial_prefix}-').count()
+    items = []
+    for index in range(start, start + equipment):
+        equipment_type = rng.choice(types)
+        items.append({
+            'serial_number': f'{serial_prefix}-{index:07d}',
+            'inverter_number': f'{serial_prefix}-INV-{index:07d}' if rng.random() < 0.8 else None,
+            'type': equipment_type,
+            'model': rng.choice(EQUIPMENT_TYPES.get(equipment_type.name, ['Generic'])),
+            'manufacturer': rng.choice(manufacturers),
+            'legal_entity': rng.choice(organizations),
+            'owner': rng.choice(new_users) if new_users and rng.random() < 0.9 else None,
+            'decommissioned': rng.random() < 0.05,
+            'pending': False,
+        })
+
+    history = []
+    statuses = list(TRANSFER_STATUS_WEIGHTS)
+    weights = list(TRANSFER_STATUS_WEIGHTS.values())
+    step = timedelta(days=days) / max(transfers, 1)
+    candidates = [item for item in items if item['owner'] is not None and not item['decommissioned']]
+    for index in range(transfers if len(new_users) > 1 else 0):
+        if not candidates:
+            break
+        item = rng.choice(candidates)
+        if item['pending']:
+            continue
+        receiver = rng.choice(new_users)
+        if receiver == item['owner']:
+            continue
+        status = rng.choices(statuses, weights)[0]
+        requested_at = now - timedelta(days=days) + step * index
+        history.append({
+            'item': item,
+            'sender': item['owner'],
+            'receiver': receiver,
+            'status': status,
+            'requested_at': requested_at,
+            'accepted_at': None if status == 'pending' else requested_at + timedelta(hours=rng.randint(1, 72)),
+        })
+        if status == 'accepted':
+            item['owner'] = receiver
+        elif status == 'pending':
+            item['pending'] = True
+
+    objects = []
+    for item in items:
+        owner = item['owner']
+        objects.append(Equipment(
+            serial_number=item['serial_number'],
+            inverter_number=item['inverter_number'],
+            type=item['type'],
+            model=item['model'],
+            manufacturer=item['manufacturer'],
+            legal_entity=item['legal_entity'],
+            current_owner=owner,
+            decommissioned_equipment=item['decommissioned'],
+            has_pending_transfer=item['pending'],
+            search_document=search_document_from_values(
+                item['serial_number'], item['model'], item['type'].name, item['manufacturer'].name,
+                owner.username if owner else None, item['inverter_number'],
+            ),
+        ))
+    for item, created in zip(items, Equipment.objects.bulk_create(objects, batch_size=FLEET_BATCH_SIZE)):
+        item['equipment'] = created
+    log(f'Оборудования: {len(objects)}')
+
+    requests = [
+        TransferRequest(
+            equipment=record['item']['equipment'],
+            sender=record['sender'],
+            receiver=record['receiver'],
+            status=record['status'],
+            accepted_at=record['accepted_at'],
+        )
+        for record in history
+    ]
+    requests = TransferRequest.objects.bulk_create(requests, batch_size=FLEET_BATCH_SIZE)
+    # requested_at - auto_now_add, bulk_create записывает текущее время; bulk_update его не трогает
+    for request, record in zip(requests, history):
+        request.requested_at = record['requested_at']
+    TransferRequest.objects.bulk_update(requests, ['requested_at'], batch_size=FLEET_BATCH_SIZE)
+    log(f'Заявок: {len(requests)}')
+
+    rebuild_inventory_summary()
+    backfill_ownership(Equipment.objects.filter(pk__in=[item['equipment'].pk for item in items]))
+    return {'users': len(new_users), 'equipment': len(objects), 'transfers': len(requests)}
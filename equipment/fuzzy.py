@@ -0,0 +1,193 @@
+"""
+Нечеткий поиск оборудования по серийному и инвентарному номеру.
+
+Номера хранятся в памяти процесса в нормализованном виде
+(без регистра, пробелов и дефисов, O -> 0, I -> 1, кириллица -> латиница),
+поэтому точное совпадение ищется по словарю, а похожие номера
+ранжируются через RapidFuzz. Индекс обновляется сигналами после фиксации
+транзакции и периодически догружает изменения из БД (другие процессы).
+
+Номера хранятся и целиком, и по владельцам, поэтому поиск сотрудника
+не перебирает весь парк. RapidFuzz сравнивает номера без блокировки -
+с копией, которая пересоздается только после изменения индекса.
+"""
+import re
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from rapidfuzz import fuzz, process
+
+from equipment.models import Equipment
+
+# Похожие по написанию символы: кириллица, набранная вместо латиницы, и O/0, I/1
+_CONFUSABLES = str.maketrans({
+    'А': 'A', 'В': 'B', 'Е': 'E', 'К': 'K', 'М': 'M', 'Н': 'H', 'О': '0',
+    'Р': 'P', 'С': 'C', 'Т': 'T', 'У': 'Y', 'Х': 'X', 'І': '1',
+    'O': '0', 'I': '1',
+})
+_SEPARATORS_RE = re.compile(r'[\W_]+')
+
+LookupMatch = namedtuple('LookupMatch', ['pk', 'field', 'score', 'exact'])
+
+LOOKUP_FIELDS = ('serial_number', 'inverter_number')
+
+
+def normalize_number(value):
+    """Ключ для сравнения номеров: 'sn-0O1 i' -> 'SN0011'"""
+    if not value:
+        return ''
+    return _SEPARATORS_RE.sub('', str(value).upper()).translate(_CONFUSABLES)
+
+
+class SerialNumberIndex:
+    """Индекс нормализованных номеров оборудования в памяти процесса"""
+
+    def __init__(self, refresh_interval=None):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self._choices = {}  # (pk, поле) -> нормализованный номер
+        self._owner_choices = defaultdict(dict)  # id владельца -> {(pk, поле): нормализованный номер}
+        self._exact = defaultdict(set)  # нормализованный номер -> {(pk, поле)}
+        self._owners = {}  # pk -> id владельца
+        self._snapshots = {}  # id владельца или None (все) -> копия номеров для поиска
+        self._loaded = False
+        self._synced_at = 0
+        self._last_updated_at = None
+
+    def _get_refresh_interval(self):
+        if self.refresh_interval is not None:
+            return self.refresh_interval
+        return getattr(settings, 'EQUIPMENT_LOOKUP_REFRESH_SECONDS', 30)
+
+    def _rows(self, queryset):
+        return queryset.values_list('pk', 'current_owner_id', 'updated_at', *LOOKUP_FIELDS)
+
+    def load(self):
+        """Полная загрузка индекса из БД"""
+        with self._lock:
+            self._choices.clear()
+            self._owner_choices.clear()
+            self._exact.clear()
+            self._owners.clear()
+            self._snapshots.clear()
+            self._last_updated_at = None
+            for row in self._rows(Equipment.objects.all()).iterator(chunk_size=5000):
+                self._apply_row(row)
+            self._loaded = True
+            self._synced_at = time.monotonic()
+
+    def sync(self):
+        """
+        Загружает индекс при первом обращении, затем не чаще раза в refresh_interval
+        догружает оборудование, измененное после последней синхронизации.
+        Если число строк не совпало (были удаления) - перечитывает индекс целиком.
+        """
+        if not self._loaded:
+            self.load()
+            return
+        if time.monotonic() - self._synced_at < self._get_refresh_interval():
+            return
+
+        with self._lock:
+            queryset = Equipment.objects.all()
+            if self._last_updated_at is not None:
+                queryset = queryset.filter(updated_at__gt=self._last_updated_at)
+            for row in self._rows(queryset):
+                self._apply_row(row)
+
+            if Equipment.objects.count() != len(self._owners):
+                self.load()
+            self._synced_at = time.monotonic()
+
+    def update(self, equipment):
+        """Обновление одной записи (после сохранения)"""
+        self.update_many([equipment])
+
+    def update_many(self, equipment_list):
+        """Обновление нескольких записей (после bulk_update)"""
+        if not self._loaded:
+            return
+        with self._lock:
+            for equipment in equipment_list:
+                self._apply_row((
+                    equipment.pk, equipment.current_owner_id, equipment.updated_at,
+                    *(getattr(equipment, field) for field in LOOKUP_FIELDS)
+                ))
+
+    def remove(self, pk):
+        """Удаление записи (после удаления)"""
+        if not self._loaded:
+            return
+        with self._lock:
+            self._discard(pk)
+
+    def lookup(self, query, limit=5, owner_id=None, score_cutoff=60):
+        """
+        Возвращает до limit совпадений LookupMatch: сначала точные (после нормализации),
+        затем похожие по убыванию схожести. owner_id ограничивает поиск оборудованием владельца.
+        """
+        self.sync()
+        key = normalize_number(query)
+        if not key:
+            return []
+
+        with self._lock:
+            matches = {}
+            for pk, field in self._exact.get(key, ()):
+                if owner_id is None or self._owners.get(pk) == owner_id:
+                    matches.setdefault(pk, LookupMatch(pk, field, 100.0, True))
+            choices = self._get_snapshot(owner_id) if len(matches) < limit else None
+
+        if choices:
+            found = process.extract(
+                key, choices, scorer=fuzz.ratio, limit=limit * len(LOOKUP_FIELDS), score_cutoff=score_cutoff
+            )
+            for _value, score, (pk, field) in found:
+                matches.setdefault(pk, LookupMatch(pk, field, score, False))
+
+        return sorted(matches.values(), key=lambda match: (not match.exact, -match.score))[:limit]
+
+    def _get_snapshot(self, owner_id):
+        """Копия номеров (всех или владельца); не меняется, пока по ней идет поиск"""
+        snapshot = self._snapshots.get(owner_id)
+        if snapshot is None:
+            source = self._choices if owner_id is None else self._owner_choices.get(owner_id, {})
+            snapshot = self._snapshots[owner_id] = dict(source)
+        return snapshot
+
+    def _apply_row(self, row):
+        pk, owner_id, updated_at, *numbers = row
+        self._discard(pk)
+        self._owners[pk] = owner_id
+        self._snapshots.pop(None, None)
+        self._snapshots.pop(owner_id, None)
+        for field, number in zip(LOOKUP_FIELDS, numbers):
+            key = normalize_number(number)
+            if key:
+                self._choices[(pk, field)] = key
+                self._exact[key].add((pk, field))
+                if owner_id is not None:
+                    self._owner_choices[owner_id][(pk, field)] = key
+        if updated_at and (self._last_updated_at is None or updated_at > self._last_updated_at):
+            self._last_updated_at = updated_at
+
+    def _discard(self, pk):
+        owner_id = self._owners.pop(pk, None)
+        self._snapshots.pop(None, None)
+        self._snapshots.pop(owner_id, None)
+        owner_choices = self._owner_choices.get(owner_id)
+        for field in LOOKUP_FIELDS:
+            if owner_choices is not None:
+                owner_choices.pop((pk, field), None)
+            key = self._choices.pop((pk, field), None)
+            if key is not None:
+                self._exact[key].discard((pk, field))
+                if not self._exact[key]:
+                    del self._exact[key]
+        if owner_choices is not None and not owner_choices:
+            del self._owner_choices[owner_id]
+
+
+serial_index = SerialNumberIndex()
@@ -0,0 +1,355 @@
+"""
+Массовая загрузка оборудования из файла в формате выгрузки (XLSX, CSV, NDJSON).
+
+Файл читается построчно, справочники (тип, производитель, юрлицо)
+загружаются по одному запросу на таблицу, а оборудование сохраняется
+порциями через bulk_create(update_conflicts=True): новое создается,
+существующее (по серийному номеру) обновляется. У существующего оборудования
+обновляются только колонки, которые есть в файле (или в строке NDJSON),
+остальные поля сохраняют прежние значения.
+Колонка "Текущий владелец" игнорируется - ФИО не определяет пользователя
+однозначно, владелец меняется только через передачу.
+
+bulk_create не вызывает сигналы, поэтому поисковый документ и изменение
+сводки (InventorySummary) по загруженным строкам считаются здесь же.
+"""
+import codecs
+import csv
+import json
+import logging
+
+from django.db import IntegrityError, transaction
+from openpyxl import load_workbook
+
+from equipment.exports import EXPORT_COLUMNS
+from equipment.models import Equipment, EquipmentType, Manufacturer, LegalEntity, search_document_from_values
+from equipment.summary import apply_changes, equipment_state, stored_row_state
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк сохранять одним запросом
+IMPORT_CHUNK_SIZE = 1000
+
+IMPORT_FORMATS = ('xlsx', 'csv', 'ndjson')
+
+# Ключ колонки -> модель справочника
+LOOKUP_COLUMNS = {
+    'type': EquipmentType,
+    'manufacturer': Manufacturer,
+    'legal_entity': LegalEntity,
+}
+
+# Поля оборудования, которые берутся из файла как есть
+VALUE_FIELDS = ('serial_number', 'inverter_number', 'model', 'supplier', 'invoice_info')
+
+REQUIRED_FIELDS = ('serial_number', 'model')
+
+# Поля, которые обновляются у существующего оборудования, если колонка есть в файле
+UPDATE_FIELDS = (
+    'inverter_number', 'model', 'type', 'manufacturer', 'supplier',
+    'decommissioned_equipment', 'invoice_info', 'legal_entity',
+)
+
+# Поля, которые обновляются всегда
+COMPUTED_UPDATE_FIELDS = ('search_document', 'updated_at')
+
+# Поля существующего оборудования, которыми дополняется строка без части колонок
+STORED_FIELDS = (
+    'serial_number', 'inverter_number', 'model', 'supplier', 'invoice_info', 'decommissioned_equipment',
+    'type_id', 'manufacturer_id', 'legal_entity_id', 'current_owner_id',
+)
+
+# Пустое значение в выгрузке
+EMPTY_VALUES = ('', '-')
+
+TRUE_VALUES = ('да', 'true', '1', 'yes')
+FALSE_VALUES = ('нет', 'false', '0', 'no')
+
+
+class ImportFileError(Exception):
+    """Файл нельзя разобрать (неизвестный формат, нет обязательных колонок)"""
+
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension not in IMPORT_FORMATS:
+        raise ImportFileError(f'Неизвестный формат файла, допустимые: {", ".join(IMPORT_FORMATS)}')
+    return extension
+
+
+def _columns_by_header(header):
+    """Номера колонок файла по ключам EXPORT_COLUMNS"""
+    keys = {column.header.strip().lower(): column.key for column in EXPORT_COLUMNS}
+    keys.update({column.key: column.key for column in EXPORT_COLUMNS})
+
+    positions = {}
+    for index, title in enumerate(header):
+        key = keys.get(str(title).strip().lower()) if title is not None else None
+        if key and key not in positions:
+            positions[key] = index
+
+    missing = [key for key in REQUIRED_FIELDS if key not in positions]
+    if missing:
+        headers = {column.key: column.header for column in EXPORT_COLUMNS}
+        raise ImportFileError(f'Нет обязательных колонок: {", ".join(headers[key] for key in missing)}')
+    return positions
+
+
+def _iter_table(rows):
+    """Строки таблицы (первая - заголовок) -> (номер строки, {ключ колонки: значение})"""
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        raise ImportFileError('Файл пуст')
+    positions = _columns_by_header(header)
+
+    for number, row in enumerate(rows, start=2):
+        if not any(value not in (None, '') for value in row):
+            continue
+        yield number, {key: row[index] if index < len(row) else None for key, index in positions.items()}
+
+
+def iter_xlsx(file):
+    # read_only читает лист потоково, не загружая его целиком
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from _iter_table(workbook.worksheets[0].iter_rows(values_only=True))
+    finally:
+        workbook.close()
+
+
+def iter_csv(file):
+    yield from _iter_table(csv.reader(codecs.iterdecode(file, 'utf-8-sig')))
+
+
+def iter_ndjson(file):
+    for number, line in enumerate(codecs.iterdecode(file, 'utf-8-sig'), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, None
+            continue
+        yield number, record if isinstance(record, dict) else None
+
+
+IMPORT_READERS = {
+    'xlsx': iter_xlsx,
+    'csv': iter_csv,
+    'ndjson': iter_ndjson,
+}
+
+
+def _clean_text(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # номера из Excel читаются как числа
+    value = str(value).strip()
+    return None if value in EMPTY_VALUES else value
+
+
+def _clean_bool(value):
+    if value is None or isinstance(value, bool):
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in EMPTY_VALUES or text in FALSE_VALUES:
+        return False
+    if text in TRUE_VALUES:
+        return True
+    raise ValueError
+
+
+class EquipmentImporter:
+    """
+    Загрузка одного файла. Результат - отчет:
+    {'total', 'created', 'updated', 'errors': [{'row': номер строки, 'errors': {поле: текст}}]}
+    """
+
+    def __init__(self, chunk_size=IMPORT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.max_lengths = {field: Equipment._meta.get_field(field).max_length for field in VALUE_FIELDS}
+        # Справочники целиком: название без учета регистра -> (pk, название)
+        self.lookups = {
+            key: {name.casefold(): (pk, name) for pk, name in model.objects.values_list('pk', 'name')}
+            for key, model in LOOKUP_COLUMNS.items()
+        }
+        self.report = {'total': 0, 'created': 0, 'updated': 0, 'errors': []}
+        self._seen_serials = {}
+        self._seen_inventory = {}
+
+    def run(self, rows):
+        """rows - итератор (номер строки, словарь значений) из IMPORT_READERS"""
+        chunk = []
+        for number, record in rows:
+            self.report['total'] += 1
+            item = self._parse(number, record)
+            if item is None:
+                continue
+            chunk.append(item)
+            if len(chunk) >= self.chunk_size:
+                self._save(chunk)
+                chunk = []
+        if chunk:
+            self._save(chunk)
+        return self.report
+
+    def _error(self, number, errors):
+        self.report['errors'].append({'row': number, 'errors': errors})
+
+    def _parse(self, number, record):
+        if record is None:
+            self._error(number, {'row': 'Строка не является JSON-объектом'})
+            return None
+
+        errors = {}
+        values = {}
+        # Колонки строки: отсутствующие не меняют существующее оборудование
+        columns = {field for field in UPDATE_FIELDS if field in record}
+        for field in VALUE_FIELDS:
+            if field not in record and field not in REQUIRED_FIELDS:
+                continue
+            value = _clean_text(record.get(field))
+            if value is not None and len(value) > self.max_lengths[field]:
+                errors[field] = f'Не более {self.max_lengths[field]} символов'
+            values[field] = value
+        for field in REQUIRED_FIELDS:
+            if not values[field]:
+                errors[field] = 'Обязательное поле'
+
+        if 'decommissioned_equipment' in record:
+            try:
+                values['decommissioned_equipment'] = _clean_bool(record['decommissioned_equipment'])
+            except ValueError:
+                errors['decommissioned_equipment'] = 'Ожидается "Да" или "Нет"'
+
+        names = {}
+        for key in LOOKUP_COLUMNS:
+            if key not in record:
+                continue
+            name = _clean_text(record[key])
+            values[f'{key}_id'] = names[key] = None
+            if name is None:
+                continue
+            found = self.lookups[key].get(name.casefold())
+            if found is None:
+                errors[key] = f'Не найдено: {name}'
+            else:
+                values[f'{key}_id'], names[key] = found
+
+        serial = values['serial_number']
+        if serial and serial in self._seen_serials:
+            errors['serial_number'] = f'Повторяется в строке {self._seen_serials[serial]}'
+        inventory = values.get('inverter_number')
+        if inventory and inventory in self._seen_inventory:
+            errors['inverter_number'] = f'Повторяется в строке {self._seen_inventory[inventory]}'
+
+        if errors:
+            self._error(number, errors)
+            return None
+
+        self._seen_serials[serial] = number
+        if inventory:
+            self._seen_inventory[inventory] = number
+        return number, values, names, columns
+
+    def _save(self, chunk):
+        serials = [values['serial_number'] for _number, values, _names, _columns in chunk]
+        with transaction.atomic():
+            # Строки блокируются до изменения сводки, чтобы группа "до" не устарела
+            stored = {
+                row['serial_number']: row
+                for row in Equipment.objects.select_for_update().filter(serial_number__in=serials).values(
+                    *STORED_FIELDS, 'type__name', 'manufacturer__name', 'current_owner__username',
+                )
+            }
+            items = self._build(chunk, stored)
+            if not items:
+                return
+            try:
+                with transaction.atomic():
+                    self._upsert(items)
+            except IntegrityError:
+                # Конфликт уникальности внутри порции (например, инвентарные номера поменялись местами) -
+                # сохраняем по одной строке, чтобы найти виноватые
+                self._save_one_by_one(items)
+                return
+        for _number, _equipment, _fields, previous in items:
+            self._count(previous is None)
+
+    def _build(self, chunk, stored):
+        """Оборудование для сохранения: [(номер строки, Equipment, update_fields, прежняя строка или None)]"""
+        for _number, values, _names, _columns in chunk:
+            row = stored.get(values['serial_number'])
+            if row is not None:
+                for field in STORED_FIELDS:
+                    values.setdefault(field, row[field])
+        inventory_numbers = [values['inverter_number'] for _number, values, _names, _columns in chunk
+                             if values.get('inverter_number')]
+        taken_inventory = dict(
+            Equipment.objects.filter(inverter_number__in=inventory_numbers).values_list('inverter_number', 'serial_number')
+        )
+
+        items = []
+        for number, values, names, columns in chunk:
+            row = stored.get(values['serial_number'])
+            inventory = values.get('inverter_number')
+            if inventory and taken_inventory.get(inventory, values['serial_number']) != values['serial_number']:
+                self._error(number, {
+                    'inverter_number': f'Уже присвоен оборудованию {taken_inventory[inventory]}'
+                })
+                continue
+
+            if row is not None:
+                for key in ('type', 'manufacturer'):
+                    names.setdefault(key, row[f'{key}__name'])
+            values['search_document'] = search_document_from_values(
+                values['serial_number'], values['model'], names.get('type'), names.get('manufacturer'),
+                row and row['current_owner__username'], inventory,
+            )
+            fields = [field for field in UPDATE_FIELDS if field in columns] + list(COMPUTED_UPDATE_FIELDS)
+            items.append((number, Equipment(**values), fields, row))
+        return items
+
+    def _save_one_by_one(self, items):
+        for item in items:
+            number, _equipment, _fields, previous = item
+            try:
+                with transaction.atomic():
+                    self._upsert([item])
+            except IntegrityError as exc:
+                self._error(number, {'row': f'Конфликт уникальности: {exc}'})
+            else:
+                self._count(previous is None)
+
+    def _upsert(self, items):
+        """Сохраняет оборудование (по запросу на набор колонок) и переносит его между группами сводки"""
+        groups = {}
+        for _number, equipment, fields, _previous in items:
+            groups.setdefault(tuple(fields), []).append(equipment)
+        for fields, objects in groups.items():
+            Equipment.objects.bulk_create(
+                objects, update_conflicts=True, unique_fields=['serial_number'], update_fields=fields
+            )
+
+        changes = []
+        for _number, equipment, _fields, previous in items:
+            if previous is not None:
+                changes.append((stored_row_state(previous), -1))
+            changes.append((equipment_state(equipment), 1))
+        apply_changes(changes)
+
+    def _count(self, created):
+        self.report['created' if created else 'updated'] += 1
+
+
+def import_equipment(file, file_format, chunk_size=IMPORT_CHUNK_SIZE):
+    """Загружает оборудование из бинарного файла, возвращает отчет EquipmentImporter"""
+    rows = IMPORT_READERS[file_format](file)
+    report = EquipmentImporter(chunk_size=chunk_size).run(rows)
+    logger.info(
+        'Загрузка оборудования: строк %s, создано %s, обновлено %s, ошибок %s',
+        report['total'], report['created'], report['updated'], len(report['errors'])
+    )
+    return report
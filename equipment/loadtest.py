@@ -0,0 +1,264 @@
+"""
+Нагрузочный прогон основных сценариев API.
+
+Запросы выполняются тестовым клиентом Django в текущем процессе
+(считается и время, и количество SQL-запросов) или через HTTP
+к запущенному серверу (только время). Данные берутся из БД -
+удобно запускать после generate_fleet.
+
+Сценарии transfer_create и transfer_accept создают и принимают заявки.
+В текущем процессе прогон выполняется в транзакции, которая откатывается
+в конце, поэтому БД не меняется. На сервере откатить нельзя - такие
+сценарии запускаются только с allow_writes.
+"""
+import json
+import math
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from contextlib import contextmanager, ExitStack
+from statistics import mean
+
+import pyotp
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from rest_framework.views import APIView
+
+from equipment.models import Equipment
+from transfer_request.models import TransferRequest
+
+User = get_user_model()
+
+SCENARIOS = (
+    'login', 'equipment_list', 'equipment_search', 'my_equipment',
+    'transfer_create', 'transfer_accept', 'export',
+)
+
+# Сценарии, которые меняют данные
+WRITE_SCENARIOS = ('transfer_create', 'transfer_accept')
+
+
+def percentile(values, percent):
+    """Перцентиль методом ближайшего ранга"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+class LocalTransport:
+    """Запросы тестовым клиентом в текущем процессе, с подсчетом SQL-запросов"""
+
+    def __init__(self):
+        self.client = Client()
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            if method == 'GET':
+                response = self.client.get(path, data, **headers)
+            else:
+                response = getattr(self.client, method.lower())(
+                    path, json.dumps(data or {}), content_type='application/json', **headers
+                )
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+            elapsed = time.perf_counter() - started
+        return response.status_code, body, elapsed, len(queries)
+
+
+class HTTPTransport:
+    """Запросы по HTTP к запущенному серверу (SQL-запросы не считаются)"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, data=None, token=None):
+        url = self.base_url + path
+        body = None
+        if method == 'GET' and data:
+            url += '?' + urllib.parse.urlencode(data)
+        elif data is not None:
+            body = json.dumps(data).encode()
+        request = urllib.request.Request(url, data=body, method=method)
+        request.add_header('Content-Type', 'application/json')
+        if token:
+            request.add_header('Authorization', f'Bearer {token}')
+
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request) as response:
+                content, status = response.read(), response.status
+        except urllib.error.HTTPError as exc:
+            content, status = exc.read(), exc.code
+        return status, content, time.perf_counter() - started, None
+
+
+class LoadTest:
+    """
+    Прогоняет сценарии по requests раз и собирает статистику:
+    {сценарий: {'requests', 'errors', 'p50', 'p95', 'p99', 'mean', 'queries_mean', 'queries_max'}}
+    Время - в миллисекундах.
+    """
+
+    def __init__(self, transport, password, prefix='fleet', requests=50, search='think', log=None):
+        self.transport = transport
+        self.password = password
+        self.prefix = prefix
+        self.requests = requests
+        self.search = search
+        self.log = log or (lambda message: None)
+        self.samples = {}
+        self._tokens = {}
+
+    def run(self, scenarios=SCENARIOS):
+        for scenario in scenarios:
+            self.log(f'Сценарий {scenario}...')
+            getattr(self, f'scenario_{scenario}')()
+        return self.report()
+
+    def report(self):
+        result = {}
+        for scenario, samples in self.samples.items():
+            timings = [elapsed * 1000 for _ok, elapsed, _queries in samples]
+            queries = [count for _ok, _elapsed, count in samples if count is not None]
+            result[scenario] = {
+                'requests': len(samples),
+                'errors': sum(1 for ok, _elapsed, _queries in samples if not ok),
+                'p50': percentile(timings, 50),
+                'p95': percentile(timings, 95),
+                'p99': percentile(timings, 99),
+                'mean': mean(timings) if timings else None,
+                'queries_mean': mean(queries) if queries else None,
+                'queries_max': max(queries) if queries else None,
+            }
+        return result
+
+    def _call(self, scenario, method, path, data=None, token=None, expected=(200,)):
+        status, body, elapsed, queries = self.transport.request(method, path, data, token)
+        self.samples.setdefault(scenario, []).append((status in expected, elapsed, queries))
+        return status, body
+
+    def _users(self):
+        users = list(
+            User.objects.filter(username__startswith=f'{self.prefix}_', owned_equipment__isnull=False)
+            .distinct().order_by('pk')[:self.requests]
+        )
+        if len(users) < 2:
+            raise ValueError(f'Нужны пользователи с префиксом {self.prefix}_ и оборудованием (generate_fleet)')
+        return users
+
+    def _token(self, user):
+        if user.pk not in self._tokens:
+            status, body, _elapsed, _queries = self.transport.request(
+                'POST', '/api/v1/auth/login/', {'username': user.username, 'password': self.password}
+            )
+            if status != 200:
+                raise ValueError(f'Не удалось войти как {user.username}: {status} {body[:200]!r}')
+            self._tokens[user.pk] = json.loads(body)['access']
+        return self._tokens[user.pk]
+
+    def scenario_login(self):
+        for user in self._cycle(self._users()):
+            self._call('login', 'POST', '/api/v1/auth/login/', {'username': user.username, 'password': self.password})
+
+    def scenario_equipment_list(self):
+        for user in self._cycle(self._users()):
+            self._call('equipment_list', 'GET', '/api/v1/equipment/', {'page_size': 20}, self._token(user))
+
+    def scenario_equipment_search(self):
+        for user in self._cycle(self._users()):
+            self._call('equipment_search', 'GET', '/api/v1/equipment/', {'search': self.search}, self._token(user))
+
+    def scenario_my_equipment(self):
+        for user in self._cycle(self._users()):
+            self._call('my_equipment', 'GET', '/api/v1/equipment/my/', None, self._token(user))
+
+    def scenario_transfer_create(self):
+        users = self._users()
+        self._created = []
+        for index in range(self.requests):
+            sender = users[index % len(users)]
+            receiver = users[(index + 1) % len(users)]
+            equipment = Equipment.objects.filter(current_owner=sender).exclude(
+                transfer_history__status='pending'
+            ).first()
+            if equipment is None:
+                continue
+            status, _body = self._call('transfer_create', 'POST', '/api/v1/transfer/create/', {
+                'equipment': str(equipment.public_id),
+                'receiver': str(receiver.public_id),
+                'comment': 'loadtest',
+            }, self._token(sender), expected=(201,))
+            if status == 201:
+                self._created.append(
+                    TransferRequest.objects.filter(equipment=equipment, status='pending').latest('requested_at')
+                )
+
+    def scenario_transfer_accept(self):
+        created = getattr(self, '_created', None)
+        if created is None:
+            self.scenario_transfer_create()
+            created = self._created
+        for transfer in created:
+            receiver = transfer.receiver
+            self._call('transfer_accept', 'PATCH', f'/api/v1/transfer/update/{transfer.public_id}/', {
+                'status': 'accepted',
+                'otp_code': pyotp.TOTP(receiver.otp_secret).now(),
+            }, self._token(receiver))
+
+    def scenario_export(self):
+        user = self._users()[0]
+        for _index in range(max(self.requests // 10, 1)):
+            self._call('export', 'GET', '/api/v1/equipment/export/', {'format': 'csv'}, self._token(user))
+
+    def _cycle(self, users):
+        return [users[index % len(users)] for index in range(self.requests)]
+
+
+@contextmanager
+def throttling_disabled():
+    """Отключает ограничение частоты запросов DRF в текущем процессе; при выходе (и при ошибке) возвращает его"""
+    original = APIView.get_throttles
+    APIView.get_throttles = lambda view: []
+    try:
+        yield
+    finally:
+        APIView.get_throttles = original
+
+
+@contextmanager
+def rolled_back():
+    """Транзакция, которая откатывается при выходе (и при ошибке): изменения не попадают в БД"""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def run_load_test(base_url=None, throttling=False, scenarios=SCENARIOS, allow_writes=False, **options):
+    """
+    Запускает LoadTest в текущем процессе (base_url=None) или против сервера.
+    В текущем процессе ограничения частоты запросов (throttling) по умолчанию отключаются,
+    письма отправляются в память (setup_test_environment), а все изменения откатываются.
+    Против сервера сценарии WRITE_SCENARIOS запускаются только с allow_writes.
+    """
+    if base_url:
+        writes = [scenario for scenario in scenarios if scenario in WRITE_SCENARIOS]
+        if writes and not allow_writes:
+            raise ValueError(
+                f'Сценарии {", ".join(writes)} создают и принимают заявки на сервере - '
+                f'нужен allow_writes (--allow-writes) или другой набор --scenario'
+            )
+        return LoadTest(HTTPTransport(base_url), **options).run(scenarios)
+
+    with ExitStack() as stack:
+        setup_test_environment()
+        stack.callback(teardown_test_environment)
+        if not throttling:
+            stack.enter_context(throttling_disabled())
+        # Заявки и вход пользователей (last_login) не сохраняются; on_commit-задачи не запускаются
+        stack.enter_context(rolled_back())
+        return LoadTest(LocalTransport(), **options).run(scenarios)
@@ -0,0 +1,60 @@
+"""
+Справочники оборудования (типы, производители, юр. лица) для фронтенда.
+
+Таблицы маленькие и меняются редко, поэтому ответ строится один раз
+на версию справочника. Версия хранится в общем кэше (django cache) и
+увеличивается сигналами post_save/post_delete. Готовые данные лежат
+в общем кэше и в памяти процесса: на запрос читается только номер версии.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from base.cache.bases import get_version
+
+from equipment.models import EquipmentType, Manufacturer, LegalEntity
+from equipment.serializers import EquipmentTypeSerializer, ManufacturerSerializer, LegalEntitySerializer
+
+# Имя справочника -> (модель, сериализатор)
+LOOKUP_TABLES = {
+    'types': (EquipmentType, EquipmentTypeSerializer),
+    'manufacturers': (Manufacturer, ManufacturerSerializer),
+    'legal-entities': (LegalEntity, LegalEntitySerializer),
+}
+
+LOOKUP_TABLE_CACHE_TIMEOUT = 24 * 60 * 60
+
+_local = {}  # имя справочника -> (версия, данные)
+_local_lock = threading.Lock()
+
+
+def get_lookup_table_max_age():
+    """Сколько секунд клиент может не перепроверять справочник"""
+    return getattr(settings, 'LOOKUP_TABLE_MAX_AGE', 60)
+
+
+def _data_key(name, version):
+    return f'lookup_table:{name}:{version}'
+
+
+def get_table_names_for_model(model):
+    return [name for name, (table_model, _serializer) in LOOKUP_TABLES.items() if table_model is model]
+
+
+def get_table(name):
+    """Возвращает (версия, данные) справочника"""
+    version = get_version(name)
+    local = _local.get(name)
+    if local is not None and local[0] == version:
+        return local
+
+    data = cache.get(_data_key(name, version))
+    if data is None:
+        model, serializer_class = LOOKUP_TABLES[name]
+        data = [dict(item) for item in serializer_class(model.objects.order_by('name'), many=True).data]
+        cache.set(_data_key(name, version), data, LOOKUP_TABLE_CACHE_TIMEOUT)
+
+    with _local_lock:
+        _local[name] = (version, data)
+    return version, data
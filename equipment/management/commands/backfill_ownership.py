@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from equipment.ownership import backfill_ownership
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит периоды владения (OwnershipInterval) из принятых заявок для оборудования, у которого их еще нет. '
+        'С --rebuild пересоздает периоды всего оборудования'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Удалить существующие периоды и построить заново')
+
+    def handle(self, *args, **options):
+        created = backfill_ownership(rebuild=options['rebuild'])
+        self.stdout.write(self.style.SUCCESS(f'Создано периодов: {created}'))
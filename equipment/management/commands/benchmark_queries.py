@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from equipment.query_benchmark import run_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает планы и время частых запросов API без составных и частичных индексов и с ними. '
+        'Схема БД не меняется. Данные для замера создает generate_fleet'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Сколько раз выполнять каждый запрос')
+        parser.add_argument('--plans', action='store_true', help='Выводить планы запросов (EXPLAIN)')
+
+    def handle(self, *args, **options):
+        try:
+            user, equipment, results = run_benchmark(repeat=max(options['repeat'], 1))
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(f'Пользователь: {user.username}, оборудование: {equipment.serial_number}')
+        before, after = results['before'], results['after']
+        width = max(len(name) for name in after)
+        self.stdout.write(f"{'Запрос'.ljust(width)}  {'до, мс':>10}  {'после, мс':>10}")
+        for name, measured in after.items():
+            self.stdout.write(f"{name.ljust(width)}  {before[name]['ms']:>10.2f}  {measured['ms']:>10.2f}")
+            if options['plans']:
+                self.stdout.write(self.style.WARNING('  до:'))
+                self.stdout.write('    ' + before[name]['plan'].replace('\n', '\n    '))
+                self.stdout.write(self.style.SUCCESS('  после:'))
+                self.stdout.write('    ' + measured['plan'].replace('\n', '\n    '))
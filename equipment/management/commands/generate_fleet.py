@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from equipment.fleet import generate_fleet, clear_fleet
+
+
+class Command(BaseCommand):
+    help = 'Генерирует синтетический парк: пользователей, юрлица, оборудование и историю заявок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help='Количество пользователей')
+        parser.add_argument('--legal-entities', type=int, default=5, help='Количество юрлиц')
+        parser.add_argument('--equipment', type=int, default=10000, help='Количество оборудования')
+        parser.add_argument('--transfers', type=int, default=5000, help='Количество исторических заявок')
+        parser.add_argument('--days', type=int, default=365, help='За сколько дней строить историю заявок')
+        parser.add_argument('--password', default='loadtest', help='Пароль всех пользователей')
+        parser.add_argument('--prefix', default='fleet', help='Префикс логинов, серийных номеров и юрлиц')
+        parser.add_argument('--seed', type=int, help='Seed генератора случайных чисел')
+        parser.add_argument('--clear', action='store_true', help='Удалить ранее сгенерированные данные с префиксом')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['clear']:
+            clear_fleet(options['prefix'])
+            self.stdout.write('Старые данные удалены')
+
+        created = generate_fleet(
+            users=options['users'],
+            legal_entities=options['legal_entities'],
+            equipment=options['equipment'],
+            transfers=options['transfers'],
+            days=options['days'],
+            password=options['password'],
+            prefix=options['prefix'],
+            seed=options['seed'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано: пользователей {created['users']}, оборудования {created['equipment']}, "
+            f"заявок {created['transfers']} за {time.monotonic() - started:.1f} с"
+        ))
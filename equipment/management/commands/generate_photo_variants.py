@@ -0,0 +1,40 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Q
+
+from equipment.models import Equipment
+from equipment.photos import generate_photo_variants, is_stale
+
+
+def _generate(pk, force):
+    try:
+        return generate_photo_variants(pk, force=force)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Создает уменьшенные копии (WebP) для уже загруженных фото оборудования'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Пересоздать и актуальные копии')
+        parser.add_argument(
+            '--workers', type=int, default=getattr(settings, 'BACKGROUND_WORKERS', 2),
+            help='Сколько фото обрабатывать параллельно'
+        )
+
+    def handle(self, *args, **options):
+        force = options['force']
+        rows = (
+            Equipment.objects.filter(~Q(photo='') & Q(photo__isnull=False) | ~Q(photo_variants={}))
+            .values_list('pk', 'photo', 'photo_variants').order_by('pk')
+        )
+        pks = [pk for pk, photo, variants in rows.iterator(chunk_size=2000) if force or is_stale(photo, variants)]
+        self.stdout.write(f'Оборудования для обработки: {len(pks)}')
+
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as executor:
+            changed = sum(executor.map(lambda pk: _generate(pk, force), pks))
+        self.stdout.write(self.style.SUCCESS(f'Обновлено: {changed}'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from equipment.imports import import_equipment, detect_format, ImportFileError, IMPORT_FORMATS, IMPORT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Загружает оборудование из файла в формате выгрузки (XLSX, CSV, NDJSON)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Формат файла (по умолчанию по расширению)')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help='Строк в одном запросе')
+
+    def handle(self, *args, **options):
+        try:
+            file_format = options['format'] or detect_format(options['path'])
+            with open(options['path'], 'rb') as file:
+                report = import_equipment(file, file_format, chunk_size=options['chunk_size'])
+        except (ImportFileError, OSError) as exc:
+            raise CommandError(str(exc))
+
+        for error in report['errors']:
+            details = '; '.join(f'{field}: {message}' for field, message in error['errors'].items())
+            self.stderr.write(f"Строка {error['row']}: {details}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Строк: {report['total']}, создано: {report['created']}, "
+            f"обновлено: {report['updated']}, ошибок: {len(report['errors'])}"
+        ))
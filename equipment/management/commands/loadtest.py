@@ -0,0 +1,57 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from equipment.loadtest import run_load_test, SCENARIOS
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный прогон основных сценариев API: перцентили времени ответа и количество SQL-запросов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Запросов на сценарий')
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='Сценарий (можно несколько)')
+        parser.add_argument('--url', help='Адрес запущенного сервера; по умолчанию - тестовый клиент в процессе')
+        parser.add_argument('--password', default='loadtest', help='Пароль пользователей generate_fleet')
+        parser.add_argument('--prefix', default='fleet', help='Префикс пользователей generate_fleet')
+        parser.add_argument('--search', default='think', help='Строка для сценария поиска')
+        parser.add_argument('--throttling', action='store_true', help='Не отключать ограничение частоты запросов')
+        parser.add_argument(
+            '--allow-writes', action='store_true',
+            help='Разрешить сценарии, которые создают и принимают заявки на сервере (--url)'
+        )
+        parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+
+    def handle(self, *args, **options):
+        try:
+            report = run_load_test(
+                base_url=options['url'],
+                throttling=options['throttling'],
+                allow_writes=options['allow_writes'],
+                scenarios=options['scenario'] or SCENARIOS,
+                password=options['password'],
+                prefix=options['prefix'],
+                requests=options['requests'],
+                search=options['search'],
+                log=self.stderr.write,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write(
+            f"{'сценарий':<18}{'запр.':>6}{'ошиб.':>6}{'p50 мс':>9}{'p95 мс':>9}{'p99 мс':>9}{'SQL ср.':>9}{'SQL макс':>9}"
+        )
+        for scenario, stats in report.items():
+            self.stdout.write(
+                f"{scenario:<18}{stats['requests']:>6}{stats['errors']:>6}"
+                f"{_number(stats['p50']):>9}{_number(stats['p95']):>9}{_number(stats['p99']):>9}"
+                f"{_number(stats['queries_mean']):>9}{_number(stats['queries_max']):>9}"
+            )
+
+
+def _number(value):
+    return '-' if value is None else f'{value:.1f}'
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from equipment.summary import rebuild_inventory_summary
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает сводку по оборудованию (InventorySummary) по всей таблице оборудования'
+
+    def handle(self, *args, **options):
+        groups = rebuild_inventory_summary()
+        self.stdout.write(self.style.SUCCESS(f'Групп в сводке: {groups}'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from equipment.models import Equipment
+from equipment.search import install_search_index, refresh_search_documents
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает поисковые документы оборудования и индекс для поиска'
+
+    def handle(self, *args, **options):
+        updated = refresh_search_documents(Equipment.objects.all())
+        with connection.schema_editor() as schema_editor:
+            install_search_index(schema_editor)
+        self.stdout.write(self.style.SUCCESS(f'Обновлено документов: {updated}'))
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:55
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='equipment',
+            name='decommissioned_equipment',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='Списана ли техника'),
+        ),
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('public_id', models.UUIDField(db_index=True, default=uuid.uuid4, editable=False, unique=True)),
+                ('format', models.CharField(choices=[('xlsx', 'Excel')], default='xlsx', max_length=10, verbose_name='Формат')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Формируется'), ('ready', 'Готово'), ('failed', 'Ошибка')], db_index=True, default='pending', max_length=10, verbose_name='Статус')),
+                ('fingerprint', models.CharField(db_index=True, help_text='Состояние таблицы оборудования на момент постановки задания', max_length=64, verbose_name='Отпечаток данных')),
+                ('is_stale', models.BooleanField(default=False, help_text='Справочники изменились после формирования файла', verbose_name='Устарел')),
+                ('file', models.FileField(blank=True, null=True, upload_to='exports/%Y/%m/%d', verbose_name='Файл')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='export_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Кто запросил')),
+            ],
+            options={
+                'verbose_name': 'Выгрузка оборудования',
+                'verbose_name_plural': 'Выгрузки оборудования',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
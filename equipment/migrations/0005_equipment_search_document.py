@@ -0,0 +1,47 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:58
+
+from django.db import migrations, models
+
+from equipment.models import search_document_from_values
+from equipment.search import install_search_index, uninstall_search_index
+
+
+def fill_search_documents(apps, schema_editor):
+    Equipment = apps.get_model('equipment', 'Equipment')
+    rows = Equipment.objects.values_list(
+        'id', 'serial_number', 'model', 'type__name', 'manufacturer__name',
+        'current_owner__username', 'inverter_number',
+    )
+    batch = []
+    for pk, *values in rows.iterator(chunk_size=1000):
+        batch.append(Equipment(pk=pk, search_document=search_document_from_values(*values)))
+        if len(batch) >= 1000:
+            Equipment.objects.bulk_update(batch, ['search_document'])
+            batch = []
+    if batch:
+        Equipment.objects.bulk_update(batch, ['search_document'])
+
+
+def create_search_index(apps, schema_editor):
+    install_search_index(schema_editor)
+
+
+def drop_search_index(apps, schema_editor):
+    uninstall_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0004_alter_exportjob_format'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipment',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Поисковый документ'),
+        ),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
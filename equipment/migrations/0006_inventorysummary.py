@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from equipment.summary import rebuild_inventory_summary
+
+
+def fill_inventory_summary(apps, schema_editor):
+    rebuild_inventory_summary(
+        equipment_model=apps.get_model('equipment', 'Equipment'),
+        summary_model=apps.get_model('equipment', 'InventorySummary'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0005_equipment_search_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Значения всех полей группы: NULL в уникальном индексе не сравнивается', max_length=100, unique=True, verbose_name='Ключ группы')),
+                ('decommissioned', models.BooleanField(default=False, verbose_name='Списано')),
+                ('is_assigned', models.BooleanField(default=False, verbose_name='Закреплено за сотрудником')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество')),
+                ('legal_entity', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='equipment.legalentity', verbose_name='Юрлицо')),
+                ('manufacturer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='equipment.manufacturer', verbose_name='Производитель')),
+                ('type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='equipment.equipmenttype', verbose_name='Тип техники')),
+            ],
+            options={
+                'verbose_name': 'Сводка по оборудованию',
+                'verbose_name_plural': 'Сводка по оборудованию',
+            },
+        ),
+        migrations.RunPython(fill_inventory_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+from equipment.search import install_search_index
+
+
+def reinstall_search_index(apps, schema_editor):
+    # SQLite пересоздает таблицу оборудования при добавлении поля - триггеры FTS удаляются вместе с ней
+    install_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0006_inventorysummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipment',
+            name='photo_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Файлы WebP фиксированного размера и имя фото, из которого они получены', verbose_name='Варианты фото'),
+        ),
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0007_equipment_photo_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(condition=models.Q(('decommissioned_equipment', False)), fields=['current_owner'], name='equipment_owner_active_idx'),
+        ),
+    ]
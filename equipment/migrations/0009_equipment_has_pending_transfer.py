@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:24
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+from equipment.search import install_search_index
+
+
+def fill_has_pending_transfer(apps, schema_editor):
+    Equipment = apps.get_model('equipment', 'Equipment')
+    TransferRequest = apps.get_model('transfer_request', 'TransferRequest')
+    Equipment.objects.update(has_pending_transfer=Exists(
+        TransferRequest.objects.filter(equipment=OuterRef('pk'), status='pending')
+    ))
+
+
+def reinstall_search_index(apps, schema_editor):
+    # SQLite пересоздает таблицу оборудования при добавлении поля - триггеры FTS удаляются вместе с ней
+    install_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0008_equipment_owner_active_idx'),
+        ('transfer_request', '0003_transfer_request_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipment',
+            name='has_pending_transfer',
+            field=models.BooleanField(default=False, editable=False, help_text='Оборудование передается и не может быть передано повторно', verbose_name='Есть заявка в ожидании'),
+        ),
+        migrations.RunPython(fill_has_pending_transfer, migrations.RunPython.noop),
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from equipment.ownership import backfill_ownership
+
+
+def fill_ownership_intervals(apps, schema_editor):
+    backfill_ownership(
+        equipment_model=apps.get_model('equipment', 'Equipment'),
+        transfer_model=apps.get_model('transfer_request', 'TransferRequest'),
+        interval_model=apps.get_model('equipment', 'OwnershipInterval'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0009_equipment_has_pending_transfer'),
+        ('transfer_request', '0005_transfer_digest'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OwnershipInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valid_from', models.DateTimeField(verbose_name='Начало владения')),
+                ('valid_to', models.DateTimeField(blank=True, null=True, verbose_name='Окончание владения')),
+                ('equipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ownership_intervals', to='equipment.equipment', verbose_name='Оборудование')),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ownership_intervals', to=settings.AUTH_USER_MODEL, verbose_name='Владелец')),
+            ],
+            options={
+                'verbose_name': 'Период владения',
+                'verbose_name_plural': 'Периоды владения',
+                'ordering': ['equipment', 'valid_from'],
+                'indexes': [models.Index(fields=['equipment', 'valid_from'], name='ownership_equipment_idx'), models.Index(fields=['owner', 'valid_from'], name='ownership_owner_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('valid_to__isnull', True)), fields=('equipment',), name='ownership_one_open_interval')],
+            },
+        ),
+        migrations.RunPython(fill_ownership_intervals, migrations.RunPython.noop),
+    ]
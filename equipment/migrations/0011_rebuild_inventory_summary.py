@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:10
+
+from django.db import migrations
+
+from equipment.summary import rebuild_inventory_summary
+
+
+def refill_inventory_summary(apps, schema_editor):
+    # Счетчики могли разойтись с оборудованием, пока пересчет не блокировал строки сводки
+    rebuild_inventory_summary(
+        equipment_model=apps.get_model('equipment', 'Equipment'),
+        summary_model=apps.get_model('equipment', 'InventorySummary'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0010_ownershipinterval'),
+    ]
+
+    operations = [
+        migrations.RunPython(refill_inventory_summary, migrations.RunPython.noop),
+    ]
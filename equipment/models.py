@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 
 from base.models.bases import BaseModel, NamedModel
@@ -6,6 +6,23 @@ from base.models.bases import BaseModel, NamedModel
 User = get_user_model()
 
 
+def search_document_from_values(*values):
+    """
+    Поисковый документ: значения в нижнем регистре, по одному на строку.
+    Разделитель - перевод строки, поэтому искомое слово (без пробелов)
+    не может совпасть на стыке двух полей.
+    """
+    return '\n'.join(str(value).lower() for value in values if value)
+
+
+# Связь оборудования -> поле связанной модели, которое попадает в поисковый документ
+SEARCH_RELATION_FIELDS = {
+    'type': 'name',
+    'manufacturer': 'name',
+    'current_owner': 'username',
+}
+
+
 class EquipmentType(NamedModel):
     """
     Модель для хранения типов оборудования (категорий техники).
@@ -69,6 +86,14 @@ class Equipment(BaseModel):
     supplier = models.CharField('Поставщик', max_length=255, blank=True, null=True)
     decommissioned_equipment = models.BooleanField('Списана ли техника', default=False, db_index=True)
     photo = models.ImageField('Фото', upload_to='static/images/%Y/%m/%d', blank=True, null=True)
+    # Уменьшенные копии фото (см. equipment/photos.py)
+    photo_variants = models.JSONField(
+        'Варианты фото',
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text='Файлы WebP фиксированного размера и имя фото, из которого они получены'
+    )
     created_at = models.DateTimeField('Дата создания', auto_now_add=True)
     updated_at = models.DateTimeField('Дата обновления', auto_now=True)
 
@@ -98,11 +123,222 @@ class Equipment(BaseModel):
         blank=True,
         verbose_name='Юрлицо'
     )
+    # Денормализованный текст для поиска (см. equipment/search.py)
+    search_document = models.TextField('Поисковый документ', blank=True, default='', editable=False)
+    # Ведется сигналами заявок (см. transfer_request/pending.py)
+    has_pending_transfer = models.BooleanField(
+        'Есть заявка в ожидании',
+        default=False,
+        editable=False,
+        help_text='Оборудование передается и не может быть передано повторно'
+    )
+
+    # Поля, которые меняются запросами UPDATE в обход save(). Сохранение загруженного ранее объекта
+    # не должно перезаписывать их устаревшими значениями
+    MAINTAINED_FIELDS = ('photo_variants', 'has_pending_transfer')
 
     class Meta:
         verbose_name = "Оборудование"
         verbose_name_plural = "Оборудования"
+        indexes = [
+            # Оборудование сотрудника без списанного: my/, my-without-poisoned/.
+            # Django сравнивает булево поле как NOT decommissioned_equipment - по такому выражению
+            # составной индекс не ищет, а частичный с тем же условием подходит
+            models.Index(
+                fields=['current_owner'], condition=models.Q(decommissioned_equipment=False),
+                name='equipment_owner_active_idx'
+            ),
+        ]
 
     def __str__(self):
         """Возвращает строковое представление в формате: [Модель] SN: серийный_номер"""
         return f"SN: {self.serial_number}"
+
+    def save(self, *args, **kwargs):
+        """
+        Перед сохранением пересобирает поисковый документ.
+        Существующая запись сохраняется без MAINTAINED_FIELDS и отложенных (defer/only)
+        полей, если они не указаны явно. Запись и сигналы (сводка, периоды владения)
+        выполняются в одной транзакции.
+        """
+        # Отложенные поля запоминаются до сборки документа: он дочитывает их из БД
+        deferred = self.get_deferred_fields()
+        self.search_document = self.build_search_document()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'search_document' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'search_document']
+        elif update_fields is None and not self._state.adding and not args and not kwargs.get('force_insert'):
+            skipped = {*self.MAINTAINED_FIELDS, *deferred} - {'search_document'}
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in skipped and field.attname not in skipped
+            ]
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+    def build_search_document(self):
+        """
+        Собирает в одну строку все поля, по которым ищется оборудование:
+        серийный и инвентарный номер, модель, тип, производитель и логин владельца.
+        """
+        names = self.get_related_search_values()
+        return search_document_from_values(
+            self.serial_number,
+            self.model,
+            names['type'],
+            names['manufacturer'],
+            names['current_owner'],
+            self.inverter_number,
+        )
+
+    def get_related_search_values(self):
+        """
+        Названия связей для поискового документа. Загруженные связи (select_related
+        или присвоенные объекты) берутся из памяти, остальные - одним запросом по *_id.
+        """
+        values, queries = {}, []
+        for relation, field_name in SEARCH_RELATION_FIELDS.items():
+            field = self._meta.get_field(relation)
+            related_id = getattr(self, field.attname)
+            related = field.get_cached_value(self, default=None) if related_id is not None else None
+            if related_id is None or (related is not None and related.pk == related_id):
+                values[relation] = getattr(related, field_name, None)
+            else:
+                values[relation] = None
+                queries.append(
+                    field.related_model._base_manager.filter(pk=related_id)
+                    .annotate(relation=models.Value(relation, output_field=models.CharField()))
+                    .values_list('relation', field_name).order_by()
+                )
+        if queries:
+            values.update(queries[0].union(*queries[1:], all=True) if len(queries) > 1 else queries[0])
+        return values
+
+
+class ExportJob(BaseModel):
+    """
+    Задание на выгрузку оборудования в файл.
+    Готовый файл переиспользуется, пока не изменятся данные,
+    из которых он был собран (см. fingerprint и is_stale).
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_READY = 'ready'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Формируется'),
+        (STATUS_READY, 'Готово'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+    FORMAT_CHOICES = [
+        ('xlsx', 'Excel'),
+        ('csv', 'CSV'),
+        ('ndjson', 'NDJSON'),
+    ]
+
+    format = models.CharField('Формат', max_length=10, choices=FORMAT_CHOICES, default='xlsx')
+    status = models.CharField('Статус', max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    fingerprint = models.CharField(
+        'Отпечаток данных',
+        max_length=64,
+        db_index=True,
+        help_text='Состояние таблицы оборудования на момент постановки задания'
+    )
+    is_stale = models.BooleanField(
+        'Устарел',
+        default=False,
+        help_text='Справочники изменились после формирования файла'
+    )
+    file = models.FileField('Файл', upload_to='exports/%Y/%m/%d', blank=True, null=True)
+    error = models.TextField('Ошибка', blank=True, null=True)
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='export_jobs',
+        verbose_name='Кто запросил'
+    )
+    created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    finished_at = models.DateTimeField('Дата завершения', null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Выгрузка оборудования"
+        verbose_name_plural = "Выгрузки оборудования"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_format_display()} от {self.created_at:%d.%m.%Y %H:%M}"
+
+
+class InventorySummary(models.Model):
+    """
+    Количество оборудования по группам (тип, производитель, юрлицо,
+    списано ли, закреплено ли за сотрудником).
+    Обновляется сигналами при сохранении и удалении оборудования
+    (см. equipment/summary.py), полностью пересобирается командой
+    rebuild_inventory_summary.
+    """
+    key = models.CharField(
+        'Ключ группы',
+        max_length=100,
+        unique=True,
+        help_text='Значения всех полей группы: NULL в уникальном индексе не сравнивается'
+    )
+    type = models.ForeignKey(
+        EquipmentType, on_delete=models.CASCADE, null=True, blank=True, related_name='+', verbose_name='Тип техники'
+    )
+    manufacturer = models.ForeignKey(
+        Manufacturer, on_delete=models.CASCADE, null=True, blank=True, related_name='+', verbose_name='Производитель'
+    )
+    legal_entity = models.ForeignKey(
+        LegalEntity, on_delete=models.CASCADE, null=True, blank=True, related_name='+', verbose_name='Юрлицо'
+    )
+    decommissioned = models.BooleanField('Списано', default=False)
+    is_assigned = models.BooleanField('Закреплено за сотрудником', default=False)
+    count = models.IntegerField('Количество', default=0)
+
+    class Meta:
+        verbose_name = "Сводка по оборудованию"
+        verbose_name_plural = "Сводка по оборудованию"
+
+    def __str__(self):
+        return f"{self.key}: {self.count}"
+
+
+class OwnershipInterval(models.Model):
+    """
+    Период, когда оборудование было закреплено за сотрудником: [valid_from, valid_to).
+    Пустой valid_to - текущий владелец. Строки только добавляются: при смене
+    владельца открытый период закрывается и открывается новый (см. equipment/ownership.py).
+    Ранее накопленная история переносится командой backfill_ownership.
+    """
+    equipment = models.ForeignKey(
+        Equipment, on_delete=models.CASCADE, related_name='ownership_intervals', verbose_name='Оборудование'
+    )
+    # Удаление сотрудника не стирает историю оборудования
+    owner = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='ownership_intervals',
+        verbose_name='Владелец'
+    )
+    valid_from = models.DateTimeField('Начало владения')
+    valid_to = models.DateTimeField('Окончание владения', null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Период владения"
+        verbose_name_plural = "Периоды владения"
+        ordering = ['equipment', 'valid_from']
+        # Запросы "на дату" ищут последний период с valid_from <= даты по оборудованию или владельцу
+        indexes = [
+            models.Index(fields=['equipment', 'valid_from'], name='ownership_equipment_idx'),
+            models.Index(fields=['owner', 'valid_from'], name='ownership_owner_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['equipment'], condition=models.Q(valid_to__isnull=True), name='ownership_one_open_interval'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.equipment} — {self.owner} с {self.valid_from:%d.%m.%Y}"
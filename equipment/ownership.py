@@ -0,0 +1,140 @@
+"""
+История владения оборудованием (OwnershipInterval) и запросы "на дату".
+
+Период [valid_from, valid_to) открывается, когда оборудование закрепляют
+за сотрудником, и закрывается при смене владельца. Периоды пишутся
+сигналом сохранения оборудования и массовыми операциями (bulk_update при
+пакетном принятии заявок) через apply_equipment_changes (см. effects.py).
+Историю, накопленную до появления таблицы, переносит из принятых
+заявок backfill_ownership (команда backfill_ownership).
+
+Запросы "кто владел", "что было у сотрудника" и снимок на дату ищут по
+индексам (оборудование, valid_from) и (владелец, valid_from), без
+перебора заявок.
+"""
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from equipment.models import Equipment, OwnershipInterval
+from transfer_request.models import TransferRequest
+
+# Сколько оборудования обрабатывать за раз при переносе истории
+BACKFILL_BATCH_SIZE = 2000
+
+
+def active_at(at):
+    """Условие: период включает момент at"""
+    return Q(valid_from__lte=at) & (Q(valid_to__gt=at) | Q(valid_to__isnull=True))
+
+
+def owner_at(equipment, at):
+    """Сотрудник, за которым было закреплено оборудование в момент at, или None"""
+    interval = (
+        OwnershipInterval.objects.filter(active_at(at), equipment=equipment)
+        .select_related('owner').order_by('-valid_from').first()
+    )
+    return interval.owner if interval else None
+
+
+def holdings_at(owner, at):
+    """Оборудование, закрепленное за сотрудником в момент at"""
+    return Equipment.objects.filter(
+        pk__in=OwnershipInterval.objects.filter(active_at(at), owner=owner).values('equipment_id')
+    )
+
+
+def inventory_at(at):
+    """Снимок на момент at: действовавшие периоды (оборудование и владелец) по порядку оборудования"""
+    return OwnershipInterval.objects.filter(active_at(at)).order_by('equipment_id')
+
+
+def record_owner_changes(changes, at=None):
+    """
+    changes - [(pk оборудования, pk нового владельца или None)].
+    Закрывает открытые периоды и открывает новые - два запроса на все изменения.
+    """
+    if not changes:
+        return
+    at = at or timezone.now()
+    OwnershipInterval.objects.filter(
+        equipment_id__in=[equipment_id for equipment_id, _owner_id in changes], valid_to__isnull=True
+    ).update(valid_to=at)
+    OwnershipInterval.objects.bulk_create([
+        OwnershipInterval(equipment_id=equipment_id, owner_id=owner_id, valid_from=at)
+        for equipment_id, owner_id in changes if owner_id is not None
+    ])
+
+
+def close_owner_intervals(owner, at=None):
+    """Сотрудник удаляется - его оборудование становится незакрепленным"""
+    return OwnershipInterval.objects.filter(owner=owner, valid_to__isnull=True).update(valid_to=at or timezone.now())
+
+
+def build_intervals(row, transfers, interval_model=OwnershipInterval):
+    """
+    Периоды одного оборудования по истории: row - values() оборудования,
+    transfers - его принятые заявки по возрастанию accepted_at.
+    """
+    if transfers:
+        owner, since = transfers[0]['sender_id'], min(row['created_at'], transfers[0]['requested_at'])
+    else:
+        owner, since = row['current_owner_id'], row['created_at']
+
+    periods = []
+    for transfer in transfers:
+        periods.append((owner, since, transfer['accepted_at']))
+        owner, since = transfer['receiver_id'], transfer['accepted_at']
+    if owner != row['current_owner_id']:
+        # Владельца меняли без заявки (админка) - точное время неизвестно, берем последнее изменение
+        changed_at = max(row['updated_at'], since)
+        periods.append((owner, since, changed_at))
+        owner, since = row['current_owner_id'], changed_at
+    periods.append((owner, since, None))
+
+    return [
+        interval_model(equipment_id=row['pk'], owner_id=owner, valid_from=valid_from, valid_to=valid_to)
+        for owner, valid_from, valid_to in periods
+        if owner is not None and (valid_to is None or valid_to > valid_from)
+    ]
+
+
+def backfill_ownership(equipment=None, rebuild=False, batch_size=BACKFILL_BATCH_SIZE,
+                       equipment_model=Equipment, transfer_model=TransferRequest, interval_model=OwnershipInterval):
+    """
+    Строит периоды из принятых заявок для оборудования equipment (по умолчанию - всего).
+    Без rebuild обрабатывается только оборудование, у которого периодов еще нет.
+    Возвращает количество созданных периодов. Миграция 0010 передает
+    исторические модели (equipment_model, transfer_model, interval_model).
+    """
+    equipment = equipment if equipment is not None else equipment_model.objects.all()
+    created = 0
+    with transaction.atomic():
+        if rebuild:
+            interval_model.objects.filter(equipment__in=equipment.values('pk')).delete()
+        else:
+            equipment = equipment.exclude(Exists(interval_model.objects.filter(equipment=OuterRef('pk'))))
+        ids = list(equipment.order_by('pk').values_list('pk', flat=True))
+
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            rows = equipment_model.objects.filter(pk__in=chunk).order_by('pk').values(
+                'pk', 'created_at', 'updated_at', 'current_owner_id'
+            )
+            transfers = {
+                equipment_id: list(group) for equipment_id, group in groupby(
+                    transfer_model.objects.filter(equipment_id__in=chunk, status='accepted', accepted_at__isnull=False)
+                    .order_by('equipment_id', 'accepted_at', 'pk')
+                    .values('equipment_id', 'sender_id', 'receiver_id', 'requested_at', 'accepted_at'),
+                    key=itemgetter('equipment_id'),
+                )
+            }
+            intervals = []
+            for row in rows:
+                intervals.extend(build_intervals(row, transfers.get(row['pk'], []), interval_model))
+            interval_model.objects.bulk_create(intervals, batch_size=batch_size)
+            created += len(intervals)
+    return created
@@ -0,0 +1,8 @@
+from rest_framework import permissions
+
+
+class IsAdvancedAccess(permissions.BasePermission):
+    """Только пользователи с доступом к расширенной информации"""
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and request.user.is_advanced_access)
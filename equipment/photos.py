@@ -0,0 +1,120 @@
+"""
+Уменьшенные копии фото оборудования в формате WebP.
+
+Оригинал хранится как загружен (Equipment.photo), а для списков и карточек
+генерируются варианты фиксированного размера (PHOTO_VARIANTS). Имена файлов
+вариантов записываются в Equipment.photo_variants вместе с именем оригинала,
+из которого они получены: {'source': ..., 'thumb': ..., 'medium': ...}.
+Если source не совпадает с текущим фото - варианты устарели.
+
+Генерация выполняется в фоновом пуле после сохранения оборудования
+(см. signals.py), для уже загруженных фото - командой generate_photo_variants.
+"""
+import io
+import logging
+import os
+from collections import namedtuple
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from equipment.models import Equipment
+
+logger = logging.getLogger(__name__)
+
+# size - размер в пикселях, crop - обрезать до точного размера (иначе вписать с сохранением пропорций)
+PhotoVariant = namedtuple('PhotoVariant', ['size', 'crop'])
+
+PHOTO_VARIANTS = {
+    'thumb': PhotoVariant((128, 128), True),
+    'medium': PhotoVariant((640, 640), False),
+}
+
+WEBP_QUALITY = 80
+
+
+def get_photo_storage():
+    return Equipment._meta.get_field('photo').storage
+
+
+def variant_name(source, variant):
+    """static/images/2024/01/01/photo.jpg -> static/images/2024/01/01/photo.thumb.webp"""
+    root, _extension = os.path.splitext(source)
+    return f'{root}.{variant}.webp'
+
+
+def is_stale(photo, variants):
+    """Варианты не соответствуют текущему фото (в том числе фото удалено или еще не обработано)"""
+    return (photo or '') != (variants or {}).get('source', '')
+
+
+def render_variant(image, variant):
+    """Изображение PIL -> байты WebP нужного размера"""
+    if variant.crop:
+        resized = ImageOps.fit(image, variant.size, Image.Resampling.LANCZOS)
+    else:
+        resized = image.copy()
+        resized.thumbnail(variant.size, Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    resized.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def _render_all(storage, source):
+    """Создает файлы всех вариантов, возвращает словарь для photo_variants"""
+    variants = {'source': source}
+    try:
+        with storage.open(source, 'rb') as file, Image.open(file) as image:
+            # Фото с телефона хранят поворот в EXIF - поворачиваем пиксели, EXIF в WebP не переносится
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+            for name, variant in PHOTO_VARIANTS.items():
+                content = render_variant(image, variant)
+                target = variant_name(source, name)
+                if storage.exists(target):
+                    storage.delete(target)
+                variants[name] = storage.save(target, ContentFile(content))
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as exc:
+        # Запоминаем source без вариантов, чтобы не пытаться обработать файл при каждом сохранении
+        logger.warning('Не удалось обработать фото %s: %s', source, exc)
+        _delete_files(storage, variants)
+        variants = {'source': source}
+    return variants
+
+
+def _delete_files(storage, variants, keep=()):
+    for name in PHOTO_VARIANTS:
+        path = variants.get(name)
+        if path and path not in keep:
+            storage.delete(path)
+
+
+def generate_photo_variants(pk, force=False):
+    """
+    Приводит варианты фото оборудования pk в соответствие с текущим фото.
+    force - пересоздать, даже если варианты актуальны.
+    Возвращает True, если варианты были изменены.
+    """
+    row = Equipment.objects.filter(pk=pk).values('photo', 'photo_variants').first()
+    if row is None:
+        return False
+    source = row['photo'] or ''
+    old = row['photo_variants'] or {}
+    if not force and not is_stale(source, old):
+        return False
+
+    storage = get_photo_storage()
+    new = _render_all(storage, source) if source else {}
+
+    # Фото могли заменить, пока шла обработка - тогда результат не нужен, его обработает следующая задача.
+    # updated_at меняется, чтобы ответы с новыми ссылками не совпали по ETag с закэшированными
+    updated = Equipment.objects.filter(pk=pk, photo=row['photo']).update(
+        photo_variants=new, updated_at=timezone.now()
+    )
+    if not updated:
+        _delete_files(storage, new)
+        return False
+    _delete_files(storage, old, keep=new.values())
+    return True
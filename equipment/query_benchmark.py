@@ -0,0 +1,115 @@
+"""
+Планы и время самых частых запросов API с индексами и без них.
+
+Запросы строятся теми же get_queryset, что и в представлениях, для
+пользователя и оборудования с наибольшим количеством заявок. Вариант
+"до" выполняется в транзакции, где новые индексы удалены, а прежние
+одиночные индексы внешних ключей заявок созданы заново; транзакция
+откатывается, схема БД не меняется. Данные удобно создать generate_fleet.
+"""
+import time
+from statistics import median
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Count, Index
+
+from equipment.models import Equipment
+from equipment.views import UserEquipmentListView, AvailableForTransferEquipmentListView
+from transfer_request.models import TransferRequest
+from transfer_request.views import (
+    IncomingTransferRequestsView, PendingIncomingTransferRequestsView,
+    OutgoingTransferRequestsView, PendingOutgoingTransferRequestsView, TransferEquipmentHistoryView,
+)
+
+User = get_user_model()
+
+# Одиночные индексы внешних ключей заявок, которые заменены составными
+PREVIOUS_INDEXES = [
+    (TransferRequest, Index(fields=['equipment'], name='bench_transfer_equipment')),
+    (TransferRequest, Index(fields=['sender'], name='bench_transfer_sender')),
+    (TransferRequest, Index(fields=['receiver'], name='bench_transfer_receiver')),
+]
+
+BENCHMARK_MODELS = (Equipment, TransferRequest)
+
+
+def _view_queryset(view_class, user, **kwargs):
+    view = view_class(request=SimpleNamespace(user=user), kwargs=kwargs, format_kwarg=None)
+    return view.get_queryset()
+
+
+def get_hot_queries(user, equipment):
+    """[(название, функция без аргументов, queryset для EXPLAIN)] - как их выполняют представления"""
+    page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE') or 10
+    queries = []
+
+    def add_list(name, queryset):
+        queries.append((f'{name}: страница', lambda: list(queryset[:page_size]), queryset[:page_size]))
+        # count() выполняется без сортировки
+        queries.append((f'{name}: количество', queryset.count, queryset.order_by()))
+
+    add_list('equipment/my', _view_queryset(UserEquipmentListView, user))
+    add_list('equipment/my-without-poisoned', _view_queryset(AvailableForTransferEquipmentListView, user))
+    add_list('transfer/incoming', _view_queryset(IncomingTransferRequestsView, user))
+    add_list('transfer/pending-incoming', _view_queryset(PendingIncomingTransferRequestsView, user))
+    add_list('transfer/outgoing', _view_queryset(OutgoingTransferRequestsView, user))
+    add_list('transfer/pending-outgoing', _view_queryset(PendingOutgoingTransferRequestsView, user))
+    add_list('transfer/history', _view_queryset(TransferEquipmentHistoryView, user, public_id=equipment.public_id))
+
+    # Проверка в CreateTransferRequestSerializer.validate
+    pending = TransferRequest.objects.filter(equipment=equipment, sender=user, status='pending')
+    queries.append(('transfer/create: есть ли заявка в ожидании', pending.exists, pending))
+    return queries
+
+
+def pick_subjects():
+    """Пользователь с наибольшим числом входящих заявок и оборудование с самой длинной историей"""
+    user = User.objects.annotate(total=Count('received_transfers')).order_by('-total').first()
+    equipment = Equipment.objects.annotate(total=Count('transfer_history')).order_by('-total').first()
+    if user is None or equipment is None:
+        raise ValueError('Нет данных для замера (создайте их командой generate_fleet)')
+    return user, equipment
+
+
+def current_indexes():
+    return [(model, index) for model in BENCHMARK_MODELS for index in model._meta.indexes]
+
+
+def measure(queries, repeat):
+    """{название: {'plan': текст EXPLAIN, 'ms': медиана времени}}"""
+    result = {}
+    for name, run, queryset in queries:
+        run()  # прогрев кэша страниц
+        timings = []
+        for _index in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        result[name] = {'plan': queryset.explain(), 'ms': median(timings)}
+    return result
+
+
+def run_benchmark(repeat=20):
+    """Возвращает (пользователь, оборудование, {'before': ..., 'after': ...}) в формате measure"""
+    user, equipment = pick_subjects()
+    queries = get_hot_queries(user, equipment)
+
+    # Редактор схемы SQLite нельзя открыть внутри транзакции - собираем SQL заранее и выполняем в ней
+    with connection.schema_editor(collect_sql=True, atomic=False) as schema_editor:
+        for model, index in current_indexes():
+            schema_editor.remove_index(model, index)
+        for model, index in PREVIOUS_INDEXES:
+            schema_editor.add_index(model, index)
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for statement in schema_editor.collected_sql:
+                cursor.execute(statement)
+        before = measure(queries, repeat)
+        transaction.set_rollback(True)
+
+    after = measure(queries, repeat)
+    return user, equipment, {'before': before, 'after': after}
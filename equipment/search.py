@@ -0,0 +1,159 @@
+"""
+Поиск оборудования по денормализованному документу Equipment.search_document.
+
+Документ хранит серийный и инвентарный номер, модель, тип, производителя
+и логин владельца, поэтому поиск идет по одной колонке без JOIN.
+Бэкенд выбирается по СУБД (или настройкой EQUIPMENT_SEARCH_BACKEND):
+    SQLite     - FTS5-таблица с триграммным токенизатором;
+    PostgreSQL - GIN-индекс gin_trgm_ops (расширение pg_trgm);
+    остальные  - LIKE по документу.
+Оба индекса ищут подстроку, как и прежний SearchFilter (ILIKE '%term%').
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from rest_framework import filters
+
+from equipment.models import Equipment
+
+SQLITE_FTS_TABLE = 'equipment_search_fts'
+POSTGRES_TRGM_INDEX = 'equipment_search_document_trgm'
+
+# Триграммный индекс работает для подстрок не короче трех символов
+MIN_INDEXED_TERM_LENGTH = 3
+
+
+class BaseSearchBackend:
+    """Базовый бэкенд: каждое слово запроса должно входить в документ"""
+
+    def filter(self, queryset, terms):
+        raise NotImplementedError
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """Поиск подстроки через LIKE по документу (без специального индекса)"""
+
+    def filter(self, queryset, terms):
+        for term in terms:
+            queryset = queryset.filter(search_document__contains=term.lower())
+        return queryset
+
+
+class PostgresTrigramSearchBackend(SimpleSearchBackend):
+    """
+    В PostgreSQL LIKE '%term%' по колонке с индексом gin_trgm_ops
+    обслуживается индексом, поэтому запрос тот же, что и в SimpleSearchBackend.
+    """
+
+
+class SQLiteFTSSearchBackend(BaseSearchBackend):
+    """Поиск через FTS5-таблицу с токенизатором trigram"""
+
+    def filter(self, queryset, terms):
+        long_terms = [term.lower() for term in terms if len(term) >= MIN_INDEXED_TERM_LENGTH]
+        short_terms = [term for term in terms if len(term) < MIN_INDEXED_TERM_LENGTH]
+
+        if long_terms:
+            # Каждое слово - фраза в кавычках, кавычки внутри удваиваются
+            match = ' AND '.join('"%s"' % term.replace('"', '""') for term in long_terms)
+            queryset = queryset.filter(pk__in=RawSQL(
+                f'SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s',
+                [match]
+            ))
+        return SimpleSearchBackend().filter(queryset, short_terms)
+
+
+def get_search_backend():
+    """Бэкенд из настройки EQUIPMENT_SEARCH_BACKEND или по типу СУБД"""
+    backend_path = getattr(settings, 'EQUIPMENT_SEARCH_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)()
+    if connection.vendor == 'sqlite':
+        return SQLiteFTSSearchBackend()
+    if connection.vendor == 'postgresql':
+        return PostgresTrigramSearchBackend()
+    return SimpleSearchBackend()
+
+
+class EquipmentSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter, который ищет через бэкенд поиска, а не через ILIKE
+    по search_fields. Параметр запроса тот же - ?search=.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return get_search_backend().filter(queryset, terms)
+
+
+def install_search_index(schema_editor):
+    """
+    Создает индекс для поиска (идемпотентно).
+    В SQLite триггеры FTS-таблицы удаляются, когда Django пересоздает
+    таблицу оборудования в миграциях, поэтому такие миграции должны
+    вызывать эту функцию повторно. Таблицу пересоздает любая будущая
+    AddField, AlterField или RemoveField на Equipment: в такую миграцию
+    нужно добавить RunPython(reinstall_search_index) по образцу 0007 и 0009.
+    """
+    vendor = schema_editor.connection.vendor
+    table = Equipment._meta.db_table
+
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} USING fts5("
+            f"search_document, content='{table}', content_rowid='id', tokenize='trigram')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, search_document) "
+            f"VALUES ('delete', old.id, old.search_document); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_au AFTER UPDATE OF search_document ON {table} BEGIN "
+            f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, search_document) "
+            f"VALUES ('delete', old.id, old.search_document); "
+            f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document); END"
+        )
+        schema_editor.execute(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')")
+
+    elif vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {POSTGRES_TRGM_INDEX} ON {table} '
+            f'USING gin (search_document gin_trgm_ops)'
+        )
+
+
+def uninstall_search_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}')
+    elif vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {POSTGRES_TRGM_INDEX}')
+
+
+def refresh_search_documents(queryset, batch_size=1000):
+    """Пересобирает поисковые документы для оборудования из queryset"""
+    queryset = queryset.select_related('type', 'manufacturer', 'current_owner').order_by('pk')
+    batch = []
+    updated = 0
+    for equipment in queryset.iterator(chunk_size=batch_size):
+        document = equipment.build_search_document()
+        if document != equipment.search_document:
+            equipment.search_document = document
+            batch.append(equipment)
+        if len(batch) >= batch_size:
+            updated += Equipment.objects.bulk_update(batch, ['search_document'])
+            batch = []
+    if batch:
+        updated += Equipment.objects.bulk_update(batch, ['search_document'])
+    return updated
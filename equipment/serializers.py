@@ -1,38 +1,89 @@
+from django.urls import reverse
 from rest_framework import serializers
 
-from equipment.models import EquipmentType, Manufacturer, LegalEntity, Equipment
+from base.serializers.bases import SparseFieldsetSerializerMixin, TimedSerializerMixin
+from equipment.models import EquipmentType, Manufacturer, LegalEntity, Equipment, ExportJob
+from equipment.photos import get_photo_storage
 from user.serializers import UserSerializer
 
 
-class EquipmentTypeSerializer(serializers.ModelSerializer):
+class EquipmentTypeSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = EquipmentType
         fields = '__all__'
 
 
-class ManufacturerSerializer(serializers.ModelSerializer):
+class ManufacturerSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Manufacturer
         fields = '__all__'
 
 
-class LegalEntitySerializer(serializers.ModelSerializer):
+class LegalEntitySerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = LegalEntity
         fields = '__all__'
 
 
-class EquipmentSerializer(serializers.ModelSerializer):
+class PhotoVariantField(serializers.Field):
+    """
+    Ссылка на уменьшенную копию фото (см. equipment/photos.py).
+    null, пока копия не создана - клиент показывает photo.
+    """
+
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        kwargs.setdefault('source', 'photo_variants')
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        name = (value or {}).get(self.variant)
+        if not name:
+            return None
+        url = get_photo_storage().url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class EquipmentSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     type = EquipmentTypeSerializer(read_only=True)
     manufacturer = ManufacturerSerializer(read_only=True)
     legal_entity = LegalEntitySerializer(read_only=True)
     current_owner = UserSerializer(read_only=True)
+    photo_thumb = PhotoVariantField('thumb')
+    photo_medium = PhotoVariantField('medium')
 
     class Meta:
         model = Equipment
         fields = (
             'public_id', 'type', 'manufacturer', 'model',
             'serial_number', 'supplier', 'decommissioned_equipment',
-            'photo', 'created_at', 'inverter_number', 'invoice_info',
+            'photo', 'photo_thumb', 'photo_medium', 'created_at', 'inverter_number', 'invoice_info',
             'current_owner', 'legal_entity'
         )
+
+
+class ExportJobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Статус задания на выгрузку и ссылка на готовый файл"""
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = ('public_id', 'format', 'status', 'created_at', 'finished_at', 'error', 'download_url')
+        read_only_fields = ('status', 'created_at', 'finished_at', 'error')
+
+    def get_download_url(self, obj):
+        if obj.status != ExportJob.STATUS_READY:
+            return None
+        url = reverse('export-job-download', kwargs={'public_id': obj.public_id})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class EquipmentLookupSerializer(TimedSerializerMixin, serializers.Serializer):
+    """Результат поиска по номеру: оценка схожести и найденное оборудование"""
+    score = serializers.FloatField()
+    exact = serializers.BooleanField(help_text='Номер совпал без учета регистра, пробелов и дефисов')
+    matched_field = serializers.CharField(help_text='serial_number или inverter_number')
+    equipment = EquipmentSerializer()
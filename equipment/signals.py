@@ -0,0 +1,219 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from equipment.fuzzy import serial_index
+from base.cache.bases import bump_version
+from base.tasks.bases import run_on_commit
+from equipment.effects import apply_equipment_changes
+from equipment.lookup_tables import get_table_names_for_model
+from equipment.models import Equipment, EquipmentType, Manufacturer, LegalEntity, ExportJob
+from equipment.ownership import close_owner_intervals
+from equipment.photos import generate_photo_variants, get_photo_storage, is_stale, PHOTO_VARIANTS
+from equipment.search import refresh_search_documents
+from equipment.summary import (
+    apply_changes, equipment_state, get_stored_row, get_stored_state, group_equipment, stored_row_state,
+    SUMMARY_RELATIONS
+)
+from user.models import Position
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=EquipmentType)
+@receiver(post_save, sender=Manufacturer)
+@receiver(post_save, sender=LegalEntity)
+@receiver(post_delete, sender=EquipmentType)
+@receiver(post_delete, sender=Manufacturer)
+@receiver(post_delete, sender=LegalEntity)
+@receiver(post_delete, sender=User)
+def mark_exports_stale(sender, **kwargs):
+    """
+    Названия справочников и ФИО владельцев попадают в выгрузку,
+    но не меняют Equipment.updated_at, поэтому готовые файлы помечаются устаревшими.
+    """
+    ExportJob.objects.filter(is_stale=False).update(is_stale=True)
+
+
+@receiver(post_save, sender=User)
+def mark_exports_stale_on_user_change(sender, update_fields=None, **kwargs):
+    """Вход в систему обновляет только last_login - на выгрузку это не влияет"""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    mark_exports_stale(sender, **kwargs)
+
+
+@receiver(post_save, sender=EquipmentType)
+@receiver(post_save, sender=Manufacturer)
+@receiver(post_save, sender=LegalEntity)
+@receiver(post_delete, sender=EquipmentType)
+@receiver(post_delete, sender=Manufacturer)
+@receiver(post_delete, sender=LegalEntity)
+def invalidate_lookup_tables(sender, **kwargs):
+    """
+    Новая версия справочника. Увеличиваем после коммита, иначе параллельный
+    запрос успеет закэшировать под новой версией еще старые данные.
+    """
+    for name in get_table_names_for_model(sender):
+        transaction.on_commit(lambda name=name: bump_version(name))
+
+
+# Версия данных пользователей (ФИО, должность) - входит в ETag оборудования с владельцем
+USERS_VERSION = 'users'
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Position)
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Position)
+def invalidate_users_version(sender, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(lambda: bump_version(USERS_VERSION))
+
+
+# Поля связанных моделей, которые попадают в поисковый документ оборудования
+SEARCH_RELATIONS = {
+    EquipmentType: 'type',
+    Manufacturer: 'manufacturer',
+    User: 'current_owner',
+}
+
+
+@receiver(post_save, sender=EquipmentType)
+@receiver(post_save, sender=Manufacturer)
+@receiver(post_save, sender=User)
+def refresh_related_search_documents(sender, instance, created, update_fields=None, **kwargs):
+    """При переименовании типа, производителя или логина обновляем документы их оборудования"""
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    refresh_search_documents(Equipment.objects.filter(**{SEARCH_RELATIONS[sender]: instance}))
+
+
+@receiver(pre_delete, sender=EquipmentType)
+@receiver(pre_delete, sender=Manufacturer)
+@receiver(pre_delete, sender=User)
+def remember_related_equipment(sender, instance, **kwargs):
+    """Связь обнуляется без сигналов (SET_NULL), поэтому запоминаем оборудование заранее"""
+    instance._search_equipment_ids = list(
+        Equipment.objects.filter(**{SEARCH_RELATIONS[sender]: instance}).values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=EquipmentType)
+@receiver(post_delete, sender=Manufacturer)
+@receiver(post_delete, sender=User)
+def refresh_search_documents_after_delete(sender, instance, **kwargs):
+    equipment_ids = getattr(instance, '_search_equipment_ids', None)
+    if equipment_ids:
+        refresh_search_documents(Equipment.objects.filter(pk__in=equipment_ids))
+
+
+@receiver(post_delete, sender=Equipment)
+def remove_from_serial_index(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: serial_index.remove(pk))
+
+
+@receiver(post_save, sender=Equipment)
+def schedule_photo_variants(sender, instance, raw=False, **kwargs):
+    """Новое или удаленное фото - пересоздаем уменьшенные копии в фоне"""
+    if raw or not is_stale(instance.photo.name, instance.photo_variants):
+        return
+    run_on_commit(generate_photo_variants, instance.pk)
+
+
+@receiver(post_delete, sender=Equipment)
+def delete_photo_variants(sender, instance, **kwargs):
+    """Копии принадлежат оборудованию и удаляются вместе с ним (оригинал остается, как и раньше)"""
+    paths = [path for name, path in (instance.photo_variants or {}).items() if name in PHOTO_VARIANTS]
+    if paths:
+        storage = get_photo_storage()
+        transaction.on_commit(lambda: [storage.delete(path) for path in paths])
+
+
+@receiver(pre_save, sender=Equipment)
+def remember_summary_state(sender, instance, raw=False, **kwargs):
+    """
+    Группа сводки и владелец до изменения - чтобы перенести оборудование
+    в новую группу и закрыть период владения.
+    Это отдельный SELECT по первичному ключу на каждое сохранение: значения,
+    загруженные в экземпляр, могут быть устаревшими (параллельное сохранение,
+    SET_NULL при удалении справочника), а ошибка в группе копится в сводке.
+    """
+    if raw or instance._state.adding:
+        instance._summary_state = None
+        instance._stored_owner_id = None
+        return
+    row = get_stored_row(instance.pk)
+    instance._summary_state = stored_row_state(row)
+    instance._stored_owner_id = row['current_owner_id'] if row else None
+
+
+@receiver(post_save, sender=Equipment)
+def update_derived_data(sender, instance, raw=False, **kwargs):
+    """Сводка, период владения при смене владельца и индекс номеров (см. equipment/effects.py)"""
+    if raw:
+        return
+    apply_equipment_changes([
+        (instance, getattr(instance, '_summary_state', None), getattr(instance, '_stored_owner_id', None))
+    ])
+
+
+@receiver(pre_delete, sender=User)
+def close_ownership_intervals(sender, instance, **kwargs):
+    """Оборудование удаляемого сотрудника становится незакрепленным (SET_NULL без сигналов)"""
+    close_owner_intervals(instance)
+
+
+@receiver(pre_delete, sender=Equipment)
+def remember_summary_state_before_delete(sender, instance, **kwargs):
+    """Связи в памяти могут быть устаревшими (SET_NULL при удалении справочника)"""
+    instance._summary_state = get_stored_state(instance.pk)
+
+
+@receiver(post_delete, sender=Equipment)
+def remove_from_inventory_summary(sender, instance, **kwargs):
+    state = getattr(instance, '_summary_state', None) or equipment_state(instance)
+    apply_changes([(state, -1)])
+
+
+# Связь оборудования со справочником или владельцем -> модель
+SUMMARY_RELATION_MODELS = {
+    EquipmentType: 'type',
+    Manufacturer: 'manufacturer',
+    LegalEntity: 'legal_entity',
+    User: 'current_owner',
+}
+
+
+@receiver(pre_delete, sender=EquipmentType)
+@receiver(pre_delete, sender=Manufacturer)
+@receiver(pre_delete, sender=LegalEntity)
+@receiver(pre_delete, sender=User)
+def remember_summary_groups(sender, instance, **kwargs):
+    """Связь обнулится без сигналов (SET_NULL), поэтому запоминаем группы затронутого оборудования"""
+    relation = SUMMARY_RELATION_MODELS[sender]
+    instance._summary_groups = group_equipment(Equipment.objects.filter(**{relation: instance}))
+
+
+@receiver(post_delete, sender=EquipmentType)
+@receiver(post_delete, sender=Manufacturer)
+@receiver(post_delete, sender=LegalEntity)
+@receiver(post_delete, sender=User)
+def move_summary_groups(sender, instance, **kwargs):
+    """
+    Оборудование удаленного владельца переходит в незакрепленное.
+    Строки сводки удаленного справочника уже удалены каскадом - оборудование
+    только добавляется в группу без типа/производителя/юрлица.
+    """
+    field = SUMMARY_RELATIONS[SUMMARY_RELATION_MODELS[sender]]
+    changes = []
+    for state, count in getattr(instance, '_summary_groups', ()):
+        if field == 'is_assigned':
+            changes.append((state, -count))
+            changes.append(({**state, field: False}, count))
+        else:
+            changes.append(({**state, field: None}, count))
+    apply_changes(changes)
@@ -0,0 +1,194 @@
+"""
+Сводка по оборудованию (InventorySummary).
+
+Каждая строка - количество оборудования с одинаковыми типом, производителем,
+юрлицом, признаком списания и наличием владельца. Сигналы (equipment/signals.py)
+переносят единицу между группами при создании, изменении и удалении
+оборудования, поэтому чтение сводки не зависит от размера парка.
+Массовые операции в обход save() (update(), bulk_create) сигналы не вызывают -
+после них нужно вызвать rebuild_inventory_summary().
+
+Сохранение оборудования и изменение сводки выполняются в одной транзакции
+(Equipment.save), а rebuild_inventory_summary блокирует строки сводки до
+подсчета. Поэтому изменение, которое успело попасть в пересчет, не
+применяется к сводке повторно, а не успевшее - применяется к новым строкам.
+"""
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum, ExpressionWrapper, BooleanField, Count
+
+from equipment.models import Equipment, InventorySummary
+
+logger = logging.getLogger(__name__)
+
+# Поле сводки -> поле оборудования
+SUMMARY_FIELDS = {
+    'type_id': 'type_id',
+    'manufacturer_id': 'manufacturer_id',
+    'legal_entity_id': 'legal_entity_id',
+    'decommissioned': 'decommissioned_equipment',
+}
+
+# Параметр group_by -> поле сводки
+SUMMARY_DIMENSIONS = {
+    'type': 'type',
+    'manufacturer': 'manufacturer',
+    'legal_entity': 'legal_entity',
+    'decommissioned': 'decommissioned',
+    'assigned': 'is_assigned',
+}
+
+# Связанные объекты, при удалении которых оборудование переходит в другую группу (SET_NULL)
+SUMMARY_RELATIONS = {
+    'type': 'type_id',
+    'manufacturer': 'manufacturer_id',
+    'legal_entity': 'legal_entity_id',
+    'current_owner': 'is_assigned',
+}
+
+
+def summary_key(state):
+    """Ключ группы: 'тип:производитель:юрлицо:списано:закреплено', '-' вместо NULL"""
+    values = (
+        state['type_id'], state['manufacturer_id'], state['legal_entity_id'],
+        int(state['decommissioned']), int(state['is_assigned'])
+    )
+    return ':'.join('-' if value is None else str(value) for value in values)
+
+
+def equipment_state(equipment):
+    """Группа сводки для экземпляра оборудования"""
+    state = {field: getattr(equipment, source) for field, source in SUMMARY_FIELDS.items()}
+    state['is_assigned'] = equipment.current_owner_id is not None
+    return state
+
+
+def _state_values(queryset):
+    """values() по полям группы и количество для queryset оборудования"""
+    return queryset.order_by().values(*SUMMARY_FIELDS.values()).annotate(
+        is_assigned=ExpressionWrapper(Q(current_owner__isnull=False), output_field=BooleanField()),
+        count=Count('pk'),
+    )
+
+
+def _row_state(row):
+    state = {field: row[source] for field, source in SUMMARY_FIELDS.items()}
+    state['is_assigned'] = bool(row['is_assigned'])
+    return state
+
+
+def get_stored_row(pk):
+    """
+    Поля группы и владелец оборудования по данным из БД (до сохранения изменений).
+    Вызывается в транзакции сохранения или удаления: строка блокируется, и
+    параллельное сохранение того же оборудования читает уже новую группу.
+    """
+    return (
+        Equipment.objects.select_for_update().filter(pk=pk)
+        .values(*SUMMARY_FIELDS.values(), 'current_owner_id').first()
+    )
+
+
+def stored_row_state(row):
+    """Группа оборудования по строке get_stored_row"""
+    if row is None:
+        return None
+    state = {field: row[source] for field, source in SUMMARY_FIELDS.items()}
+    state['is_assigned'] = row['current_owner_id'] is not None
+    return state
+
+
+def get_stored_state(pk):
+    """Группа оборудования по данным из БД (до сохранения изменений)"""
+    return stored_row_state(get_stored_row(pk))
+
+
+def group_equipment(queryset):
+    """[(группа, количество)] для queryset оборудования"""
+    return [(_row_state(row), row['count']) for row in _state_values(queryset)]
+
+
+def apply_changes(changes):
+    """
+    Применяет изменения [(группа, +-количество)] к сводке.
+    Счетчик меняется через F(), поэтому параллельные изменения не теряются.
+    """
+    deltas = {}
+    for state, delta in changes:
+        key = summary_key(state)
+        previous = deltas.get(key, (state, 0))[1]
+        deltas[key] = (state, previous + delta)
+
+    for key, (state, delta) in deltas.items():
+        if not delta:
+            continue
+        if InventorySummary.objects.filter(key=key).update(count=F('count') + delta):
+            continue
+        if delta < 0:
+            logger.warning('Сводка по оборудованию рассинхронизирована (группа %s), нужен rebuild_inventory_summary', key)
+            continue
+        try:
+            with transaction.atomic():
+                InventorySummary.objects.create(key=key, count=delta, **state)
+        except IntegrityError:
+            # Группу одновременно создал другой запрос
+            InventorySummary.objects.filter(key=key).update(count=F('count') + delta)
+
+
+def rebuild_inventory_summary(attempts=3, equipment_model=Equipment, summary_model=InventorySummary):
+    """
+    Пересобирает сводку одним GROUP BY по всему оборудованию, возвращает число групп.
+    Строки сводки блокируются до подсчета и обновляются на месте: изменения,
+    которые ждут блокировки, применяются уже к пересчитанным строкам.
+    Миграции передают исторические модели (equipment_model, summary_model).
+    """
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                return _rebuild_locked(equipment_model, summary_model)
+        except IntegrityError:
+            # Новую группу одновременно создало сохранение оборудования - считаем заново
+            if attempt == attempts - 1:
+                raise
+
+
+def _rebuild_locked(equipment_model, summary_model):
+    existing = dict(summary_model.objects.select_for_update().values_list('key', 'pk'))
+    updated, created = [], []
+    for row in _state_values(equipment_model.objects.all()):
+        state = _row_state(row)
+        key = summary_key(state)
+        summary = summary_model(pk=existing.pop(key, None), key=key, count=row['count'], **state)
+        (updated if summary.pk else created).append(summary)
+
+    summary_model.objects.bulk_update(updated, ['count'], batch_size=1000)
+    summary_model.objects.bulk_create(created, batch_size=1000)
+    summary_model.objects.filter(pk__in=existing.values()).delete()
+    return len(updated) + len(created)
+
+
+def get_inventory_summary(group_by):
+    """Количество оборудования по выбранным измерениям (список названий из SUMMARY_DIMENSIONS)"""
+    fields = [SUMMARY_DIMENSIONS[name] for name in group_by]
+    values = []
+    for name, field in zip(group_by, fields):
+        values.append(field)
+        if name in ('type', 'manufacturer', 'legal_entity'):
+            values.append(f'{field}__name')
+
+    rows = InventorySummary.objects.filter(count__gt=0).values(*values).annotate(
+        total=Sum('count')
+    ).order_by(*values)
+
+    groups = []
+    for row in rows:
+        group = {}
+        for name, field in zip(group_by, fields):
+            if name in ('type', 'manufacturer', 'legal_entity'):
+                group[name] = None if row[field] is None else {'id': row[field], 'name': row[f'{field}__name']}
+            else:
+                group[name] = row[field]
+        group['count'] = row['total']
+        groups.append(group)
+    return groups
@@ -1,3 +1,1130 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import load_workbook
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken
+
+from base.checks.bases import check_shared_cache
+from base.tests.bases import render_both, QueryBudgetTestCase
+from base.views.bases import accepts_encoding
+from equipment.exports import build_export_job, EXPORT_COLUMNS
+from equipment.fleet import clear_fleet, generate_fleet
+from equipment.fuzzy import normalize_number, serial_index, SerialNumberIndex
+from equipment.loadtest import run_load_test, throttling_disabled
+from equipment.models import (
+    Equipment, EquipmentType, Manufacturer, LegalEntity, ExportJob, InventorySummary, OwnershipInterval
+)
+from equipment.photos import generate_photo_variants, get_photo_storage, is_stale
+from equipment.ownership import backfill_ownership, holdings_at, inventory_at, owner_at
+from equipment.search import get_search_backend, SimpleSearchBackend, SQLiteFTSSearchBackend, SQLITE_FTS_TABLE
+from equipment.serializers import EquipmentSerializer
+from equipment.summary import group_equipment, rebuild_inventory_summary, summary_key
+from equipment.views import EquipmentListView
+from transfer_request.models import TransferRequest
+from user.models import Position
+
+User = get_user_model()
+
+SPARSE_FIELDSETS = [
+    None,
+    ('', ''),
+    ('public_id,serial_number,photo', ''),
+    ('', 'type'),
+    ('public_id,type,current_owner', ''),
+    ('serial_number,current_owner.username,current_owner.position.name', ''),
+    ('type.name,manufacturer,legal_entity.short_name', 'manufacturer'),
+]
+
+
+class EquipmentRowMapperTests(TestCase):
+    """RowMapper выдает тот же JSON, что и EquipmentSerializer"""
+
+    @classmethod
+    def setUpTestData(cls):
+        position = Position.objects.create(name='Инженер')
+        organization = LegalEntity.objects.create(name='ООО "Ромашка"', short_name='Ромашка')
+        owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='x',
+            first_name='Иван', last_name='Иванов', position=position, organization=organization
+        )
+        laptop = EquipmentType.objects.create(name='Ноутбук')
+        lenovo = Manufacturer.objects.create(name='Lenovo')
+
+        Equipment.objects.create(
+            type=laptop, manufacturer=lenovo, model='T14 "Gen 3" <&>', serial_number='SN-1',
+            supplier='Поставщик', photo='static/images/2024/01/01/photo 1.jpg',
+            inverter_number='INV-1', invoice_info='Счет №1', current_owner=owner, legal_entity=organization
+        )
+        # Все необязательные связи и поля пустые
+        Equipment.objects.create(model='Без связей', serial_number='SN-2', decommissioned_equipment=True)
+        Equipment.objects.create(manufacturer=lenovo, model='Ä ✓', serial_number='SN-3', photo='')
+
+    def test_output_is_identical(self):
+        queryset = Equipment.objects.order_by('pk')
+        for fields in SPARSE_FIELDSETS:
+            with self.subTest(fields=fields):
+                expected, actual = render_both(EquipmentSerializer, queryset, fields)
+                self.assertEqual(expected, actual)
+
+    def test_unexpanded_relations_use_public_id(self):
+        user = User.objects.get(username='owner')
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/v1/equipment/', {'fields': 'serial_number,type,current_owner,legal_entity'})
+        equipment = Equipment.objects.get(serial_number='SN-1')
+        self.assertEqual(response.json()['results'], [{
+            'serial_number': 'SN-1',
+            'type': str(equipment.type.public_id),
+            'current_owner': str(user.public_id),
+            'legal_entity': str(equipment.legal_entity.public_id),
+        }])
+
+        queryset = Equipment.objects.filter(serial_number='SN-2')
+        expected, actual = render_both(EquipmentSerializer, queryset, ('serial_number,type,manufacturer', ''))
+        self.assertEqual(expected, actual)
+        self.assertEqual(expected, b'[{"type":null,"manufacturer":null,"serial_number":"SN-2"}]')
+
+    def test_list_endpoint(self):
+        user = User.objects.get(username='owner')
+        user.is_advanced_access = True
+        user.save()
+        client = APIClient()
+        client.force_authenticate(user)
+
+        params = {'ordering': 'serial_number', 'count': 'exact'}
+        with self.assertNumQueries(3):  # валидатор ETag, количество и страница
+            response = client.get('/api/v1/equipment/', params)
+        self.assertEqual(response.status_code, 200)
+
+        expected, _ = render_both(EquipmentSerializer, Equipment.objects.order_by('serial_number'))
+        self.assertEqual(JSONRenderer().render(response.json()['results']), expected)
+
+        with self.assertNumQueries(1):
+            not_modified = client.get('/api/v1/equipment/', params, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Manufacturer.objects.filter(name='Lenovo').get().save()
+        self.assertEqual(client.get('/api/v1/equipment/', params, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_etag_changes_after_rename_in_other_process(self):
+        user = User.objects.get(username='owner')
+        client = APIClient()
+        client.force_authenticate(user)
+        etag = client.get('/api/v1/equipment/')['ETag']
+
+        # изменение обработал другой воркер - отдельный экземпляр бэкенда с тем же хранилищем
+        with mock.patch('base.cache.bases.cache', caches.create_connection('default')):
+            with self.captureOnCommitCallbacks(execute=True):
+                Manufacturer.objects.filter(name='Lenovo').update(name='Lenovo Group')
+                Manufacturer.objects.get(name='Lenovo Group').save()
+
+        response = client.get('/api/v1/equipment/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['manufacturer']['name'], 'Lenovo Group')
+
+
+class EquipmentQueryBudgetTests(QueryBudgetTestCase):
+    """Количество SQL-запросов эндпоинтов оборудования не зависит от размера страницы"""
+
+    def test_equipment_list(self):
+        # валидатор ETag, количество, страница
+        self.assertQueryBudget(3, '/api/v1/equipment/', 'page_size', params={'count': 'exact'})
+        self.assertQueryBudget(3, '/api/v1/equipment/', 'page_size', params={'count': 'exact', 'search': 'модель'})
+        self.assertQueryBudget(3, '/api/v1/equipment/', 'page_size', params={
+            'count': 'exact', 'ordering': '-current_owner__username', 'fields': 'serial_number,current_owner.position',
+            'expand': 'current_owner.position',
+        })
+
+    def test_user_equipment(self):
+        self.assertQueryBudget(2, '/api/v1/equipment/my/', 'limit')
+        self.assertQueryBudget(2, '/api/v1/equipment/my-without-poisoned/', 'limit')
+
+    def test_equipment_detail(self):
+        # валидатор ETag и объект
+        self.assertQueryBudget(2, f'/api/v1/equipment/detail/{self.equipment[0].public_id}/')
+
+    def test_lookup(self):
+        self.assertQueryBudget(1, '/api/v1/equipment/lookup/', 'limit', page_sizes=(1, 20), params={'q': 'BUDGET-0'})
+
+    def test_summary_and_lookup_tables(self):
+        self.assertQueryBudget(1, '/api/v1/equipment/summary/', params={'group_by': 'type,manufacturer,legal_entity'})
+        for table in ('types', 'manufacturers', 'legal-entities'):
+            self.assertQueryBudget(1, f'/api/v1/equipment/{table}/')
+
+    def test_export(self):
+        for export_format in ('csv', 'ndjson', 'xlsx'):
+            self.assertQueryBudget(1, '/api/v1/equipment/export/', params={'format': export_format})
+
+    def test_export_job_detail(self):
+        job = ExportJob.objects.create(fingerprint='x', created_by=self.users[0])
+        self.assertQueryBudget(1, f'/api/v1/equipment/export/jobs/{job.public_id}/')
+
+
+class OwnershipIntervalTests(TestCase):
+    """Периоды владения ведутся при смене владельца и строятся из истории заявок"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(username=f'owner_{index}', email=f'owner_{index}@example.com', password='x')
+            for index in range(3)
+        ]
+        cls.type = EquipmentType.objects.create(name='Ноутбук')
+
+    def test_owner_changes(self):
+        first, second, third = self.users
+        equipment = Equipment.objects.create(type=self.type, serial_number='OWN-1', current_owner=first)
+        moments = [timezone.now()]
+        for owner in (second, None, third):
+            equipment.current_owner = owner
+            equipment.save()
+            moments.append(timezone.now())
+
+        self.assertEqual(
+            [owner_at(equipment, moment) for moment in moments], [first, second, None, third]
+        )
+        self.assertIsNone(owner_at(equipment, equipment.created_at - timedelta(seconds=1)))
+        self.assertEqual(list(holdings_at(second, moments[1])), [equipment])
+        self.assertFalse(holdings_at(second, moments[3]).exists())
+        self.assertEqual(OwnershipInterval.objects.filter(equipment=equipment, valid_to__isnull=True).count(), 1)
+
+        # удаление сотрудника закрывает период, история остается
+        third.delete()
+        self.assertIsNone(owner_at(equipment, timezone.now()))
+        self.assertEqual(OwnershipInterval.objects.filter(equipment=equipment).count(), 3)
+
+    def test_backfill_from_transfers(self):
+        first, second, third = self.users
+        equipment = Equipment.objects.create(type=self.type, serial_number='OWN-2', current_owner=first)
+        start = equipment.created_at
+        for index, (sender, receiver, status) in enumerate(
+            [(first, second, 'accepted'), (second, first, 'rejected'), (second, third, 'accepted')], start=1
+        ):
+            TransferRequest.objects.create(
+                equipment=equipment, sender=sender, receiver=receiver, status=status,
+                accepted_at=start + timedelta(days=index)
+            )
+        # владелец меняется без сигналов, как в данных до появления периодов
+        Equipment.objects.filter(pk=equipment.pk).update(current_owner=third)
+
+        self.assertEqual(backfill_ownership(rebuild=True), 3)
+        self.assertEqual(backfill_ownership(), 0)
+        self.assertEqual(
+            list(OwnershipInterval.objects.filter(equipment=equipment).values_list('owner', 'valid_from', 'valid_to')),
+            [
+                (first.pk, start, start + timedelta(days=1)),
+                (second.pk, start + timedelta(days=1), start + timedelta(days=3)),
+                (third.pk, start + timedelta(days=3), None),
+            ]
+        )
+        self.assertEqual(owner_at(equipment, start + timedelta(days=2)), second)
+        self.assertEqual(
+            list(inventory_at(start + timedelta(days=2)).values_list('equipment', 'owner')), [(equipment.pk, second.pk)]
+        )
+
+
+class EquipmentSaveTests(TestCase):
+    """Сохранение не затирает поля, которые обновляются отдельно, и отложенные поля"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.equipment = Equipment.objects.create(model='X1', serial_number='SAVE-1', inverter_number='INV-S1')
+
+    def test_stale_instance_keeps_maintained_fields(self):
+        stale = Equipment.objects.get(pk=self.equipment.pk)
+        variants = {'thumb': 'equipment/variants/thumb.webp'}
+        Equipment.objects.filter(pk=self.equipment.pk).update(has_pending_transfer=True, photo_variants=variants)
+
+        stale.model = 'X2'
+        stale.save()
+        saved = Equipment.objects.get(pk=self.equipment.pk)
+        self.assertEqual((saved.model, saved.has_pending_transfer, saved.photo_variants), ('X2', True, variants))
+        self.assertIn('x2', saved.search_document)
+
+    def test_deferred_fields_not_saved(self):
+        partial = Equipment.objects.only('pk', 'model', 'serial_number').get(pk=self.equipment.pk)
+        Equipment.objects.filter(pk=self.equipment.pk).update(inverter_number='INV-NEW')
+
+        partial.model = 'X3'
+        with CaptureQueriesContext(connection) as queries:
+            partial.save()
+        update = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(update), 1)
+        self.assertNotIn('inverter_number', update[0])
+        saved = Equipment.objects.get(pk=self.equipment.pk)
+        self.assertEqual((saved.model, saved.inverter_number), ('X3', 'INV-NEW'))
+
+
+class EquipmentSearchTests(TestCase):
+    """Поиск по документу: все слова запроса, короткие слова и обновление документа"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='ivanov', email='ivanov@example.com', password='x', is_advanced_access=True
+        )
+        cls.laptop = EquipmentType.objects.create(name='Ноутбук')
+        cls.lenovo = Manufacturer.objects.create(name='Lenovo')
+        cls.acer = Manufacturer.objects.create(name='Acer')
+        Equipment.objects.create(
+            type=cls.laptop, manufacturer=cls.lenovo, model='ThinkPad X1', serial_number='SRCH-1',
+            inverter_number='INV-1', current_owner=cls.user,
+        )
+        Equipment.objects.create(
+            type=cls.laptop, manufacturer=cls.acer, model='Aspire', serial_number='SRCH-2', inverter_number='INV-2',
+        )
+        Equipment.objects.create(manufacturer=cls.lenovo, model='M90', serial_number='SRCH-3', inverter_number='INV-3')
+
+    def search(self, query):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/v1/equipment/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [item['serial_number'] for item in response.data['results']]
+
+    @skipUnless(connection.vendor == 'sqlite', 'FTS5 только в SQLite')
+    def test_fts_triggers_exist_after_migrate(self):
+        # миграции, пересоздающие таблицу оборудования, должны вернуть триггеры (см. install_search_index)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s ORDER BY name",
+                [Equipment._meta.db_table]
+            )
+            triggers = [name for name, in cursor.fetchall()]
+        self.assertEqual(triggers, [f'{SQLITE_FTS_TABLE}_{suffix}' for suffix in ('ad', 'ai', 'au')])
+
+        # сохранение попадает в FTS-индекс через триггер
+        Equipment.objects.filter(serial_number='SRCH-3').get().save()
+        self.assertEqual(SQLiteFTSSearchBackend().filter(Equipment.objects.all(), ['m90']).get().serial_number, 'SRCH-3')
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search('lenovo'), ['SRCH-1', 'SRCH-3'])
+        self.assertEqual(self.search('LENOVO ноутбук'), ['SRCH-1'])
+        self.assertEqual(self.search('lenovo ivanov thinkpad'), ['SRCH-1'])
+        self.assertEqual(self.search('acer ivanov'), [])
+
+    def test_short_terms(self):
+        """Слова короче трех символов ищутся через LIKE, остальные - через индекс"""
+        self.assertEqual(self.search('x1'), ['SRCH-1'])
+        self.assertEqual(self.search('m9 lenovo'), ['SRCH-3'])
+        self.assertIsInstance(get_search_backend(), SQLiteFTSSearchBackend)
+
+        with CaptureQueriesContext(connection) as queries:
+            list(SQLiteFTSSearchBackend().filter(Equipment.objects.all(), ['x1', 'thinkpad']))
+        sql = queries.captured_queries[0]['sql']
+        self.assertIn('MATCH', sql)
+        self.assertIn('LIKE', sql)
+        self.assertEqual(
+            list(SQLiteFTSSearchBackend().filter(Equipment.objects.order_by('pk'), ['nk', 'inv-'])),
+            list(SimpleSearchBackend().filter(Equipment.objects.order_by('pk'), ['nk', 'inv-'])),
+        )
+
+    def test_document_refreshed(self):
+        self.laptop.name = 'Ультрабук'
+        self.laptop.save()
+        self.assertEqual(self.search('ультрабук'), ['SRCH-1', 'SRCH-2'])
+        self.assertEqual(self.search('ноутбук'), [])
+
+        self.user.username = 'petrov'
+        self.user.save()
+        self.assertEqual(self.search('petrov'), ['SRCH-1'])
+        self.assertEqual(self.search('ivanov'), [])
+
+        self.acer.delete()
+        self.assertEqual(self.search('acer'), [])
+        self.assertEqual(Equipment.objects.get(serial_number='SRCH-2').search_document, 'srch-2\naspire\nультрабук\ninv-2')
+
+    def test_build_search_document_queries(self):
+        """Загруженные связи берутся из памяти, остальные - одним запросом"""
+        loaded = Equipment.objects.select_related('type', 'manufacturer', 'current_owner').get(serial_number='SRCH-1')
+        with self.assertNumQueries(0):
+            document = loaded.build_search_document()
+        self.assertEqual(document, 'srch-1\nthinkpad x1\nноутбук\nlenovo\nivanov\ninv-1')
+
+        plain = Equipment.objects.get(serial_number='SRCH-1')
+        with self.assertNumQueries(1):
+            self.assertEqual(plain.build_search_document(), document)
+
+        plain.manufacturer = self.acer
+        plain.current_owner = None
+        with self.assertNumQueries(1):
+            self.assertEqual(plain.build_search_document(), 'srch-1\nthinkpad x1\nноутбук\nacer\ninv-1')
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    """Версии данных сбрасываются во всех процессах только с общим кэшем"""
+    locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+    def test_process_local_cache_refused(self):
+        with override_settings(DEBUG=False, CACHES=self.locmem):
+            self.assertEqual([error.id for error in check_shared_cache()], ['base.E001'])
+
+    def test_allowed(self):
+        with override_settings(DEBUG=True, CACHES=self.locmem):
+            self.assertEqual(check_shared_cache(), [])
+        with override_settings(DEBUG=False):
+            self.assertEqual(check_shared_cache(), [])
+
+
+def summary_counts():
+    """Сводка из таблицы: {ключ группы: количество}"""
+    return dict(InventorySummary.objects.filter(count__gt=0).values_list('key', 'count'))
+
+
+def expected_summary_counts():
+    """Сводка, посчитанная заново по оборудованию"""
+    return {summary_key(state): count for state, count in group_equipment(Equipment.objects.all())}
+
+
+def read_response(response):
+    return b''.join(response.streaming_content) if response.streaming else response.content
+
+
+class EquipmentImportTests(TestCase):
+    """Загрузка оборудования: выгрузка загружается обратно, ошибки - по строкам"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='importer', email='importer@example.com', password='x', is_advanced_access=True
+        )
+        cls.laptop = EquipmentType.objects.create(name='Ноутбук')
+        cls.monitor = EquipmentType.objects.create(name='Монитор')
+        cls.lenovo = Manufacturer.objects.create(name='Lenovo')
+        cls.organization = LegalEntity.objects.create(name='ООО Импорт', short_name='Импорт')
+        for index in range(3):
+            Equipment.objects.create(
+                type=cls.laptop if index % 2 else cls.monitor, manufacturer=cls.lenovo, model=f'Модель {index}',
+                serial_number=f'IMP-{index}', inverter_number=f'INV-{index}', legal_entity=cls.organization,
+                decommissioned_equipment=index == 2, current_owner=cls.user if index == 0 else None,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, name, content):
+        response = self.client.post(
+            '/api/v1/equipment/import/', {'file': SimpleUploadedFile(name, content)}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def make_csv(self, rows):
+        """CSV с заголовками выгрузки, rows - словари по ключам колонок"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([column.header for column in EXPORT_COLUMNS])
+        for row in rows:
+            writer.writerow([row.get(column.key, '') for column in EXPORT_COLUMNS])
+        return buffer.getvalue().encode('utf-8')
+
+    def test_round_trip(self):
+        original = dict(Equipment.objects.values_list('serial_number', 'model'))
+        for export_format in ('xlsx', 'csv', 'ndjson'):
+            with self.subTest(format=export_format):
+                content = read_response(self.client.get('/api/v1/equipment/export/', {'format': export_format}))
+                # через save(), чтобы сводка была согласована до загрузки
+                for equipment in Equipment.objects.all():
+                    equipment.model, equipment.decommissioned_equipment, equipment.type = 'Изменено', False, None
+                    equipment.save()
+
+                report = self.upload(f'equipment.{export_format}', content)
+                self.assertEqual(report, {'total': 3, 'created': 0, 'updated': 3, 'errors': []})
+                self.assertEqual(dict(Equipment.objects.values_list('serial_number', 'model')), original)
+                self.assertTrue(Equipment.objects.get(serial_number='IMP-2').decommissioned_equipment)
+                self.assertEqual(Equipment.objects.get(serial_number='IMP-1').type, self.laptop)
+                # владелец не загружается, но остается в поисковом документе
+                self.assertIn('importer', Equipment.objects.get(serial_number='IMP-0').search_document)
+                self.assertEqual(summary_counts(), expected_summary_counts())
+
+    def test_create_and_update_by_serial_number(self):
+        report = self.upload('equipment.csv', self.make_csv([
+            {'serial_number': 'IMP-1', 'model': 'Новая модель', 'type': 'монитор', 'decommissioned_equipment': 'Да'},
+            {'serial_number': 'IMP-NEW', 'model': 'X1', 'type': 'Ноутбук', 'manufacturer': 'LENOVO',
+             'inverter_number': 'INV-NEW', 'decommissioned_equipment': 'Нет'},
+        ]))
+        self.assertEqual((report['created'], report['updated'], report['errors']), (1, 1, []))
+
+        updated = Equipment.objects.get(serial_number='IMP-1')
+        self.assertEqual((updated.model, updated.type, updated.decommissioned_equipment), ('Новая модель', self.monitor, True))
+        created = Equipment.objects.get(serial_number='IMP-NEW')
+        self.assertEqual((created.type, created.manufacturer, created.current_owner), (self.laptop, self.lenovo, None))
+        self.assertEqual(created.search_document.split('\n'), ['imp-new', 'x1', 'ноутбук', 'lenovo', 'inv-new'])
+        self.assertIn('монитор', updated.search_document)
+        self.assertEqual(Equipment.objects.count(), 4)
+        self.assertEqual(summary_counts(), expected_summary_counts())
+
+    def test_partial_file_keeps_missing_columns(self):
+        fields = (
+            'serial_number', 'type', 'manufacturer', 'supplier', 'legal_entity', 'invoice_info',
+            'inverter_number', 'decommissioned_equipment', 'current_owner',
+        )
+        Equipment.objects.filter(serial_number='IMP-2').update(supplier='Поставщик', invoice_info='Счет 1')
+        expected = {row['serial_number']: row for row in Equipment.objects.values(*fields)}
+        expected['IMP-0']['decommissioned_equipment'] = True
+
+        report = self.upload('equipment.csv', 'Серийный номер,Модель\nIMP-1,Частичная\nIMP-2,Частичная\n'.encode())
+        self.assertEqual((report['updated'], report['errors']), (2, []))
+        record = {'serial_number': 'IMP-0', 'model': 'Частичная', 'decommissioned_equipment': True}
+        report = self.upload('equipment.ndjson', json.dumps(record).encode())
+        self.assertEqual((report['updated'], report['errors']), (1, []))
+
+        self.assertEqual({row['serial_number']: row for row in Equipment.objects.values(*fields)}, expected)
+        for equipment in Equipment.objects.all():
+            self.assertEqual(equipment.model, 'Частичная')
+            self.assertEqual(equipment.search_document, equipment.build_search_document())
+        self.assertEqual(summary_counts(), expected_summary_counts())
+
+    def test_row_errors(self):
+        report = self.upload('equipment.csv', self.make_csv([
+            {'model': 'Без номера'},
+            {'serial_number': 'ERR-1'},
+            {'serial_number': 'ERR-2', 'model': 'M', 'type': 'Планшет'},
+            {'serial_number': 'ERR-3', 'model': 'M', 'decommissioned_equipment': 'Возможно'},
+            {'serial_number': 'OK-1', 'model': 'M'},
+        ]))
+        self.assertEqual((report['total'], report['created'], report['updated']), (5, 1, 0))
+        self.assertEqual(
+            [(error['row'], sorted(error['errors'])) for error in report['errors']],
+            [(2, ['serial_number']), (3, ['model']), (4, ['type']), (5, ['decommissioned_equipment'])]
+        )
+        self.assertFalse(Equipment.objects.filter(serial_number__startswith='ERR-').exists())
+        self.assertTrue(Equipment.objects.filter(serial_number='OK-1').exists())
+
+    def test_bad_file(self):
+        response = self.client.post(
+            '/api/v1/equipment/import/', {'file': SimpleUploadedFile('equipment.txt', b'x')}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            '/api/v1/equipment/import/', {'file': SimpleUploadedFile('equipment.csv', 'Модель\nX\n'.encode())},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Серийный номер', str(response.data['file']))
+
+
+class InventorySummaryTests(TestCase):
+    """Сводка, которую ведут сигналы, совпадает с полной пересборкой"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', email='owner@example.com', password='x')
+        cls.other = User.objects.create_user(username='other', email='other@example.com', password='x')
+        cls.laptop = EquipmentType.objects.create(name='Ноутбук')
+        cls.monitor = EquipmentType.objects.create(name='Монитор')
+        cls.lenovo = Manufacturer.objects.create(name='Lenovo')
+        cls.organization = LegalEntity.objects.create(name='ООО Сводка', short_name='Сводка')
+
+    def assertSummaryConsistent(self):
+        incremental = summary_counts()
+        self.assertEqual(incremental, expected_summary_counts())
+        rebuild_inventory_summary()
+        self.assertEqual(summary_counts(), incremental)
+
+    def create(self, serial_number, **kwargs):
+        return Equipment.objects.create(
+            model='M', serial_number=serial_number, inverter_number=f'INV-{serial_number}', **kwargs
+        )
+
+    def test_signals_match_rebuild(self):
+        first = self.create('SUM-1', type=self.laptop, manufacturer=self.lenovo, current_owner=self.owner)
+        second = self.create('SUM-2', type=self.laptop, legal_entity=self.organization, current_owner=self.other)
+        self.create('SUM-3', type=self.monitor, manufacturer=self.lenovo)
+        self.assertSummaryConsistent()
+
+        first.current_owner = None
+        first.save()
+        self.assertSummaryConsistent()
+
+        second.decommissioned_equipment = True
+        second.save()
+        self.assertSummaryConsistent()
+
+        # Устаревший экземпляр: группа берется из БД, а не из памяти
+        stale = Equipment.objects.get(pk=first.pk)
+        Equipment.objects.get(pk=first.pk).save()
+        first.current_owner = self.owner
+        first.save()
+        stale.model = 'M2'
+        stale.save()
+        self.assertSummaryConsistent()
+
+        first.delete()
+        self.assertSummaryConsistent()
+
+        self.monitor.delete()
+        self.lenovo.delete()
+        self.assertSummaryConsistent()
+
+        self.other.delete()
+        self.organization.delete()
+        self.assertSummaryConsistent()
+        self.assertEqual(summary_counts(), {'-:-:-:0:0': 1, f'{self.laptop.pk}:-:-:1:0': 1})
+
+    def test_rebuild_updates_rows_in_place(self):
+        self.create('SUM-1', type=self.laptop)
+        self.create('SUM-2', type=self.monitor)
+        laptop_row = InventorySummary.objects.get(type=self.laptop)
+        InventorySummary.objects.filter(pk=laptop_row.pk).update(count=10)
+        Equipment.objects.filter(type=self.monitor).update(type=self.laptop)
+
+        self.assertEqual(rebuild_inventory_summary(), 1)
+        self.assertEqual(list(InventorySummary.objects.values_list('pk', 'count')), [(laptop_row.pk, 2)])
+
+
+class SerialNumberIndexTests(TestCase):
+    """Нечеткий поиск номеров: нормализация, порядок результатов и владелец"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', email='owner@example.com', password='x')
+        cls.other = User.objects.create_user(username='other', email='other@example.com', password='x')
+        cls.exact = Equipment.objects.create(model='M', serial_number='SN-IO10', inverter_number='INV 001')
+        cls.similar = Equipment.objects.create(
+            model='M', serial_number='SN-IO11', inverter_number='INV-777', current_owner=cls.owner
+        )
+        cls.foreign = Equipment.objects.create(
+            model='M', serial_number='SN-IO12', inverter_number='INV-888', current_owner=cls.other
+        )
+
+    def setUp(self):
+        self.index = SerialNumberIndex(refresh_interval=3600)
+        self.index.load()
+
+    def lookup(self, query, **kwargs):
+        return [(match.pk, match.field, match.exact) for match in self.index.lookup(query, **kwargs)]
+
+    def test_normalize_number(self):
+        self.assertEqual(normalize_number('sn-0O1 i'), 'SN0011')
+        self.assertEqual(normalize_number(' СН_ОI-10 '), 'CH0110')
+        self.assertEqual(normalize_number(None), '')
+
+    def test_confusables_and_separators(self):
+        for query in ('sn-io10', 'SN 1O 1O', 'sn1010', 'sn_i0_1o', 'SN-10-10'):
+            with self.subTest(query=query):
+                self.assertEqual(self.lookup(query, limit=1), [(self.exact.pk, 'serial_number', True)])
+        self.assertEqual(self.lookup('inv-0o1', limit=1), [(self.exact.pk, 'inverter_number', True)])
+
+    def test_exact_before_fuzzy(self):
+        matches = self.index.lookup('sn-io10', limit=3)
+        self.assertEqual([match.pk for match in matches], [self.exact.pk, self.similar.pk, self.foreign.pk])
+        self.assertEqual([match.exact for match in matches], [True, False, False])
+        self.assertEqual(matches[0].score, 100.0)
+        self.assertGreaterEqual(matches[1].score, matches[2].score)
+
+    def test_owner_scope(self):
+        self.assertEqual(self.lookup('sn-io10', owner_id=self.owner.pk), [(self.similar.pk, 'serial_number', False)])
+        self.assertEqual(self.lookup('sn-io12', owner_id=self.owner.pk, limit=1)[0][0], self.similar.pk)
+        self.assertEqual(self.lookup('inv-888', owner_id=self.owner.pk, score_cutoff=90), [])
+
+        self.foreign.current_owner = self.owner
+        self.index.update(self.foreign)
+        self.assertEqual(self.lookup('inv-888', owner_id=self.owner.pk)[0], (self.foreign.pk, 'inverter_number', True))
+        self.assertEqual(self.lookup('sn-io12', owner_id=self.other.pk), [])
+
+        self.index.remove(self.similar.pk)
+        self.assertEqual([pk for pk, *_ in self.lookup('sn-io11', owner_id=self.owner.pk)], [self.foreign.pk])
+
+    def test_signals_update_after_commit(self):
+        serial_index.load()
+        try:
+            with transaction.atomic():
+                Equipment.objects.create(model='M', serial_number='ROLLBACK-1', inverter_number='INV-RB')
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertFalse(any(match.exact for match in serial_index.lookup('rollback-1')))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            created = Equipment.objects.create(model='M', serial_number='COMMIT-1', inverter_number='INV-C')
+        self.assertEqual(serial_index.lookup('commit-1', limit=1)[0].pk, created.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            created.delete()
+        self.assertFalse(any(match.exact for match in serial_index.lookup('commit-1')))
+
+
+class RequestTimingTests(TestCase):
+    """Server-Timing отдается только сотрудникам с is_staff по заголовку X-Request-Timing"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='x', is_staff=True, is_advanced_access=True
+        )
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com', password='x', is_advanced_access=True
+        )
+        Equipment.objects.create(model='M', serial_number='TIME-1', inverter_number='INV-T1', current_owner=cls.user)
+
+    def get(self, user, **headers):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get('/api/v1/equipment/', {'expand': 'current_owner'}, headers=headers)
+
+    def test_staff_gets_server_timing(self):
+        with self.assertLogs('base.middleware.timing', 'INFO') as logs:
+            response = self.get(self.staff, **{'X-Request-Timing': '1'})
+        self.assertEqual(response.status_code, 200)
+        metrics = {metric.split(';')[0]: metric for metric in response['Server-Timing'].split(', ')}
+        self.assertEqual(set(metrics), {'total', 'db', 'view', 'serialize', 'render'})
+        self.assertRegex(metrics['db'], r'desc="[1-9]\d* queries"')
+        self.assertIn('"path": "/api/v1/equipment/"', logs.output[0])
+
+    def test_jwt_staff_gets_server_timing(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.staff)}')
+        with self.assertLogs('base.middleware.timing', 'INFO'):
+            response = client.get('/api/v1/equipment/', headers={'X-Request-Timing': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+
+    def test_hidden_from_non_staff_and_unsampled(self):
+        # от обычного пользователя и без токена заголовок не включает замер
+        with mock.patch('base.middleware.timing.RequestTiming') as timing:
+            response = self.get(self.user, **{'X-Request-Timing': '1'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(APIClient().get('/api/v1/equipment/', headers={'X-Request-Timing': '1'}).status_code, 401)
+            bad_token = APIClient(headers={'Authorization': 'Bearer invalid', 'X-Request-Timing': '1'})
+            self.assertEqual(bad_token.get('/api/v1/equipment/').status_code, 401)
+        timing.assert_not_called()
+        self.assertNotIn('Server-Timing', response)
+
+        response = self.get(self.staff)
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+    def test_sampled_request_only_logged(self):
+        with self.assertLogs('base.middleware.timing', 'INFO') as logs:
+            response = self.get(self.user)
+        self.assertNotIn('Server-Timing', response)
+        self.assertIn('"serialize_ms"', logs.output[0])
+
+
+class EquipmentExportTests(TestCase):
+    """Выгрузка: строки всех форматов соответствуют данным, gzip - по Accept-Encoding"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='exporter', email='exporter@example.com', password='x', is_advanced_access=True,
+            last_name='Петров', middle_name='Петрович',
+        )
+        cls.nameless = User.objects.create_user(username='nameless', email='nameless@example.com', password='x')
+        laptop = EquipmentType.objects.create(name='Ноутбук')
+        organization = LegalEntity.objects.create(name='ООО Выгрузка', short_name='Выгрузка')
+        Equipment.objects.create(
+            type=laptop, model='T14; "Gen 3"', serial_number='EXP-1', inverter_number='INV-1',
+            supplier='Поставщик, Ко', current_owner=cls.user, legal_entity=organization,
+        )
+        Equipment.objects.create(model='Без связей', serial_number='EXP-2', decommissioned_equipment=True)
+        Equipment.objects.create(model='M', serial_number='EXP-3', current_owner=cls.nameless)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, export_format, **headers):
+        response = self.client.get('/api/v1/equipment/export/', {'format': export_format}, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        return response, read_response(response)
+
+    def expected_table(self):
+        header = [column.header for column in EXPORT_COLUMNS]
+        return [header] + [
+            ['EXP-1', 'INV-1', 'T14; "Gen 3"', 'Ноутбук', '-', 'Поставщик, Ко', 'Нет', '-', 'Петров Петрович',
+             'ООО Выгрузка'],
+            ['EXP-2', '-', 'Без связей', '-', '-', '-', 'Да', '-', '-', '-'],
+            ['EXP-3', '-', 'M', '-', '-', '-', 'Нет', '-', '-', '-'],
+        ]
+
+    def test_csv(self):
+        _response, content = self.export('csv')
+        rows = list(csv.reader(io.StringIO(content.decode('utf-8-sig'))))
+        self.assertEqual(rows, self.expected_table())
+
+    def test_xlsx_opens_in_openpyxl(self):
+        response, content = self.export('xlsx')
+        self.assertNotIn('Content-Encoding', response)
+        sheet = load_workbook(io.BytesIO(content), read_only=True).active
+        self.assertEqual([list(row) for row in sheet.iter_rows(values_only=True)], self.expected_table())
+
+    def test_ndjson(self):
+        _response, content = self.export('ndjson')
+        records = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(records[0], {
+            'serial_number': 'EXP-1', 'inverter_number': 'INV-1', 'model': 'T14; "Gen 3"', 'type': 'Ноутбук',
+            'manufacturer': None, 'supplier': 'Поставщик, Ко', 'decommissioned_equipment': False,
+            'invoice_info': None, 'current_owner': 'Петров Петрович', 'legal_entity': 'ООО Выгрузка',
+        })
+        self.assertEqual(records[1]['decommissioned_equipment'], True)
+        # Нет владельца или у владельца нет ФИО - null, а не пустая строка
+        self.assertEqual([record['current_owner'] for record in records[1:]], [None, None])
+
+    def test_gzip(self):
+        _response, plain = self.export('ndjson')
+        for accept_encoding in ('gzip', 'deflate, gzip;q=0.5', 'br, *'):
+            with self.subTest(accept_encoding=accept_encoding):
+                response, content = self.export('ndjson', **{'Accept-Encoding': accept_encoding})
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+                self.assertEqual(gzip.decompress(content), plain)
+        for accept_encoding in ('', 'gzip;q=0', 'identity', '*;q=0', 'gzip;q=0, *'):
+            with self.subTest(accept_encoding=accept_encoding):
+                response, content = self.export('ndjson', **{'Accept-Encoding': accept_encoding})
+                self.assertNotIn('Content-Encoding', response)
+                self.assertEqual(content, plain)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        response, _content = self.export('xlsx', **{'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_accepts_encoding(self):
+        self.assertTrue(accepts_encoding('GZIP ; Q=0.001', 'gzip'))
+        self.assertFalse(accepts_encoding('gzip;q=0.0', 'gzip'))
+        self.assertFalse(accepts_encoding('gzip;q=bad', 'gzip'))
+        self.assertFalse(accepts_encoding(None, 'gzip'))
+
+
+class ExportJobTests(TestCase):
+    """Фоновая выгрузка: повторное использование файла, устаревание, скачивание"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='jobs', email='jobs@example.com', password='x', is_advanced_access=True
+        )
+        cls.laptop = EquipmentType.objects.create(name='Ноутбук')
+        Equipment.objects.create(type=cls.laptop, model='T14', serial_number='JOB-1', current_owner=cls.user)
+        Equipment.objects.create(model='M', serial_number='JOB-2')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_job(self, export_format='csv'):
+        """POST задания; фоновая сборка не запускается - ее вызывает тест"""
+        with mock.patch('equipment.exports.run_on_commit') as scheduled:
+            response = self.client.post('/api/v1/equipment/export/jobs/', {'format': export_format})
+        self.assertIn(response.status_code, (200, 202))
+        return ExportJob.objects.get(public_id=response.data['public_id']), response, scheduled
+
+    def test_running_and_ready_jobs_are_reused(self):
+        job, response, scheduled = self.create_job()
+        self.assertEqual((response.status_code, job.status), (202, ExportJob.STATUS_PENDING))
+        scheduled.assert_called_once_with(build_export_job, job.pk)
+
+        ExportJob.objects.filter(pk=job.pk).update(status=ExportJob.STATUS_RUNNING)
+        running, response, scheduled = self.create_job()
+        self.assertEqual((running, response.status_code), (job, 202))
+        scheduled.assert_not_called()
+
+        build_export_job(job.pk)
+        ready, response, scheduled = self.create_job()
+        self.assertEqual((ready, response.status_code), (job, 200))
+        self.assertTrue(response.data['download_url'].endswith(f'/export/jobs/{job.public_id}/download/'))
+        scheduled.assert_not_called()
+
+        # другой формат - отдельное задание
+        other, _response, _scheduled = self.create_job('ndjson')
+        self.assertNotEqual(other, job)
+        self.assertEqual(ExportJob.objects.count(), 2)
+
+    def test_changes_invalidate_ready_job(self):
+        job, _response, _scheduled = self.create_job()
+        build_export_job(job.pk)
+
+        # справочник не меняет updated_at оборудования - файл помечается сигналом
+        self.laptop.name = 'Ноутбук 14'
+        self.laptop.save()
+        job.refresh_from_db()
+        self.assertTrue(job.is_stale)
+        renamed, _response, _scheduled = self.create_job()
+        self.assertNotEqual(renamed, job)
+        build_export_job(renamed.pk)
+
+        # изменение оборудования меняет отпечаток данных
+        equipment = Equipment.objects.get(serial_number='JOB-2')
+        equipment.model = 'M2'
+        equipment.save()
+        changed, response, scheduled = self.create_job()
+        self.assertNotIn(changed, (job, renamed))
+        self.assertEqual(response.status_code, 202)
+        scheduled.assert_called_once_with(build_export_job, changed.pk)
+
+        # вход пользователя в систему выгрузку не меняет
+        build_export_job(changed.pk)
+        self.client.login(username='jobs', password='x')
+        changed.refresh_from_db()
+        self.assertFalse(changed.is_stale)
+
+    def test_download(self):
+        job, _response, _scheduled = self.create_job()
+        url = f'/api/v1/equipment/export/jobs/{job.public_id}/download/'
+        for job_status in (ExportJob.STATUS_PENDING, ExportJob.STATUS_RUNNING):
+            ExportJob.objects.filter(pk=job.pk).update(status=job_status)
+            response = self.client.get(url)
+            self.assertEqual((response.status_code, response.data['status']), (409, job_status))
+
+        build_export_job(job.pk)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('equipment_list.csv', response['Content-Disposition'])
+        streamed = read_response(self.client.get('/api/v1/equipment/export/', {'format': 'csv'}))
+        self.assertEqual(read_response(response), streamed)
+
+
+class KeysetPaginationTests(TestCase):
+    """Обход списка оборудования курсором по каждому полю сортировки в обе стороны"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='keyset', email='keyset@example.com', password='x', is_advanced_access=True
+        )
+        other = User.objects.create_user(username='another', email='another@example.com', password='x')
+        laptop = EquipmentType.objects.create(name='Ноутбук')
+        monitor = EquipmentType.objects.create(name='Монитор')
+        lenovo = Manufacturer.objects.create(name='Lenovo')
+        # Повторяющиеся значения и NULL в связях, чтобы страницы делили группы с одинаковым значением
+        for index in range(9):
+            Equipment.objects.create(
+                serial_number=f'KS-{index}', inverter_number=f'INV-{index}', model=f'M{index % 3}',
+                type=(laptop, monitor, None)[index % 3], manufacturer=lenovo if index % 2 else None,
+                current_owner=(cls.user, other, None, None)[index % 4],
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def ascending(self, field):
+        """Ожидаемый порядок по возрастанию: NULL первыми, второй ключ - id"""
+        rows = sorted(
+            Equipment.objects.values_list(field, 'pk', 'serial_number'),
+            key=lambda row: (row[0] is not None, row[0] or '', row[1]),
+        )
+        return [serial for _value, _pk, serial in rows]
+
+    def walk(self, url, params, link='next'):
+        serials, pages = [], 0
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            serials.extend(item['serial_number'] for item in response.data['results'])
+            pages += 1
+            if not response.data[link]:
+                return serials, pages, response
+            response = self.client.get(response.data[link])
+
+    def test_traversal_in_both_directions(self):
+        for field in EquipmentListView.ordering_fields:
+            ascending = self.ascending(field)
+            # По убыванию порядок обратный: NULL последними, id по убыванию
+            for ordering, expected in ((field, ascending), (f'-{field}', ascending[::-1])):
+                with self.subTest(ordering=ordering):
+                    serials, pages, last = self.walk('/api/v1/equipment/', {'ordering': ordering, 'page_size': 2})
+                    self.assertEqual(serials, expected)
+                    self.assertEqual(pages, 5)
+
+                    # Назад от последней страницы - те же страницы в обратном порядке
+                    backward, _pages, _first = self.walk(last.data['previous'], {}, link='previous')
+                    pages_before_last = [expected[start:start + 2] for start in range(0, 8, 2)]
+                    self.assertEqual(backward, [serial for page in reversed(pages_before_last) for serial in page])
+
+    def test_limit_alias_and_offset(self):
+        response = self.client.get('/api/v1/equipment/', {'limit': 4})
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertIn('limit=4', response.data['next'])
+        self.assertEqual(len(self.client.get(response.data['next']).data['results']), 4)
+
+        response = self.client.get('/api/v1/equipment/', {'page_size': 3, 'limit': 4})
+        self.assertEqual(len(response.data['results']), 3)
+
+        response = self.client.get('/api/v1/equipment/', {'limit': 2, 'offset': 4})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('offset', response.data)
+
+
+class FleetGenerationTests(TestCase):
+    """Синтетический парк согласован: заявки, владельцы, периоды владения и сводка"""
+
+    def test_generate_fleet(self):
+        result = generate_fleet(users=6, legal_entities=2, equipment=40, transfers=80, prefix='t', seed=1)
+        equipment = Equipment.objects.filter(serial_number__startswith='T-')
+        self.assertEqual(result['users'], User.objects.filter(username__startswith='t_').count())
+        self.assertEqual((result['users'], result['equipment']), (6, 40))
+        self.assertEqual(equipment.count(), 40)
+        self.assertEqual(TransferRequest.objects.count(), result['transfers'])
+        self.assertGreater(result['transfers'], 0)
+
+        # Признак заявки в ожидании совпадает с заявками, в ожидании не больше одной
+        pending = list(TransferRequest.objects.filter(status='pending').values_list('equipment_id', flat=True))
+        self.assertEqual(len(pending), len(set(pending)))
+        self.assertEqual(set(equipment.filter(has_pending_transfer=True).values_list('pk', flat=True)), set(pending))
+
+        # Открытый период - у текущего владельца, периоды одного оборудования не пересекаются
+        now = timezone.now()
+        for item in equipment.select_related('type', 'manufacturer', 'current_owner'):
+            self.assertEqual(owner_at(item, now), item.current_owner)
+            intervals = list(item.ownership_intervals.order_by('valid_from'))
+            for previous, following in zip(intervals, intervals[1:]):
+                self.assertIsNotNone(previous.valid_to)
+                self.assertLessEqual(previous.valid_to, following.valid_from)
+            self.assertEqual(item.search_document, item.build_search_document())
+
+        self.assertEqual(summary_counts(), expected_summary_counts())
+
+        clear_fleet('t')
+        self.assertFalse(equipment.exists())
+        self.assertEqual(summary_counts(), {})
+
+    def test_local_load_test_rolls_back(self):
+        generate_fleet(users=4, legal_entities=1, equipment=12, transfers=0, prefix='lt', seed=1)
+        owners = dict(Equipment.objects.values_list('pk', 'current_owner_id'))
+
+        # тестовое окружение уже настроено раннером
+        with mock.patch('equipment.loadtest.setup_test_environment'), \
+                mock.patch('equipment.loadtest.teardown_test_environment'):
+            report = run_load_test(
+                scenarios=('transfer_create', 'transfer_accept'), password='loadtest', prefix='lt', requests=4
+            )
+        self.assertEqual((report['transfer_create']['errors'], report['transfer_accept']['errors']), (0, 0))
+        self.assertGreater(report['transfer_accept']['requests'], 0)
+        self.assertFalse(TransferRequest.objects.exists())
+        self.assertEqual(dict(Equipment.objects.values_list('pk', 'current_owner_id')), owners)
+        self.assertFalse(User.objects.filter(username__startswith='lt_', last_login__isnull=False).exists())
+
+        with self.assertRaisesMessage(ValueError, 'allow_writes'):
+            run_load_test(base_url='http://localhost:1', scenarios=('transfer_create',), password='x')
+
+    def test_throttling_restored(self):
+        original = APIView.get_throttles
+        with self.assertRaises(RuntimeError):
+            with throttling_disabled():
+                self.assertEqual(APIView().get_throttles(), [])
+                raise RuntimeError
+        self.assertIs(APIView.get_throttles, original)
+
+
+def make_image(size=(800, 400), image_format='JPEG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, image_format)
+    return ContentFile(buffer.getvalue())
+
+
+class PhotoVariantTests(TestCase):
+    """Уменьшенные копии фото: генерация, проверка устаревания, ссылки и удаление"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.storage = get_photo_storage()
+        self.equipment = Equipment.objects.create(model='M', serial_number='PHOTO-1', inverter_number='INV-P1')
+
+    def attach_photo(self, name='photo.jpg', content=None):
+        with mock.patch('equipment.signals.run_on_commit') as scheduled:
+            self.equipment.photo.save(name, content or make_image())
+        return scheduled
+
+    def photo_fields(self):
+        expected, actual = render_both(
+            EquipmentSerializer, Equipment.objects.filter(pk=self.equipment.pk), ('photo_thumb,photo_medium', '')
+        )
+        self.assertEqual(expected, actual)
+        return json.loads(expected)[0]
+
+    def test_generate_variants(self):
+        self.attach_photo()
+        self.assertEqual(self.photo_fields(), {'photo_thumb': None, 'photo_medium': None})
+
+        self.assertTrue(generate_photo_variants(self.equipment.pk))
+        self.equipment.refresh_from_db()
+        variants = self.equipment.photo_variants
+        self.assertEqual(variants['source'], self.equipment.photo.name)
+        for name, size in (('thumb', (128, 128)), ('medium', (640, 320))):
+            with self.storage.open(variants[name]) as file, Image.open(file) as image:
+                self.assertEqual((image.format, image.size), ('WEBP', size))
+            self.assertTrue(variants[name].endswith(f'.{name}.webp'))
+
+        fields = self.photo_fields()
+        self.assertTrue(fields['photo_thumb'].endswith(variants['thumb']))
+        self.assertTrue(fields['photo_medium'].startswith('http://testserver/'))
+
+        self.assertFalse(generate_photo_variants(self.equipment.pk))
+        self.assertTrue(generate_photo_variants(self.equipment.pk, force=True))
+
+    def test_stale_check_schedules_generation(self):
+        self.assertTrue(is_stale('a.jpg', {}))
+        self.assertTrue(is_stale('b.jpg', {'source': 'a.jpg'}))
+        self.assertFalse(is_stale('a.jpg', {'source': 'a.jpg', 'thumb': 'a.thumb.webp'}))
+        self.assertFalse(is_stale(None, {}))
+
+        scheduled = self.attach_photo()
+        scheduled.assert_called_once_with(generate_photo_variants, self.equipment.pk)
+        generate_photo_variants(self.equipment.pk)
+
+        # Варианты актуальны - сохранение без смены фото не ставит задачу
+        self.equipment.refresh_from_db()
+        self.equipment.model = 'M2'
+        with mock.patch('equipment.signals.run_on_commit') as scheduled:
+            self.equipment.save()
+        scheduled.assert_not_called()
+
+        # Новое фото - варианты устарели, старые файлы удаляются после генерации
+        old_variants = self.equipment.photo_variants
+        self.attach_photo('other.jpg').assert_called_once()
+        generate_photo_variants(self.equipment.pk)
+        self.equipment.refresh_from_db()
+        self.assertEqual(self.equipment.photo_variants['source'], self.equipment.photo.name)
+        self.assertFalse(self.storage.exists(old_variants['thumb']))
+
+    def test_unreadable_photo(self):
+        self.attach_photo('broken.jpg', ContentFile(b'not an image'))
+        with self.assertLogs('equipment.photos', 'WARNING'):
+            self.assertTrue(generate_photo_variants(self.equipment.pk))
+        self.equipment.refresh_from_db()
+        self.assertEqual(self.equipment.photo_variants, {'source': self.equipment.photo.name})
+        self.assertEqual(self.photo_fields(), {'photo_thumb': None, 'photo_medium': None})
+
+    def test_variants_deleted_with_equipment(self):
+        self.attach_photo()
+        generate_photo_variants(self.equipment.pk)
+        self.equipment.refresh_from_db()
+        paths = [self.equipment.photo_variants[name] for name in ('thumb', 'medium')]
+        self.assertTrue(all(self.storage.exists(path) for path in paths))
+
+        photo = self.equipment.photo.name
+        with self.captureOnCommitCallbacks(execute=True):
+            self.equipment.delete()
+        self.assertFalse(any(self.storage.exists(path) for path in paths))
+        # Оригинал остается, как и раньше
+        self.assertTrue(self.storage.exists(photo))
@@ -2,7 +2,9 @@ from django.urls import path
 
 
 from equipment.views import UserEquipmentListView, EquipmentDetailView, \
-    EquipmentExportView, AvailableForTransferEquipmentListView, EquipmentListView
+    EquipmentExportView, AvailableForTransferEquipmentListView, EquipmentListView, \
+    ExportJobCreateView, ExportJobDetailView, ExportJobDownloadView, EquipmentLookupView, \
+    LookupTableView, InventorySummaryView, EquipmentImportView
 from transfer_request.views import TransferEquipmentHistoryView
 
 
@@ -13,6 +15,17 @@ urlpatterns = [
 
     path('my/', UserEquipmentListView.as_view(), name='user-equipment'),
 
+    # поиск по серийному/инвентарному номеру с опечатками
+    path('lookup/', EquipmentLookupView.as_view(), name='equipment-lookup'),
+
+    # сводка по оборудованию (количество по группам)
+    path('summary/', InventorySummaryView.as_view(), name='inventory-summary'),
+
+    # справочники
+    path('types/', LookupTableView.as_view(table='types'), name='equipment-types'),
+    path('manufacturers/', LookupTableView.as_view(table='manufacturers'), name='manufacturers'),
+    path('legal-entities/', LookupTableView.as_view(table='legal-entities'), name='legal-entities'),
+
     path('detail/<uuid:public_id>/', EquipmentDetailView.as_view(),name='equipment-detail'),
 
 
@@ -22,4 +35,12 @@ urlpatterns = [
 
     # для скачивания эксель
     path('export/', EquipmentExportView.as_view(), name='equipment-export'),
+
+    # загрузка оборудования из файла в формате выгрузки
+    path('import/', EquipmentImportView.as_view(), name='equipment-import'),
+
+    # фоновые выгрузки: постановка задания, статус и скачивание готового файла
+    path('export/jobs/', ExportJobCreateView.as_view(), name='export-job-create'),
+    path('export/jobs/<uuid:public_id>/', ExportJobDetailView.as_view(), name='export-job-detail'),
+    path('export/jobs/<uuid:public_id>/download/', ExportJobDownloadView.as_view(), name='export-job-download'),
 ]
\ No newline at end of file
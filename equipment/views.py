@@ -1,31 +1,44 @@
-from django.http import HttpResponse
-from openpyxl.workbook import Workbook
-from rest_framework import viewsets, permissions, generics, filters
+from django.http import StreamingHttpResponse, FileResponse
+from django.utils.cache import patch_vary_headers, patch_cache_control, get_conditional_response
+from django.utils.text import compress_sequence
+from rest_framework import permissions, generics, filters, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from equipment.models import Equipment
-from equipment.serializers import EquipmentSerializer
-from transfer_request.models import TransferRequest
-from transfer_request.serializers import TransferRequestSerializer
+from base.pagination.bases import KeysetPagination
+from base.renderers.bases import JSONRenderer
+from base.views.bases import SparseFieldsetMixin, FastListMixin, ConditionalListMixin, ConditionalRetrieveMixin, \
+    accepts_encoding, get_serializer_query_plan
+from equipment.exports import EXPORT_FORMATS, iter_export_rows, start_export_job
+from equipment.fuzzy import serial_index
+from equipment.imports import import_equipment, detect_format, ImportFileError
+from equipment.lookup_tables import get_table, get_lookup_table_max_age
+from equipment.models import Equipment, ExportJob
+from equipment.permissions import IsAdvancedAccess
+from equipment.renderers import XLSXRenderer, CSVRenderer, NDJSONRenderer
+from equipment.search import EquipmentSearchFilter
+from equipment.summary import get_inventory_summary, SUMMARY_DIMENSIONS
+from equipment.serializers import EquipmentSerializer, ExportJobSerializer, EquipmentLookupSerializer
 
-class EquipmentListView(generics.ListAPIView):
+# Связанные данные, которые выводит EquipmentSerializer (см. ConditionalGetMixin)
+EQUIPMENT_RELATED_VERSIONS = ('types', 'manufacturers', 'legal-entities', 'users')
+
+
+class EquipmentListView(ConditionalListMixin, FastListMixin, SparseFieldsetMixin, generics.ListAPIView):
     """
     API endpoint для получения списка оборудования.
     Для пользователей с расширенным доступом - все оборудование,
     для обычных пользователей - только их оборудование.
+    Поддерживает ETag/Last-Modified: без изменений отдается 304.
     """
+    conditional_versions = EQUIPMENT_RELATED_VERSIONS
     serializer_class = EquipmentSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = [
-        '=serial_number',
-        'model',
-        'type__name',
-        'manufacturer__name',
-        'current_owner__username',
-        'inverter_number',
-    ]
+    # ?search= ищет по Equipment.search_document: серийный и инвентарный номер,
+    # модель, тип, производитель и логин владельца
+    filter_backends = [EquipmentSearchFilter, filters.OrderingFilter]
     ordering_fields = [
         'serial_number',
         'model',
@@ -34,23 +47,60 @@ class EquipmentListView(generics.ListAPIView):
         'current_owner__username'
     ]
     ordering = ['serial_number']
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         user = self.request.user
         queryset = Equipment.objects.all().select_related('type', 'manufacturer', 'current_owner')
         return queryset if user.is_advanced_access else queryset.filter(current_owner=user)
 
-class EquipmentDetailView(generics.RetrieveAPIView):
+class EquipmentLookupView(generics.GenericAPIView):
     """
-        Представление для получения детальной информации об оборудовании
+    Поиск оборудования по серийному или инвентарному номеру с опечатками.
+    ?q= - номер (регистр, пробелы и дефисы не важны, O/0 и I/1 не различаются),
+    ?limit= - количество результатов (по умолчанию 5, не больше 20).
+    Пользователи без расширенного доступа ищут только среди своего оборудования.
     """
+    serializer_class = EquipmentLookupSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    default_limit = 5
+    max_limit = 20
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'q': 'Обязательный параметр'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+
+        user = request.user
+        matches = serial_index.lookup(query, limit=max(limit, 1), owner_id=None if user.is_advanced_access else user.pk)
+
+        select_related, _only = get_serializer_query_plan(EquipmentSerializer(), Equipment)
+        equipment = Equipment.objects.select_related(*select_related).in_bulk([match.pk for match in matches])
+        results = [
+            {'score': round(match.score, 1), 'exact': match.exact, 'matched_field': match.field,
+             'equipment': equipment[match.pk]}
+            for match in matches if match.pk in equipment
+        ]
+        return Response(self.get_serializer(results, many=True).data)
+
+
+class EquipmentDetailView(ConditionalRetrieveMixin, SparseFieldsetMixin, generics.RetrieveAPIView):
+    """
+        Представление для получения детальной информации об оборудовании.
+        Поддерживает ETag/Last-Modified: без изменений отдается 304.
+    """
+    conditional_versions = EQUIPMENT_RELATED_VERSIONS
     queryset = Equipment.objects.all()
     serializer_class = EquipmentSerializer
     permission_classes = [permissions.IsAuthenticated]
     lookup_field = 'public_id'
 
 
-class UserEquipmentListView(generics.ListAPIView):
+class UserEquipmentListView(SparseFieldsetMixin, generics.ListAPIView):
     """
         API endpoint для получения списка оборудования, закрепленного за текущим пользователем.
         Наследуется от generics.ListAPIView, что обеспечивает только GET-запрос для получения списка.
@@ -67,7 +117,7 @@ class UserEquipmentListView(generics.ListAPIView):
         )
 
 
-class AvailableForTransferEquipmentListView(generics.ListAPIView):
+class AvailableForTransferEquipmentListView(SparseFieldsetMixin, generics.ListAPIView):
     """
     API endpoint для получения списка оборудования пользователя,
     доступного для передачи (исключает оборудование в процессе передачи и списанное)
@@ -77,66 +127,161 @@ class AvailableForTransferEquipmentListView(generics.ListAPIView):
 
     # Возвращаем только оборудование, где current_owner равен текущему пользователю
     def get_queryset(self):
-        # Получаем все оборудование пользователя
-        user_equipment = Equipment.objects.filter(current_owner=self.request.user, decommissioned_equipment=False)
-
-        # Исключаем оборудование с pending transfer requests
-        pending_equipment_ids = TransferRequest.objects.filter(
-            equipment__in=user_equipment,
-            status='pending'
-        ).values_list('equipment_id', flat=True)
-
-        return user_equipment.exclude(id__in=pending_equipment_ids)
+        # Оборудование с заявкой в ожидании отмечено признаком (см. transfer_request/pending.py)
+        return Equipment.objects.filter(
+            current_owner=self.request.user,
+            decommissioned_equipment=False,
+            has_pending_transfer=False
+        )
 
 
 class EquipmentExportView(APIView):
-    """Класс, который возвращает эксель файл со всем оборудованием """
+    """
+    Класс, который возвращает файл со всем оборудованием.
+    Формат выбирается через заголовок Accept или ?format=: xlsx (по умолчанию), csv или ndjson.
+    Файл формируется потоково: строки читаются из БД порциями
+    и сразу отправляются клиенту. CSV и NDJSON сжимаются gzip,
+    если Accept-Encoding разрешает gzip (q > 0).
+    """
+    renderer_classes = [XLSXRenderer, CSVRenderer, NDJSONRenderer]
 
     def get(self, request):
-        queryset = Equipment.objects.all().select_related(
-            'type', 'manufacturer', 'current_owner', 'legal_entity'
-        )
+        queryset = Equipment.objects.all()
+        export_format = request.accepted_renderer.format
+        content_type, extension, writer = EXPORT_FORMATS[export_format]
 
-        # Создаем Excel файл
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Оборудование"
-
-        # Заголовки
-        headers = [
-            "Серийный номер",
-            "Инвентарный номер",
-            "Модель",
-            "Тип техники",
-            "Производитель",
-            "Поставщик",
-            "Списано",
-            "Номер счета",
-            "Текущий владелец",
-            "Юридическое лицо",
-        ]
-        ws.append(headers)
-
-        # Данные
-        for item in queryset:
-            ws.append([
-                item.serial_number or '-',
-                item.inverter_number or '-',
-                item.model or '-',
-                item.type.name if item.type else '-',
-                item.manufacturer.name if item.manufacturer else '-',
-                item.supplier or '-',
-                'Да' if item.decommissioned_equipment else 'Нет',
-                item.invoice_info or '-',
-                item.current_owner.get_full_name() if item.current_owner else '-',
-                item.legal_entity.name if item.legal_entity else '-',
-            ])
-
-        # Формируем ответ
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        stream = writer(iter_export_rows(queryset))
+        compress = export_format != 'xlsx' and accepts_encoding(request.META.get('HTTP_ACCEPT_ENCODING'), 'gzip')
+        if compress:
+            stream = compress_sequence(stream)
+
+        response = StreamingHttpResponse(stream, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename=equipment_list.{extension}'
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+
+        return response
+
+    def handle_exception(self, exc):
+        # Ошибки (401, 406 и т.д.) отдаем в JSON, а не в формате выгрузки
+        self.request.accepted_renderer = JSONRenderer()
+        self.request.accepted_media_type = JSONRenderer.media_type
+        return super().handle_exception(exc)
+
+
+class ExportJobCreateView(generics.CreateAPIView):
+    """
+    Постановка выгрузки в фоновую очередь.
+    Если файл для текущих данных уже есть или формируется - возвращается существующее задание.
+    """
+    serializer_class = ExportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        job, _created = start_export_job(request.user, serializer.validated_data.get('format', 'xlsx'))
+
+        response_status = status.HTTP_200_OK if job.status == ExportJob.STATUS_READY else status.HTTP_202_ACCEPTED
+        return Response(self.get_serializer(job).data, status=response_status)
+
+
+class ExportJobDetailView(generics.RetrieveAPIView):
+    """Статус задания на выгрузку"""
+    queryset = ExportJob.objects.all()
+    serializer_class = ExportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    lookup_field = 'public_id'
+
+
+class ExportJobDownloadView(generics.RetrieveAPIView):
+    """Скачивание готового файла выгрузки"""
+    queryset = ExportJob.objects.all()
+    permission_classes = [permissions.IsAuthenticated]
+    lookup_field = 'public_id'
+
+    def retrieve(self, request, *args, **kwargs):
+        job = self.get_object()
+        if job.status != ExportJob.STATUS_READY or not job.file:
+            return Response(
+                {'detail': 'Файл еще не готов', 'status': job.status},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        content_type, extension, _writer = EXPORT_FORMATS[job.format]
+        return FileResponse(
+            job.file.open('rb'),
+            as_attachment=True,
+            filename=f'equipment_list.{extension}',
+            content_type=content_type
         )
-        response['Content-Disposition'] = 'attachment; filename=equipment_list.xlsx'
-        wb.save(response)
 
+
+class LookupTableView(APIView):
+    """
+    Справочник целиком (типы, производители или юр. лица).
+    Клиент может один раз загрузить справочники и запрашивать оборудование
+    без раскрытия связей - с id вместо вложенных объектов.
+    Ответ кэшируется на сервере до изменения справочника,
+    клиенту отдаются ETag и Cache-Control (повторный запрос с If-None-Match - 304).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    table = None
+
+    def get(self, request):
+        version, data = get_table(self.table)
+        etag = f'"{self.table}-{version}"'
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(data)
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, max_age=get_lookup_table_max_age())
         return response
+
+
+class InventorySummaryView(APIView):
+    """
+    Сводка по оборудованию: количество по группам.
+    ?group_by= - через запятую: type, manufacturer, legal_entity, decommissioned, assigned
+    (по умолчанию type). Данные читаются из InventorySummary, а не из таблицы оборудования.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdvancedAccess]
+
+    def get(self, request):
+        group_by = [name for name in request.query_params.get('group_by', 'type').split(',') if name]
+        unknown = [name for name in group_by if name not in SUMMARY_DIMENSIONS]
+        if unknown or not group_by or len(set(group_by)) != len(group_by):
+            raise ValidationError({
+                'group_by': f'Допустимые значения: {", ".join(SUMMARY_DIMENSIONS)}'
+            })
+
+        groups = get_inventory_summary(group_by)
+        return Response({
+            'group_by': group_by,
+            'total': sum(group['count'] for group in groups),
+            'groups': groups,
+        })
+
+
+class EquipmentImportView(APIView):
+    """
+    Массовая загрузка оборудования из файла (multipart, поле file).
+    Колонки - как в выгрузке (XLSX, CSV или NDJSON), формат определяется по расширению.
+    Оборудование с существующим серийным номером обновляется.
+    Возвращает отчет: количество созданных и обновленных строк и ошибки по строкам.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdvancedAccess]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': 'Файл не передан'})
+        try:
+            report = import_equipment(upload, detect_format(upload.name))
+        except ImportFileError as exc:
+            raise ValidationError({'file': str(exc)})
+        return Response(report)
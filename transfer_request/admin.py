@@ -1,8 +1,23 @@
 from django.contrib import admin
 
-from transfer_request.models import TransferRequest
+from transfer_request.models import EmailOutbox, TransferRequest
+from transfer_request.outbox import retry_failed
 
 
 @admin.register(TransferRequest)
 class TransferRequestAdmin(admin.ModelAdmin):
-    list_display = ('id','equipment', 'sender', 'receiver', 'status', 'requested_at', 'accepted_at')# Register your models here.
\ No newline at end of file
+    list_display = ('id','equipment', 'sender', 'receiver', 'status', 'requested_at', 'accepted_at')# Register your models here.
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject',)
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'sent_at')
+    actions = ['retry']
+
+    @admin.action(description='Вернуть не отправленные письма в очередь')
+    def retry(self, request, queryset):
+        count = retry_failed(queryset)
+        self.message_user(request, f'Возвращено в очередь: {count}')
@@ -0,0 +1,55 @@
+"""
+Счетчики заявок пользователя для бейджей фронтенда.
+
+Все счетчики считаются одним агрегирующим запросом с Count(filter=...)
+и хранятся в общем кэше под версией пользователя (base.cache.bases).
+Версия отправителя и получателя увеличивается после фиксации транзакции,
+в которой заявка создана, изменена или удалена (см. signals.py);
+массовые операции (bulk_create, bulk_update) вызывают
+invalidate_transfer_counters сами. Версия сбрасывает счетчики во всех
+воркерах, только если кэш общий для процессов (проверка base.E001).
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from base.cache.bases import bump_version, get_version
+from transfer_request.models import TransferRequest
+
+TRANSFER_COUNTERS_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def _version_name(user_id):
+    return f'transfer_counters:{user_id}'
+
+
+def _data_key(user_id, version):
+    return f'transfer_counters:{user_id}:{version}'
+
+
+def count_transfers(user):
+    """Счетчики одним запросом: входящие, исходящие (всего и в ожидании) и все заявки пользователя"""
+    pending = Q(status='pending')
+    return TransferRequest.objects.filter(Q(sender=user) | Q(receiver=user)).aggregate(
+        incoming=Count('pk', filter=Q(receiver=user)),
+        incoming_pending=Count('pk', filter=Q(receiver=user) & pending),
+        outgoing=Count('pk', filter=Q(sender=user)),
+        outgoing_pending=Count('pk', filter=Q(sender=user) & pending),
+        total=Count('pk'),
+    )
+
+
+def get_transfer_counters(user):
+    """Счетчики пользователя из кэша или из БД"""
+    version = get_version(_version_name(user.pk))
+    counters = cache.get(_data_key(user.pk, version))
+    if counters is None:
+        counters = count_transfers(user)
+        cache.set(_data_key(user.pk, version), counters, TRANSFER_COUNTERS_CACHE_TIMEOUT)
+    return counters
+
+
+def invalidate_transfer_counters(user_ids):
+    """Сбрасывает счетчики пользователей после фиксации текущей транзакции"""
+    for user_id in {user_id for user_id in user_ids if user_id is not None}:
+        transaction.on_commit(lambda user_id=user_id: bump_version(_version_name(user_id)))
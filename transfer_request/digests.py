@@ -0,0 +1,83 @@
+"""
+Сводные письма о заявках (режим "сводка" у получателя).
+
+Если у получателя задан CustomUser.transfer_digest_minutes, письмо о
+новой заявке не ставится в очередь, а заявка помечается awaiting_digest
+(см. signals.py и BulkCreateTransferRequestSerializer). Команда
+send_transfer_digests периодически собирает помеченные заявки: получателю
+отправляется одно письмо, когда самая старая заявка ждет дольше его окна.
+Сбор и отправка выполняются несколькими запросами на всех получателей:
+группировка, выборка заявок, bulk_create писем и один UPDATE пометок.
+"""
+from datetime import timedelta
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import Min
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from transfer_request.models import EmailOutbox, TransferRequest
+from transfer_request.notifications import get_transfer_link
+from transfer_request.outbox import build_email
+
+
+def uses_digest(user):
+    return user is not None and user.transfer_digest_minutes is not None
+
+
+def find_due_receivers(now=None):
+    """pk получателей, у которых самая старая заявка ждет сводки дольше окна"""
+    now = now or timezone.now()
+    rows = (
+        TransferRequest.objects.filter(awaiting_digest=True)
+        .values('receiver_id', 'receiver__transfer_digest_minutes')
+        .annotate(oldest=Min('requested_at')).order_by()
+    )
+    return [
+        row['receiver_id'] for row in rows
+        # Сводку отключили, а заявки остались - отправляем сразу
+        if row['receiver__transfer_digest_minutes'] is None
+        or row['oldest'] <= now - timedelta(minutes=row['receiver__transfer_digest_minutes'])
+    ]
+
+
+def build_digest(receiver, transfers):
+    """Письмо получателю со списком заявок"""
+    context = {
+        'receiver': receiver.get_full_name(),
+        'transfers': [(transfer, get_transfer_link(transfer)) for transfer in transfers],
+    }
+    return build_email(
+        subject=f'Сводка заявок на передачу техники: {len(transfers)} шт.',
+        message=render_to_string('emails/transfer_request_digest.txt', context),
+        recipient_list=[receiver.email],
+        html_message=render_to_string('emails/transfer_request_digest.html', context),
+    )
+
+
+@transaction.atomic
+def send_transfer_digests(now=None):
+    """Ставит в очередь сводные письма всем получателям, для которых подошло время. Возвращает число писем"""
+    receiver_ids = find_due_receivers(now)
+    if not receiver_ids:
+        return 0
+
+    transfers = list(
+        TransferRequest.objects.select_for_update(of=('self',))
+        .filter(awaiting_digest=True, receiver_id__in=receiver_ids)
+        .select_related('equipment__type', 'sender', 'receiver')
+        .order_by('receiver_id', 'requested_at')
+    )
+    emails = []
+    for _receiver_id, group in groupby(transfers, key=lambda transfer: transfer.receiver_id):
+        group = list(group)
+        receiver = group[0].receiver
+        # Заявки, которые уже приняты или отклонены, в сводку не попадают
+        pending = [transfer for transfer in group if transfer.status == 'pending']
+        if pending and receiver.email:
+            emails.append(build_digest(receiver, pending))
+
+    EmailOutbox.objects.bulk_create(emails)
+    TransferRequest.objects.filter(pk__in=[transfer.pk for transfer in transfers]).update(awaiting_digest=False)
+    return len(emails)
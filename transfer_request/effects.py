@@ -0,0 +1,18 @@
+"""
+Производные данные, которые меняются вместе с заявками: признак заявки
+в ожидании у оборудования (pending.py) и счетчики заявок участников
+(counters.py).
+
+apply_transfer_changes вызывают сигналы сохранения и удаления заявки
+(signals.py) и массовые операции через bulk_update (пакетное решение по заявкам).
+"""
+from transfer_request.counters import invalidate_transfer_counters
+from transfer_request.pending import refresh_pending_transfers
+
+
+def apply_transfer_changes(transfers):
+    """Заявки transfers созданы, изменены или удалены"""
+    refresh_pending_transfers({transfer.equipment_id for transfer in transfers})
+    invalidate_transfer_counters(
+        [user_id for transfer in transfers for user_id in (transfer.sender_id, transfer.receiver_id)]
+    )
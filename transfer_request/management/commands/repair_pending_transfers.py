@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from transfer_request.pending import find_pending_transfer_drift, repair_pending_transfers
+
+
+class Command(BaseCommand):
+    help = 'Проверяет признак "есть заявка в ожидании" у оборудования и исправляет расхождения с заявками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Только показать расхождения, не исправлять')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = list(find_pending_transfer_drift().values_list('serial_number', 'has_pending_transfer'))
+            for serial_number, flag in drift:
+                self.stdout.write(f'{serial_number}: признак {flag}, по заявкам {not flag}')
+            self.stdout.write(f'Расхождений: {len(drift)}')
+            return
+
+        repaired = repair_pending_transfers()
+        self.stdout.write(self.style.SUCCESS(f'Исправлено: {len(repaired)}'))
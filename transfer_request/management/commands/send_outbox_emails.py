@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from transfer_request.outbox import deliver_batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Отправляет письма из очереди (EmailOutbox) пачками через одно соединение с почтовым сервером. '
+        'Без --once работает постоянно и проверяет очередь раз в --interval секунд'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Сколько писем отправлять за одно соединение')
+        parser.add_argument('--interval', type=float, default=5, help='Пауза между проверками пустой очереди, секунд')
+        parser.add_argument('--once', action='store_true', help='Отправить все, что готово к отправке, и завершиться')
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        total_sent = total_failed = 0
+        try:
+            while True:
+                sent, failed = deliver_batch(batch_size)
+                total_sent += sent
+                total_failed += failed
+                if sent or failed:
+                    self.stdout.write(f'Отправлено: {sent}, с ошибкой: {failed}')
+                # Неполная пачка - готовых писем больше нет
+                if sent + failed < batch_size:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Всего отправлено: {total_sent}, с ошибкой: {total_failed}'))
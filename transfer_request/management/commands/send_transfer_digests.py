@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from transfer_request.digests import send_transfer_digests
+
+
+class Command(BaseCommand):
+    help = (
+        'Ставит в очередь сводные письма о заявках получателям в режиме сводки. '
+        'Без --once работает постоянно и проверяет заявки раз в --interval секунд. '
+        'Письма отправляет send_outbox_emails'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=60, help='Пауза между проверками, секунд')
+        parser.add_argument('--once', action='store_true', help='Проверить один раз и завершиться')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                count = send_transfer_digests()
+                if count or options['once']:
+                    self.stdout.write(f'Сводных писем в очереди: {count}')
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
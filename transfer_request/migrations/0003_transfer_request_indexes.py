@@ -0,0 +1,56 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0008_equipment_owner_active_idx'),
+        ('transfer_request', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transferrequest',
+            name='equipment',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='transfer_history', to='equipment.equipment', verbose_name='Оборудование'),
+        ),
+        migrations.AlterField(
+            model_name='transferrequest',
+            name='receiver',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='received_transfers', to=settings.AUTH_USER_MODEL, verbose_name='Получатель'),
+        ),
+        migrations.AlterField(
+            model_name='transferrequest',
+            name='sender',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sent_transfers', to=settings.AUTH_USER_MODEL, verbose_name='Передавший'),
+        ),
+        migrations.AddIndex(
+            model_name='transferrequest',
+            index=models.Index(fields=['receiver', '-requested_at'], name='transfer_receiver_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transferrequest',
+            index=models.Index(fields=['sender', '-requested_at'], name='transfer_sender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transferrequest',
+            index=models.Index(fields=['equipment', '-requested_at'], name='transfer_equipment_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transferrequest',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['receiver', '-requested_at'], name='transfer_pending_receiver_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transferrequest',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['sender', '-requested_at'], name='transfer_pending_sender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transferrequest',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['equipment'], name='transfer_pending_equipment_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0009_equipment_has_pending_transfer'),
+        ('transfer_request', '0004_emailoutbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transferrequest',
+            name='awaiting_digest',
+            field=models.BooleanField(default=False, help_text='Заявка попадет в ближайшее сводное письмо получателю (см. digests.py)', verbose_name='Ожидает сводного письма'),
+        ),
+        migrations.AddIndex(
+            model_name='transferrequest',
+            index=models.Index(condition=models.Q(('awaiting_digest', True)), fields=['receiver'], name='transfer_digest_idx'),
+        ),
+    ]
@@ -3,6 +3,7 @@ from django.utils import timezone
 
 from base.models.bases import BaseModel
 from django.db import models
+from django.db.models import Q
 
 from equipment.models import Equipment
 
@@ -15,31 +16,39 @@ class TransferRequest(BaseModel):
         Equipment,
         on_delete=models.CASCADE,
         related_name='transfer_history',
-        verbose_name='Оборудование'
+        verbose_name='Оборудование',
+        db_index=False,  # покрывается составными индексами (см. Meta.indexes)
     )
     sender = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
         null=True,
         related_name='sent_transfers',
-        verbose_name='Передавший'
+        verbose_name='Передавший',
+        db_index=False,  # покрывается составными индексами (см. Meta.indexes)
     )
     receiver = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
         null=True,
         related_name='received_transfers',
-        verbose_name='Получатель'
+        verbose_name='Получатель',
+        db_index=False,  # покрывается составными индексами (см. Meta.indexes)
     )
     STATUS_CHOICES = [
         ('pending', 'Ожидание'),
         ('accepted', 'Принято'),
         ('rejected', 'Отклонено'),
     ]
-    status = models.CharField(max_length=10, choices=STATUS_CHOICES,db_index=True, default='pending')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     requested_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата запроса')
     accepted_at = models.DateTimeField(null=True, blank=True, verbose_name='Дата принятия или отказа от техники')
     comment = models.TextField(blank=True, null=True, verbose_name='Комментарий')
+    awaiting_digest = models.BooleanField(
+        default=False,
+        verbose_name='Ожидает сводного письма',
+        help_text='Заявка попадет в ближайшее сводное письмо получателю (см. digests.py)'
+    )
 
     def __str__(self):
         return f"{self.equipment} — от {self.sender} к {self.receiver}"
@@ -62,3 +71,68 @@ class TransferRequest(BaseModel):
         verbose_name_plural = "История передачи оборудования"
 
         ordering = ['-requested_at']
+        # Списки заявок фильтруются по участнику (и статусу) и сортируются по дате - индекс отдает строки
+        # уже в нужном порядке. Частичные индексы по ожидающим заявкам малы и не растут с историей
+        indexes = [
+            models.Index(fields=['receiver', '-requested_at'], name='transfer_receiver_idx'),
+            models.Index(fields=['sender', '-requested_at'], name='transfer_sender_idx'),
+            models.Index(fields=['equipment', '-requested_at'], name='transfer_equipment_idx'),
+            models.Index(
+                fields=['receiver', '-requested_at'], condition=Q(status='pending'),
+                name='transfer_pending_receiver_idx'
+            ),
+            models.Index(
+                fields=['sender', '-requested_at'], condition=Q(status='pending'),
+                name='transfer_pending_sender_idx'
+            ),
+            # Есть ли у оборудования заявка в ожидании: my-without-poisoned/, проверка при создании заявки
+            models.Index(fields=['equipment'], condition=Q(status='pending'), name='transfer_pending_equipment_idx'),
+            # Заявки для сводных писем - обычно пусто или несколько строк
+            models.Index(fields=['receiver'], condition=Q(awaiting_digest=True), name='transfer_digest_idx'),
+        ]
+
+
+class EmailOutbox(BaseModel):
+    """
+    Исходящее письмо. Записывается в той же транзакции, что и событие,
+    о котором оно сообщает, и отправляется отдельным процессом
+    (команда send_outbox_emails, см. transfer_request/outbox.py).
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Ожидает отправки'),
+        (STATUS_SENT, 'Отправлено'),
+        (STATUS_FAILED, 'Не отправлено'),
+    ]
+
+    subject = models.CharField('Тема', max_length=255)
+    body = models.TextField('Текст')
+    html_body = models.TextField('HTML', blank=True, null=True)
+    recipients = models.JSONField('Получатели', default=list)
+    from_email = models.CharField('Отправитель', max_length=255, blank=True, null=True)
+    status = models.CharField('Статус', max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField('Попыток отправки', default=0)
+    next_attempt_at = models.DateTimeField(
+        'Следующая попытка',
+        default=timezone.now,
+        help_text='Пока письмо отправляется, время сдвигается вперед - другие процессы его не берут'
+    )
+    last_error = models.TextField('Последняя ошибка', blank=True, null=True)
+    created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    sent_at = models.DateTimeField('Дата отправки', null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Исходящее письмо"
+        verbose_name_plural = "Исходящие письма"
+        ordering = ['-created_at']
+        indexes = [
+            # Очередь на отправку: только ожидающие письма, по времени следующей попытки
+            models.Index(
+                fields=['next_attempt_at'], condition=Q(status='pending'), name='email_outbox_pending_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)}"
@@ -0,0 +1,64 @@
+"""
+Уведомления о заявках на передачу оборудования.
+Письма не отправляются напрямую, а ставятся в очередь (outbox.py) в той же
+транзакции, что и заявки. Групповое уведомление (несколько заявок одному
+получателю) - одно письмо со списком заявок.
+"""
+from django.template.loader import render_to_string
+
+from transfer_request.models import TransferRequest
+from transfer_request.outbox import enqueue_email
+
+
+def get_transfer_link(transfer):
+    return f"https://ваш-сайт.ru/transfer/{transfer.public_id}/"
+
+
+def queue_transfer_notification(transfer_id):
+    """Письмо получателю о новой заявке. Заявка со связями загружается одним запросом"""
+    transfer = (
+        TransferRequest.objects.select_related('equipment__type', 'sender', 'receiver')
+        .filter(pk=transfer_id).first()
+    )
+    if transfer is None or transfer.receiver is None or not transfer.receiver.email:
+        return None
+
+    context = {
+        'request': transfer,
+        'sender': transfer.sender.get_full_name() if transfer.sender else '',
+        'receiver': transfer.receiver.get_full_name(),
+        'equipment': transfer.equipment,
+        'link': get_transfer_link(transfer),
+    }
+    return enqueue_email(
+        subject=f'Новая заявка на передачу техники #{transfer.id}',
+        message=render_to_string('emails/transfer_request.txt', context),
+        recipient_list=[transfer.receiver.email],
+        html_message=render_to_string('emails/transfer_request.html', context),
+    )
+
+
+def queue_bulk_transfer_notification(transfer_ids):
+    """Одно письмо получателю со списком заявок transfer_ids (у всех один отправитель и получатель)"""
+    transfers = list(
+        TransferRequest.objects.filter(pk__in=transfer_ids)
+        .select_related('equipment__type', 'sender', 'receiver').order_by('pk')
+    )
+    if not transfers:
+        return None
+    receiver = transfers[0].receiver
+    if receiver is None or not receiver.email:
+        return None
+
+    context = {
+        'transfers': [(transfer, get_transfer_link(transfer)) for transfer in transfers],
+        'sender': transfers[0].sender.get_full_name() if transfers[0].sender else '',
+        'receiver': receiver.get_full_name(),
+        'comment': transfers[0].comment,
+    }
+    return enqueue_email(
+        subject=f'Новые заявки на передачу техники: {len(transfers)} шт.',
+        message=render_to_string('emails/transfer_request_bulk.txt', context),
+        recipient_list=[receiver.email],
+        html_message=render_to_string('emails/transfer_request_bulk.html', context),
+    )
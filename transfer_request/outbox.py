@@ -0,0 +1,143 @@
+"""
+Очередь исходящих писем (EmailOutbox).
+
+Письмо записывается в БД в той же транзакции, что и заявка: откат
+транзакции отменяет и письмо, а медленный или недоступный SMTP не
+задерживает ответ API. Отправляет письма команда send_outbox_emails:
+берет пачку ожидающих писем, отправляет их через одно соединение
+(EMAIL_BACKEND) и при ошибке откладывает письмо с растущей паузой.
+После EMAIL_OUTBOX_MAX_ATTEMPTS неудачных попыток письмо помечается
+как не отправленное, его можно вернуть в очередь из админки.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from transfer_request.models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+# На это время взятое в отправку письмо скрыто от других процессов
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+
+def get_max_attempts():
+    return getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+
+
+def get_retry_delay(attempts):
+    """Пауза перед следующей попыткой: 1, 2, 4, ... минут, не больше часа"""
+    base = getattr(settings, 'EMAIL_OUTBOX_RETRY_SECONDS', 60)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), 3600))
+
+
+def build_email(subject, message, recipient_list, html_message=None, from_email=None):
+    """Письмо для очереди без сохранения (для bulk_create). Параметры как у send_mail"""
+    return EmailOutbox(
+        subject=subject[:255],
+        body=message,
+        html_body=html_message,
+        recipients=list(recipient_list),
+        from_email=from_email,
+    )
+
+
+def enqueue_email(subject, message, recipient_list, html_message=None, from_email=None):
+    """Ставит письмо в очередь в текущей транзакции. Параметры как у send_mail"""
+    email = build_email(subject, message, recipient_list, html_message=html_message, from_email=from_email)
+    email.save()
+    return email
+
+
+def claim_batch(batch_size):
+    """Забирает до batch_size писем, время попытки которых наступило, и учитывает попытку"""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status=EmailOutbox.STATUS_PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at').values_list('pk', flat=True)[:batch_size]
+        )
+        if ids:
+            # Сдвиг времени - "аренда": если процесс упадет, письмо вернется в очередь после CLAIM_TIMEOUT
+            EmailOutbox.objects.filter(pk__in=ids).update(
+                next_attempt_at=now + CLAIM_TIMEOUT, attempts=F('attempts') + 1
+            )
+    return list(EmailOutbox.objects.filter(pk__in=ids).order_by('next_attempt_at', 'pk'))
+
+
+def build_message(email, connection):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or None,  # Используется DEFAULT_FROM_EMAIL
+        to=email.recipients,
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def _mark_failed(email, error, now):
+    email.last_error = error
+    if email.attempts >= get_max_attempts():
+        email.status = EmailOutbox.STATUS_FAILED
+        logger.error('Письмо %s не отправлено после %s попыток: %s', email.pk, email.attempts, error)
+    else:
+        email.next_attempt_at = now + get_retry_delay(email.attempts)
+        logger.warning('Письмо %s не отправлено (попытка %s): %s', email.pk, email.attempts, error)
+
+
+def deliver_batch(batch_size=100):
+    """
+    Отправляет одну пачку писем через одно соединение.
+    Возвращает (отправлено, с ошибкой); (0, 0) - очередь пуста.
+    """
+    emails = claim_batch(batch_size)
+    if not emails:
+        return 0, 0
+
+    sent, failed = [], []
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:
+        # Сервер недоступен - откладываем всю пачку
+        now = timezone.now()
+        for email in emails:
+            _mark_failed(email, f'Соединение: {exc}', now)
+        failed = emails
+    else:
+        try:
+            for email in emails:
+                try:
+                    connection.send_messages([build_message(email, connection)])
+                except Exception as exc:
+                    _mark_failed(email, str(exc), timezone.now())
+                    failed.append(email)
+                else:
+                    email.status = EmailOutbox.STATUS_SENT
+                    email.sent_at = timezone.now()
+                    email.last_error = None
+                    sent.append(email)
+        finally:
+            connection.close()
+
+    if sent:
+        EmailOutbox.objects.bulk_update(sent, ['status', 'sent_at', 'last_error'])
+    if failed:
+        EmailOutbox.objects.bulk_update(failed, ['status', 'next_attempt_at', 'last_error'])
+    return len(sent), len(failed)
+
+
+def retry_failed(queryset):
+    """Возвращает не отправленные письма в очередь с новым счетчиком попыток"""
+    return queryset.filter(status=EmailOutbox.STATUS_FAILED).update(
+        status=EmailOutbox.STATUS_PENDING, attempts=0, next_attempt_at=timezone.now()
+    )
@@ -0,0 +1,38 @@
+"""
+Признак "есть заявка в ожидании" у оборудования (Equipment.has_pending_transfer).
+
+Признак пересчитывается из заявок одним UPDATE ... EXISTS при каждом
+сохранении и удалении заявки (см. signals.py), поэтому не зависит от
+того, что было записано раньше. Массовые операции (bulk_create, update)
+сигналы не вызывают и должны вызывать refresh_pending_transfers сами.
+Расхождения находит и исправляет команда repair_pending_transfers.
+"""
+from django.db.models import Exists, OuterRef, Q
+
+from equipment.models import Equipment
+from transfer_request.models import TransferRequest
+
+
+def pending_transfer_exists():
+    """Выражение для Equipment: есть ли у оборудования заявка в ожидании"""
+    return Exists(TransferRequest.objects.filter(equipment=OuterRef('pk'), status='pending'))
+
+
+def refresh_pending_transfers(equipment_ids):
+    """Пересчитывает признак для оборудования equipment_ids, возвращает количество строк"""
+    return Equipment.objects.filter(pk__in=equipment_ids).update(has_pending_transfer=pending_transfer_exists())
+
+
+def find_pending_transfer_drift():
+    """Оборудование, у которого признак не совпадает с заявками"""
+    return Equipment.objects.alias(expected=pending_transfer_exists()).filter(
+        Q(has_pending_transfer=True, expected=False) | Q(has_pending_transfer=False, expected=True)
+    )
+
+
+def repair_pending_transfers():
+    """Исправляет расхождения, возвращает список pk исправленного оборудования"""
+    equipment_ids = list(find_pending_transfer_drift().values_list('pk', flat=True))
+    if equipment_ids:
+        refresh_pending_transfers(equipment_ids)
+    return equipment_ids
@@ -1,16 +1,28 @@
 import pyotp
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
 
+from base.serializers.bases import SparseFieldsetSerializerMixin, TimedSerializerMixin
+from equipment.effects import apply_equipment_changes
 from equipment.models import Equipment
 from equipment.serializers import EquipmentSerializer
+from equipment.summary import equipment_state
+from transfer_request.counters import invalidate_transfer_counters
+from transfer_request.digests import uses_digest
+from transfer_request.effects import apply_transfer_changes
 from transfer_request.models import TransferRequest
+from transfer_request.notifications import queue_bulk_transfer_notification
 from user.serializers import UserSerializer
 
 User = get_user_model()
 
+# Сколько единиц оборудования можно передать одним запросом
+BULK_TRANSFER_MAX_ITEMS = 50
 
-class TransferRequestSerializer(serializers.ModelSerializer):
+
+class TransferRequestSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Базовый сериализатор только для чтения"""
     equipment = EquipmentSerializer(read_only=True)
     sender = UserSerializer(read_only=True)
@@ -22,7 +34,24 @@ class TransferRequestSerializer(serializers.ModelSerializer):
         read_only_fields = ['sender', 'requested_at', 'accepted_at', 'status']
 
 
-class CreateTransferRequestSerializer(serializers.ModelSerializer):
+class TimelineUserSerializer(UserSerializer):
+    """Участник передачи в хронологии - поля UserSerializer без должности и служебных полей"""
+
+    class Meta(UserSerializer.Meta):
+        fields = ['id', 'username', 'first_name', 'last_name', 'middle_name']
+
+
+class TransferTimelineEventSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Событие хронологии оборудования: заявка без вложенного оборудования"""
+    sender = TimelineUserSerializer(read_only=True)
+    receiver = TimelineUserSerializer(read_only=True)
+
+    class Meta:
+        model = TransferRequest
+        fields = ('public_id', 'status', 'sender', 'receiver', 'requested_at', 'accepted_at', 'comment')
+
+
+class CreateTransferRequestSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Специальный сериализатор для создания заявок"""
     receiver = serializers.SlugRelatedField(
         slug_field='public_id',
@@ -71,7 +100,94 @@ class CreateTransferRequestSerializer(serializers.ModelSerializer):
         return data
 
 
-class UpdateTransferRequestSerializer(serializers.ModelSerializer):
+class BulkCreateTransferRequestSerializer(TimedSerializerMixin, serializers.Serializer):
+    """
+    Заявки на передачу нескольких единиц оборудования одному получателю.
+    Проверки выполняются для всего списка сразу; если хотя бы одна единица
+    не проходит, не создается ни одна заявка.
+    """
+    equipment = serializers.ListField(
+        child=serializers.UUIDField(),
+        min_length=1,
+        max_length=BULK_TRANSFER_MAX_ITEMS,
+        help_text='public_id оборудования'
+    )
+    receiver = serializers.SlugRelatedField(
+        slug_field='public_id',
+        queryset=User.objects.all()
+    )
+    comment = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+    def validate(self, data):
+        user = self.context['request'].user
+        if data['receiver'].pk == user.pk:
+            raise serializers.ValidationError({
+                "status": "error",
+                "code": "self_transfer",
+                "detail": "Нельзя создать заявку самому себе"
+            })
+
+        public_ids = data['equipment']
+        if len(set(public_ids)) != len(public_ids):
+            raise serializers.ValidationError({"equipment": "Оборудование в списке повторяется"})
+
+        # Одним запросом: владелец и признак заявки в ожидании (см. transfer_request/pending.py)
+        found = {
+            equipment.public_id: equipment
+            for equipment in Equipment.objects.filter(public_id__in=public_ids).only(
+                'public_id', 'current_owner_id', 'has_pending_transfer'
+            )
+        }
+        errors = {}
+        for public_id in public_ids:
+            equipment = found.get(public_id)
+            if equipment is None:
+                errors[str(public_id)] = "Оборудование не найдено"
+            elif equipment.current_owner_id != user.pk:
+                errors[str(public_id)] = "Вы не являетесь владельцем этого оборудования"
+            elif equipment.has_pending_transfer:
+                errors[str(public_id)] = "Заявка на это оборудование уже существует."
+        if errors:
+            raise serializers.ValidationError({"equipment": errors})
+
+        data['equipment'] = [found[public_id] for public_id in public_ids]
+        return data
+
+    @transaction.atomic
+    def create(self, validated_data):
+        user = self.context['request'].user
+        equipment = validated_data['equipment']
+
+        # Занимаем оборудование условным UPDATE: если параллельный запрос успел создать заявку
+        # или оборудование передано, строк обновится меньше и транзакция откатится
+        claimed = Equipment.objects.filter(
+            pk__in=[item.pk for item in equipment], current_owner=user, has_pending_transfer=False
+        ).update(has_pending_transfer=True)
+        if claimed != len(equipment):
+            raise serializers.ValidationError(
+                {"equipment": "Оборудование изменилось во время создания заявок, повторите запрос"}
+            )
+
+        # bulk_create не вызывает сигналы: признак выставлен выше, уведомление - одно на все заявки
+        # или, если получатель в режиме сводки, заявки попадут в сводное письмо
+        digest = uses_digest(validated_data['receiver'])
+        transfers = TransferRequest.objects.bulk_create([
+            TransferRequest(
+                equipment=item,
+                sender=user,
+                receiver=validated_data['receiver'],
+                comment=validated_data.get('comment'),
+                awaiting_digest=digest,
+            )
+            for item in equipment
+        ])
+        if not digest:
+            queue_bulk_transfer_notification([transfer.pk for transfer in transfers])
+        invalidate_transfer_counters([user.pk, validated_data['receiver'].pk])
+        return transfers
+
+
+class UpdateTransferRequestSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для обновления статуса заявки с обязательной 2FA"""
     otp_code = serializers.CharField(
         write_only=True,
@@ -113,8 +229,9 @@ class UpdateTransferRequestSerializer(serializers.ModelSerializer):
 
         return data
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        # Основная логика обновления
+        # Владелец оборудования, статус заявки и признак заявки у оборудования меняются вместе
         if 'status' in validated_data:
             new_status = validated_data['status']
             instance.status = new_status
@@ -133,3 +250,81 @@ class UpdateTransferRequestSerializer(serializers.ModelSerializer):
 
         instance.save()
         return instance
+
+
+class TransferDecisionSerializer(TimedSerializerMixin, serializers.Serializer):
+    """Решение по одной заявке"""
+    public_id = serializers.UUIDField()
+    status = serializers.ChoiceField(choices=[('accepted', 'Принято'), ('rejected', 'Отклонено')])
+
+
+class BatchDecisionTransferRequestSerializer(TimedSerializerMixin, serializers.Serializer):
+    """
+    Принятие и отклонение нескольких входящих заявок с одной проверкой OTP-кода.
+    Все решения применяются в одной транзакции: если хотя бы одна заявка
+    не найдена или уже обработана, не меняется ни одна.
+    """
+    decisions = TransferDecisionSerializer(many=True, allow_empty=False, max_length=BULK_TRANSFER_MAX_ITEMS)
+    otp_code = serializers.CharField(
+        write_only=True,
+        required=True,
+        help_text="Код из приложения аутентификации (Google Authenticator и др.)"
+    )
+
+    def validate(self, data):
+        user = self.context['request'].user
+        if not pyotp.TOTP(user.otp_secret).verify(data['otp_code']):
+            raise serializers.ValidationError(
+                {"otp_code": "Неверный код двухфакторной аутентификации"}
+            )
+
+        public_ids = [decision['public_id'] for decision in data['decisions']]
+        if len(set(public_ids)) != len(public_ids):
+            raise serializers.ValidationError({"decisions": "Заявка в списке повторяется"})
+        return data
+
+    @transaction.atomic
+    def create(self, validated_data):
+        user = self.context['request'].user
+        now = timezone.now()
+        decisions = {decision['public_id']: decision['status'] for decision in validated_data['decisions']}
+
+        # Блокируем заявки и их оборудование до конца транзакции (в SQLite блокируется вся БД при записи)
+        transfers = list(
+            TransferRequest.objects.select_for_update(of=('self', 'equipment'))
+            .filter(public_id__in=decisions, receiver=user)
+            .select_related('equipment__type', 'equipment__manufacturer')
+        )
+        found = {transfer.public_id: transfer for transfer in transfers}
+        errors = {}
+        for public_id in decisions:
+            transfer = found.get(public_id)
+            if transfer is None:
+                errors[str(public_id)] = "Заявка не найдена"
+            elif transfer.status != 'pending':
+                errors[str(public_id)] = "Нельзя изменить статус уже обработанной заявки"
+        if errors:
+            raise serializers.ValidationError({"decisions": errors})
+
+        # bulk_update не вызывает сигналы - поисковый документ считаем здесь, а остальное
+        # обновляют те же функции, что вызывают сигналы при save() (equipment/effects.py, effects.py)
+        changes = []
+        for transfer in transfers:
+            transfer.status = decisions[transfer.public_id]
+            transfer.accepted_at = now
+            if transfer.status == 'accepted':
+                equipment = transfer.equipment
+                previous = (equipment_state(equipment), equipment.current_owner_id)
+                equipment.current_owner = user
+                equipment.updated_at = now
+                equipment.search_document = equipment.build_search_document()
+                changes.append((equipment, *previous))
+
+        TransferRequest.objects.bulk_update(transfers, ['status', 'accepted_at'])
+        if changes:
+            Equipment.objects.bulk_update(
+                [equipment for equipment, _state, _owner_id in changes], ['current_owner', 'search_document', 'updated_at']
+            )
+            apply_equipment_changes(changes, now)
+        apply_transfer_changes(transfers)
+        return transfers
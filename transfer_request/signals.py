@@ -1,40 +1,32 @@
 # transfer/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
 from .models import TransferRequest
+from .digests import uses_digest
+from .effects import apply_transfer_changes
+from .notifications import queue_transfer_notification
 
 
 @receiver(post_save, sender=TransferRequest)
-def send_transfer_request_notification(sender, instance, created, **kwargs):
-    """
-    Отправляет уведомление при создании новой заявки на передачу техники
-    """
-    if created and instance.receiver.email:  # Только для новых заявок и если есть email
-        # Формируем контекст для шаблона
-        context = {
-            'request': instance,
-            'sender': instance.sender.get_full_name(),
-            'receiver': instance.receiver.get_full_name(),
-            'equipment': instance.equipment,
-            'link': f"https://ваш-сайт.ru/transfer/{instance.public_id}/"
-        }
+@receiver(post_delete, sender=TransferRequest)
+def update_derived_data(sender, instance, raw=False, **kwargs):
+    """Заявка создана, принята, отклонена или удалена - признак у оборудования и счетчики (см. effects.py)"""
+    if raw:
+        return
+    apply_transfer_changes([instance])
 
-        # Текстовая версия письма
-        text_message = render_to_string('emails/transfer_request.txt', context)
 
-        # HTML версия письма
-        html_message = render_to_string('emails/transfer_request.html', context)
+@receiver(pre_save, sender=TransferRequest)
+def mark_transfer_for_digest(sender, instance, raw=False, **kwargs):
+    """Получатель в режиме сводки - заявка ждет сводного письма вместо отдельного"""
+    if instance._state.adding and not raw and uses_digest(instance.receiver):
+        instance.awaiting_digest = True
 
-        print(context)
 
-        # Отправка письма
-        send_mail(
-            subject=f'Новая заявка на передачу техники #{instance.id}',
-            message=text_message,
-            from_email=None,  # Используется DEFAULT_FROM_EMAIL
-            recipient_list=[instance.receiver.email],
-            html_message=html_message,
-            fail_silently=False
-        )
\ No newline at end of file
+@receiver(post_save, sender=TransferRequest)
+def send_transfer_request_notification(sender, instance, created, raw=False, **kwargs):
+    """
+    Ставит в очередь уведомление при создании новой заявки на передачу техники
+    """
+    if created and not raw and not instance.awaiting_digest:
+        queue_transfer_notification(instance.pk)
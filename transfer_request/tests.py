@@ -1,3 +1,339 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import pyotp
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import caches
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from equipment.models import Equipment, EquipmentType, Manufacturer, InventorySummary, OwnershipInterval
+from equipment.summary import group_equipment, summary_key
+from base.tests.bases import render_both, QueryBudgetTestCase
+from transfer_request.counters import get_transfer_counters
+from transfer_request.models import EmailOutbox, TransferRequest
+from transfer_request.digests import send_transfer_digests
+from transfer_request.outbox import deliver_batch
+from transfer_request.serializers import TransferRequestSerializer
+from user.models import Position
+
+User = get_user_model()
+
+SPARSE_FIELDSETS = [
+    None,
+    ('', ''),
+    ('public_id,status,equipment.serial_number,receiver.username', ''),
+    ('', 'equipment'),
+    ('equipment.type.name,sender.position,requested_at,comment', 'sender.position'),
+]
+
+
+class TransferRequestRowMapperTests(TestCase):
+    """RowMapper выдает тот же JSON, что и TransferRequestSerializer"""
+
+    @classmethod
+    def setUpTestData(cls):
+        position = Position.objects.create(name='Кладовщик')
+        cls.sender = User.objects.create_user(
+            username='sender', email='sender@example.com', password='x', position=position
+        )
+        cls.receiver = User.objects.create_user(username='receiver', email='receiver@example.com', password='x')
+        laptop = EquipmentType.objects.create(name='Ноутбук')
+        lenovo = Manufacturer.objects.create(name='Lenovo')
+
+        first = Equipment.objects.create(
+            type=laptop, manufacturer=lenovo, model='T14', serial_number='SN-1',
+            photo='static/images/photo.png', current_owner=cls.sender
+        )
+        second = Equipment.objects.create(model='X1', serial_number='SN-2', current_owner=cls.sender)
+
+        TransferRequest.objects.create(
+            equipment=first, sender=cls.sender, receiver=cls.receiver, comment='Передаю "как есть"'
+        )
+        TransferRequest.objects.create(
+            equipment=second, sender=cls.sender, receiver=cls.receiver, status='rejected'
+        )
+        # Отправитель удален (on_delete=SET_NULL)
+        orphan = TransferRequest.objects.create(equipment=second, sender=cls.sender, receiver=cls.receiver)
+        TransferRequest.objects.filter(pk=orphan.pk).update(sender=None)
+
+    def test_output_is_identical(self):
+        queryset = TransferRequest.objects.order_by('pk')
+        for fields in SPARSE_FIELDSETS:
+            with self.subTest(fields=fields):
+                expected, actual = render_both(TransferRequestSerializer, queryset, fields)
+                self.assertEqual(expected, actual)
+
+    def test_list_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.receiver)
+
+        with self.assertNumQueries(2):  # количество и страница
+            response = client.get('/api/v1/transfer/incoming/')
+        self.assertEqual(response.status_code, 200)
+
+        expected, _ = render_both(
+            TransferRequestSerializer, TransferRequest.objects.filter(receiver=self.receiver)
+        )
+        self.assertEqual(response.content.count(b'"public_id"'), expected.count(b'"public_id"'))
+        self.assertIn(expected[1:-1], response.content)
+
+
+class TransferQueryBudgetTests(QueryBudgetTestCase):
+    """Количество SQL-запросов эндпоинтов заявок не зависит от количества заявок на странице"""
+
+    def test_transfer_lists(self):
+        # количество и страница
+        for path in ('incoming', 'outgoing', 'pending-incoming', 'pending-outgoing'):
+            self.assertQueryBudget(2, f'/api/v1/transfer/{path}/', 'page_size')
+        self.assertQueryBudget(2, '/api/v1/transfer/incoming/', 'page_size', params={
+            'fields': 'public_id,equipment.serial_number,sender.position.name', 'expand': 'equipment.type'
+        })
+
+    def test_history(self):
+        equipment = self.equipment[0]
+        self.assertQueryBudget(2, f'/api/v1/transfer/history/{equipment.public_id}/', 'limit')
+
+    def test_timeline(self):
+        # оборудование, количество и страница событий - независимо от длины истории
+        equipment = Equipment.objects.annotate(total=Count('transfer_history')).order_by('-total').first()
+        path = f'/api/v1/transfer/timeline/{equipment.public_id}/'
+        self.assertQueryBudget(3, path, 'page_size', params={'count': 'exact'})
+
+        response = self.client.get(path, {'page_size': 2, 'ordering': '-requested_at'})
+        self.assertEqual(response.data['equipment']['public_id'], str(equipment.public_id))
+        self.assertNotIn('equipment', response.data['results'][0])
+        # участник - в том же представлении, что и в UserSerializer (id в hex)
+        event = TransferRequest.objects.select_related('sender').get(public_id=response.data['results'][0]['public_id'])
+        self.assertEqual(response.data['results'][0]['sender'], {
+            'id': event.sender.public_id.hex, 'username': event.sender.username, 'first_name': event.sender.first_name,
+            'last_name': event.sender.last_name, 'middle_name': event.sender.middle_name,
+        })
+        events = []
+        while True:
+            events.extend(event['public_id'] for event in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        expected = TransferRequest.objects.filter(equipment=equipment).order_by('-requested_at', '-pk')
+        self.assertEqual(events, [str(public_id) for public_id in expected.values_list('public_id', flat=True)])
+
+    def test_counters(self):
+        sender, receiver = self.users[0], self.users[1]
+        response = self.assertQueryBudget(1, '/api/v1/transfer/counters/')
+        expected = {
+            'incoming': TransferRequest.objects.filter(receiver=sender).count(),
+            'incoming_pending': TransferRequest.objects.filter(receiver=sender, status='pending').count(),
+            'outgoing': TransferRequest.objects.filter(sender=sender).count(),
+            'outgoing_pending': TransferRequest.objects.filter(sender=sender, status='pending').count(),
+        }
+        expected['total'] = expected['incoming'] + expected['outgoing']
+        self.assertEqual(response.data, expected)
+
+        # из кэша - без запросов к БД, после новой заявки - пересчитываются
+        with self.assertNumQueries(0):
+            self.client.get('/api/v1/transfer/counters/')
+        equipment = Equipment.objects.filter(current_owner=sender, has_pending_transfer=False).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/v1/transfer/create/', {
+                'equipment': str(equipment.public_id), 'receiver': str(receiver.public_id),
+            }, format='json')
+        response = self.client.get('/api/v1/transfer/counters/')
+        self.assertEqual(response.data['outgoing_pending'], expected['outgoing_pending'] + 1)
+        self.assertEqual(response.data['total'], expected['total'] + 1)
+
+    def test_counters_reset_in_other_process(self):
+        # другой воркер - отдельный экземпляр бэкенда с тем же хранилищем
+        sender, receiver = self.users[0], self.users[1]
+        other_worker = caches.create_connection('default')
+        with mock.patch('transfer_request.counters.cache', other_worker), \
+                mock.patch('base.cache.bases.cache', other_worker):
+            before = get_transfer_counters(receiver)['incoming_pending']
+
+        equipment = Equipment.objects.filter(current_owner=sender, has_pending_transfer=False).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            TransferRequest.objects.create(equipment=equipment, sender=sender, receiver=receiver)
+
+        with mock.patch('transfer_request.counters.cache', other_worker), \
+                mock.patch('base.cache.bases.cache', other_worker):
+            self.assertEqual(get_transfer_counters(receiver)['incoming_pending'], before + 1)
+
+    def test_detail(self):
+        transfer = TransferRequest.objects.filter(receiver=self.users[0]).first()
+        self.assertQueryBudget(1, f'/api/v1/transfer/requests/{transfer.public_id}/')
+
+    def test_create_and_accept(self):
+        sender, receiver = self.users[0], self.users[1]
+        equipment = Equipment.objects.filter(current_owner=sender).exclude(transfer_history__status='pending').first()
+        # заявка, признак заявки у оборудования и письмо в очереди сохраняются в транзакции (SAVEPOINT/RELEASE)
+        self.assertQueryBudget(10, '/api/v1/transfer/create/', method='post', status_code=201, data={
+            'equipment': str(equipment.public_id), 'receiver': str(receiver.public_id),
+        })
+
+        transfer = TransferRequest.objects.get(equipment=equipment, status='pending')
+        self.client.force_authenticate(receiver)
+        self.assertQueryBudget(13, f'/api/v1/transfer/update/{transfer.public_id}/', method='patch', data={
+            'status': 'accepted', 'otp_code': pyotp.TOTP(receiver.otp_secret).now(),
+        })
+
+    def test_bulk_create(self):
+        # количество запросов не зависит от количества оборудования в заявке
+        sender, receiver = self.users[0], self.users[1]
+        available = list(Equipment.objects.filter(current_owner=sender, has_pending_transfer=False))
+        for items in (available[:2], available[2:7]):
+            response = self.assertQueryBudget(9, '/api/v1/transfer/create/bulk/', method='post', status_code=201, data={
+                'equipment': [str(item.public_id) for item in items], 'receiver': str(receiver.public_id),
+            })
+            self.assertEqual(len(response.data), len(items))
+        self.assertEqual(
+            TransferRequest.objects.filter(equipment__in=available[:7], status='pending').count(), 7
+        )
+        self.assertFalse(Equipment.objects.filter(pk__in=[item.pk for item in available[:7]], has_pending_transfer=False))
+
+        # оборудование с заявкой в ожидании - ни одна заявка не создается
+        response = self.client.post('/api/v1/transfer/create/bulk/', {
+            'equipment': [str(available[0].public_id), str(available[8].public_id)],
+            'receiver': str(receiver.public_id),
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(available[0].public_id), response.data['equipment'])
+        self.assertFalse(TransferRequest.objects.filter(equipment=available[8], status='pending').exists())
+
+    def test_batch_decision(self):
+        # одна проверка OTP и количество запросов не зависит от количества заявок
+        sender, receiver = self.users[1], self.users[0]
+        available = list(Equipment.objects.filter(current_owner=sender, has_pending_transfer=False))
+        self.client.force_authenticate(sender)
+        response = self.client.post('/api/v1/transfer/create/bulk/', {
+            'equipment': [str(item.public_id) for item in available[:7]], 'receiver': str(receiver.public_id),
+        }, format='json')
+        transfers = [transfer['public_id'] for transfer in response.data]
+
+        self.client.force_authenticate(receiver)
+        for batch in (transfers[:2], transfers[2:7]):
+            decisions = [
+                {'public_id': public_id, 'status': 'accepted' if index % 2 == 0 else 'rejected'}
+                for index, public_id in enumerate(batch)
+            ]
+            self.assertQueryBudget(9, '/api/v1/transfer/update/batch/', method='post', data={
+                'decisions': decisions, 'otp_code': pyotp.TOTP(receiver.otp_secret).now(),
+            })
+
+        accepted = Equipment.objects.filter(pk__in=[item.pk for item in available[:7]], current_owner=receiver)
+        self.assertEqual(accepted.count(), 4)
+        self.assertFalse(Equipment.objects.filter(pk__in=[item.pk for item in available[:7]], has_pending_transfer=True))
+        self.assertIn(receiver.username, accepted.first().search_document)
+        self.assertEqual(
+            OwnershipInterval.objects.filter(equipment__in=accepted, owner=receiver, valid_to__isnull=True).count(), 4
+        )
+        # сводка изменена так же, как при save(): совпадает с пересчетом
+        self.assertEqual(
+            dict(InventorySummary.objects.filter(count__gt=0).values_list('key', 'count')),
+            {summary_key(state): count for state, count in group_equipment(Equipment.objects.all())},
+        )
+
+        # уже обработанная заявка - ни одно решение не применяется
+        response = self.client.post('/api/v1/transfer/update/batch/', {
+            'decisions': [{'public_id': transfers[0], 'status': 'rejected'}],
+            'otp_code': pyotp.TOTP(receiver.otp_secret).now(),
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', EMAIL_OUTBOX_MAX_ATTEMPTS=2
+)
+class EmailOutboxTests(TestCase):
+    """Письма о заявках ставятся в очередь и отправляются пачкой через одно соединение"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sender = User.objects.create_user(username='sender', email='sender@example.com', password='x')
+        cls.receiver = User.objects.create_user(username='receiver', email='receiver@example.com', password='x')
+        equipment_type = EquipmentType.objects.create(name='Ноутбук')
+        cls.equipment = [
+            Equipment.objects.create(type=equipment_type, serial_number=f'SN-{index}', current_owner=cls.sender)
+            for index in range(3)
+        ]
+
+    def test_queue_and_deliver(self):
+        for item in self.equipment:
+            TransferRequest.objects.create(equipment=item, sender=self.sender, receiver=self.receiver)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutbox.STATUS_PENDING).count(), 3)
+
+        self.assertEqual(deliver_batch(batch_size=2), (2, 0))
+        self.assertEqual(deliver_batch(batch_size=2), (1, 0))
+        self.assertEqual(deliver_batch(batch_size=2), (0, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].to, ['receiver@example.com'])
+        self.assertFalse(EmailOutbox.objects.exclude(status=EmailOutbox.STATUS_SENT).exists())
+
+    def test_retry_with_backoff(self):
+        TransferRequest.objects.create(equipment=self.equipment[0], sender=self.sender, receiver=self.receiver)
+        email = EmailOutbox.objects.get()
+
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_HOST='127.0.0.1',
+                               EMAIL_PORT=1, EMAIL_TIMEOUT=1):
+            self.assertEqual(deliver_batch(), (0, 1))
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), (EmailOutbox.STATUS_PENDING, 1))
+            self.assertIsNotNone(email.last_error)
+            # следующая попытка отложена
+            self.assertEqual(deliver_batch(), (0, 0))
+
+            EmailOutbox.objects.update(next_attempt_at=email.created_at)
+            self.assertEqual(deliver_batch(), (0, 1))
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), (EmailOutbox.STATUS_FAILED, 2))
+
+
+class TransferDigestTests(TestCase):
+    """Получатели в режиме сводки получают одно письмо на все заявки за окно"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sender = User.objects.create_user(username='sender', email='sender@example.com', password='x')
+        cls.receivers = [
+            User.objects.create_user(
+                username=f'receiver_{index}', email=f'receiver_{index}@example.com', password='x',
+                transfer_digest_minutes=30
+            )
+            for index in range(3)
+        ]
+        equipment_type = EquipmentType.objects.create(name='Ноутбук')
+        cls.equipment = [
+            Equipment.objects.create(type=equipment_type, serial_number=f'SN-{index}', current_owner=cls.sender)
+            for index in range(9)
+        ]
+
+    def create_transfers(self, receivers):
+        for index, item in enumerate(self.equipment):
+            TransferRequest.objects.create(equipment=item, sender=self.sender, receiver=receivers[index % len(receivers)])
+
+    def test_digest_window(self):
+        self.create_transfers(self.receivers[:1])
+        self.assertFalse(EmailOutbox.objects.exists())
+        self.assertEqual(TransferRequest.objects.filter(awaiting_digest=True).count(), 9)
+
+        # окно еще не прошло
+        self.assertEqual(send_transfer_digests(), 0)
+        self.assertEqual(send_transfer_digests(timezone.now() + timedelta(minutes=31)), 1)
+        email = EmailOutbox.objects.get()
+        self.assertEqual(email.recipients, ['receiver_0@example.com'])
+        self.assertIn('9 шт.', email.subject)
+        self.assertFalse(TransferRequest.objects.filter(awaiting_digest=True).exists())
+
+    def test_set_based(self):
+        # количество запросов не зависит от количества получателей и заявок
+        later = timezone.now() + timedelta(minutes=31)
+        self.create_transfers(self.receivers[:1])
+        with self.assertNumQueries(6) as one:
+            send_transfer_digests(later)
+        TransferRequest.objects.all().delete()
+        self.create_transfers(self.receivers)
+        with self.assertNumQueries(len(one.captured_queries)):
+            self.assertEqual(send_transfer_digests(later), 3)
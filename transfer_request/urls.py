@@ -3,11 +3,15 @@ from transfer_request import views
 
 urlpatterns = [
     path('create/', views.TransferRequestCreateView.as_view(), name='transfer-create'),
+    path('create/bulk/', views.BulkTransferRequestCreateView.as_view(), name='transfer-create-bulk'),
     path('incoming/', views.IncomingTransferRequestsView.as_view(), name='incoming-transfers'),
     path('pending-incoming/', views.PendingIncomingTransferRequestsView.as_view(), name='pending-incoming-transfers'),
     path('outgoing/', views.OutgoingTransferRequestsView.as_view(), name='outgoing-transfers'),
     path('pending-outgoing/', views.PendingOutgoingTransferRequestsView.as_view(), name='pending-outgoing-transfers'),
+    path('counters/', views.TransferCountersView.as_view(), name='transfer-counters'),
     path('requests/<uuid:public_id>/', views.TransferRequestDetailView.as_view(), name='transfer-detail'),
     path('update/<uuid:public_id>/', views.TransferRequestUpdateView.as_view(), name='transfer-update'),
+    path('update/batch/', views.BatchTransferRequestDecisionView.as_view(), name='transfer-update-batch'),
     path('history/<uuid:public_id>/', views.TransferEquipmentHistoryView.as_view(),name='history-detail'),
+    path('timeline/<uuid:public_id>/', views.EquipmentTimelineView.as_view(), name='equipment-timeline'),
 ]
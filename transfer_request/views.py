@@ -1,12 +1,20 @@
+from django.db import transaction
 from django.db.models import Q
-from rest_framework import permissions, generics
+from rest_framework import permissions, generics, filters, status
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
 from rest_framework.throttling import UserRateThrottle
 
-from base.views.bases import BaseTransferRequestListView
+from base.pagination.bases import KeysetPagination
+from base.views.bases import BaseTransferRequestListView, FastListMixin, SparseFieldsetMixin, get_serializer_query_plan
+from equipment.models import Equipment
+from equipment.serializers import EquipmentSerializer
+from transfer_request.counters import get_transfer_counters
 from transfer_request.models import TransferRequest
 from transfer_request.permissions import IsReceiverOrReadOnly, IsActiveUser
 from transfer_request.serializers import TransferRequestSerializer, CreateTransferRequestSerializer, \
-    UpdateTransferRequestSerializer
+    UpdateTransferRequestSerializer, BulkCreateTransferRequestSerializer, BatchDecisionTransferRequestSerializer, \
+    TransferTimelineEventSerializer
 
 
 class IncomingTransferRequestsView(BaseTransferRequestListView):
@@ -51,20 +59,112 @@ class TransferRequestCreateView(generics.CreateAPIView):
     throttle_classes = [UserRateThrottle]  # Ограничение запросов для пользователя
 
     def perform_create(self, serializer):
-        """Автоматически назначает отправителя (текущего пользователя)"""
-        serializer.save(sender=self.request.user)
+        """
+        Автоматически назначает отправителя (текущего пользователя).
+        Заявка и признак заявки у оборудования сохраняются в одной транзакции
+        """
+        with transaction.atomic():
+            serializer.save(sender=self.request.user)
 
-class TransferEquipmentHistoryView(generics.ListAPIView):
+class TransferBatchResponseMixin:
+    """Ответ массовых операций: список затронутых заявок"""
+
+    def serialize_transfers(self, transfers):
+        """Заявки одним запросом со всеми данными для ответа"""
+        select_related, _only = get_serializer_query_plan(TransferRequestSerializer(), TransferRequest)
+        queryset = TransferRequest.objects.filter(pk__in=[transfer.pk for transfer in transfers]) \
+            .select_related(*select_related).order_by('pk')
+        return TransferRequestSerializer(queryset, many=True, context=self.get_serializer_context()).data
+
+
+class BulkTransferRequestCreateView(TransferBatchResponseMixin, generics.GenericAPIView):
+    """
+        Создание заявок на передачу нескольких единиц оборудования одному получателю.
+        Количество запросов к БД не зависит от количества оборудования,
+        получатель получает одно письмо на все заявки.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsActiveUser]
+    serializer_class = BulkCreateTransferRequestSerializer
+    throttle_classes = [UserRateThrottle]  # Один запрос на всю передачу
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        transfers = serializer.save()
+        return Response(self.serialize_transfers(transfers), status=status.HTTP_201_CREATED)
+
+
+class BatchTransferRequestDecisionView(TransferBatchResponseMixin, generics.GenericAPIView):
+    """
+        Принятие или отклонение нескольких входящих заявок одним запросом с одним OTP-кодом.
+        Изменяются только заявки, где текущий пользователь - получатель.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = BatchDecisionTransferRequestSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        transfers = serializer.save()
+        return Response(self.serialize_transfers(transfers))
+
+
+class TransferEquipmentHistoryView(SparseFieldsetMixin, generics.ListAPIView):
     """
         Представление для получения истории перемещения оборудования
     """
     serializer_class = TransferRequestSerializer
+    permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         equipment_id = self.kwargs['public_id']
         return TransferRequest.objects.filter(equipment__public_id=equipment_id)
 
-class TransferRequestDetailView(generics.RetrieveAPIView):
+class EquipmentTimelineView(FastListMixin, generics.ListAPIView):
+    """
+        Хронология передач оборудования: оборудование один раз и компактный список
+        событий (статус, отправитель, получатель, даты, комментарий) по дате заявки.
+        Курсорная пагинация (?cursor=, ?page_size=, ?ordering=-requested_at - от новых к старым),
+        количество запросов не зависит от длины истории.
+    """
+    serializer_class = TransferTimelineEventSerializer
+    permission_classes = [permissions.IsAuthenticated, IsActiveUser]
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ['requested_at']
+    ordering = ['requested_at']
+    pagination_class = KeysetPagination
+
+    def get_equipment(self):
+        if not hasattr(self, '_equipment'):
+            select_related, _only = get_serializer_query_plan(EquipmentSerializer(), Equipment)
+            self._equipment = get_object_or_404(
+                Equipment.objects.select_related(*select_related), public_id=self.kwargs['public_id']
+            )
+        return self._equipment
+
+    def get_queryset(self):
+        return TransferRequest.objects.filter(equipment_id=self.get_equipment().pk)
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        equipment = EquipmentSerializer(self.get_equipment(), context=self.get_serializer_context()).data
+        response.data = {'equipment': equipment, **response.data}
+        return response
+
+
+class TransferCountersView(generics.GenericAPIView):
+    """
+        Счетчики заявок текущего пользователя для бейджей: входящие и исходящие
+        (всего и в ожидании) и все заявки. Один агрегирующий запрос, результат кэшируется
+        до изменения заявок пользователя.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response(get_transfer_counters(request.user))
+
+
+class TransferRequestDetailView(SparseFieldsetMixin, generics.RetrieveAPIView):
     """
         Детальный просмотр заявки
     """
@@ -18,7 +18,7 @@ class CustomUserAdmin(UserAdmin):
         ('Personal info', {
             'fields':
                 ('first_name', 'last_name', 'middle_name', 'organization', 'position', 'email', 'is_advanced_access',
-                 'is_work')}),
+                 'is_work', 'transfer_digest_minutes')}),
         ('Permissions', {'fields': ('is_active', 'is_staff', 'is_superuser', 'groups', 'user_permissions')}),
         ('Important dates', {'fields': ('last_login', 'date_joined')})
     )
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0006_alter_position_description'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='transfer_digest_minutes',
+            field=models.PositiveIntegerField(blank=True, help_text='Оставьте пустым, чтобы получать письмо о каждой заявке', null=True, verbose_name='Сводка уведомлений о заявках, минут'),
+        ),
+    ]
@@ -41,6 +41,11 @@ class CustomUser(AbstractUser, BaseModel):
     # Флаг расширенного доступа к системе
     is_advanced_access = models.BooleanField(default=False, verbose_name="Доступ к расширенной информации",
                                              help_text="Указывает, имеет ли пользователь доступ к расширенным данным")
+    # Пусто - письмо о каждой заявке сразу, иначе одно сводное письмо не чаще раза в указанное время
+    transfer_digest_minutes = models.PositiveIntegerField(
+        null=True, blank=True, verbose_name="Сводка уведомлений о заявках, минут",
+        help_text="Оставьте пустым, чтобы получать письмо о каждой заявке"
+    )
 
     # Секретный ключ для двухфакторное аутентификации
     # Todo: сделать его шифрованным
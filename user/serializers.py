@@ -1,18 +1,19 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
+from base.serializers.bases import SparseFieldsetSerializerMixin
 from user.models import Position
 
 User = get_user_model()
 
 
-class PositionSerializer(serializers.ModelSerializer):
+class PositionSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Position
         fields = '__all__'
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     id = serializers.UUIDField(source='public_id', read_only=True, format='hex')
     position = PositionSerializer(read_only=True)
 
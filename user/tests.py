@@ -1,3 +1,9 @@
-from django.test import TestCase
+from base.tests.bases import QueryBudgetTestCase
 
-# Create your tests here.
+
+class UserQueryBudgetTests(QueryBudgetTestCase):
+    """Список коллег по организации: должность загружается вместе с пользователями"""
+
+    def test_organization_users(self):
+        # количество и страница
+        self.assertQueryBudget(2, '/api/v1/users/organization/', 'limit')
@@ -26,4 +26,4 @@ class UserOrganizationViewSet(viewsets.ReadOnlyModelViewSet):
         return User.objects.filter(
             organization=self.request.user.organization,  # список пользователей которые в такой же организации
             is_work=True,  # только работающие
-        ).exclude(public_id=self.request.user.public_id)
+        ).exclude(public_id=self.request.user.public_id).select_related('position')